@@ -1,19 +1,27 @@
 import streamlit as st
 import os
 import sys
-import numpy as np
-import cv2
-from PIL import Image
-from pdf2image import convert_from_bytes
-import pytesseract
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from bs4 import BeautifulSoup
-import re
 import io
+import time
+import uuid
 import base64
-from pypdf import PdfWriter, PdfReader
+import conversion_core
+from conversion_core import (ConversionPipeline, PdfSource, ImageSource, order_images, render_pdf_thumbnails,
+                             parse_page_ranges, format_page_ranges, ENHANCEMENT_MODES)
+from jobs import ConversionJob, scheduled_hooks
+from scheduler import get_scheduler
+from memory_governor import get_governor, page_sizes_from_reader
+from search_index import SearchIndex, sha256_of_bytes, sha256_of_parts
+from ocr_profiles import PROFILES, get_profile
+from tuning import apply_tuning
+from two_pass import DEFAULT_SECOND_PASS_DPI
+from trace_recorder import get_trace_store
+from result_store import ResultStore, OUTPUTS, valid_key
+from compress_pdf import DEFAULT_COMPRESS_DPI, compress_pdf, size_report
+
+# Heavy libraries (cv2, numpy, PIL, pdf2image, pytesseract, python-docx, bs4,
+# pypdf) are imported inside the functions and tabs that need them, so the
+# first paint and the merge-only tab do not pay for OCR imports.
 
 # ==============================================================================
 # Configuration & Setup
@@ -26,39 +34,47 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Tesseract Configuration
-possible_tesseract_paths = [
-    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-    os.path.join(os.getenv('LOCALAPPDATA'), r"Tesseract-OCR\tesseract.exe")
-]
-TESSERACT_CMD = None
-for path in possible_tesseract_paths:
-    if os.path.exists(path):
-        TESSERACT_CMD = path
-        break
-
-if TESSERACT_CMD:
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
-
-# Poppler Configuration
-# Check for local Windows path first, otherwise assume it's in system PATH (Linux/Cloud)
-local_poppler_path = r"C:\Users\richardjoel.d\AppData\Local\Microsoft\WinGet\Packages\oschwartz10612.Poppler_Microsoft.Winget.Source_8wekyb3d8bbwe\poppler-25.07.0\Library\bin"
-
-if os.path.exists(local_poppler_path):
-    POPPLER_PATH = local_poppler_path
-else:
-    POPPLER_PATH = None  # pdf2image will look in system PATH
-
-# Tesseract Data Path
-TESSDATA_CONFIG = ""
-if TESSERACT_CMD:
-    tess_base = os.path.dirname(TESSERACT_CMD)
-    sys_tessdata = os.path.join(tess_base, "tessdata")
-    if not os.path.exists(os.path.join(sys_tessdata, "tam.traineddata")):
-        local_tessdata = os.path.join(os.getcwd(), "tessdata")
-        if os.path.exists(os.path.join(local_tessdata, "tam.traineddata")):
-            os.environ["TESSDATA_PREFIX"] = local_tessdata
+@st.cache_resource
+def load_engine_config():
+    """
+    Locates Tesseract, Poppler and tessdata once per server process.
+    Streamlit re-executes this script on every interaction, so the probing is cached.
+    """
+    return conversion_core.load_engine_config()
+
+TESSERACT_CMD, POPPLER_PATH, TESSDATA_CONFIG = load_engine_config()
+
+@st.cache_resource
+def load_tuning():
+    """Applies tuning.json (from `pdf_to_docx.py tune`) before the scheduler and OCR pool exist."""
+    return apply_tuning()
+
+load_tuning()
+
+@st.cache_resource
+def get_search_index():
+    """Full-text index of every converted document (see search_index.py)."""
+    return SearchIndex()
+
+@st.cache_resource
+def get_result_store():
+    """Finished outputs on disk (see result_store.py); expired entries are cleared at startup."""
+    store = ResultStore()
+    store.evict()
+    return store
+
+result_store = get_result_store()
+
+# Shared page scheduler (one per server process, shared by all sessions)
+scheduler = get_scheduler()
+governor = get_governor()
+trace_store = get_trace_store()
+if "session_id" not in st.session_state:
+    # Kept in the page address, so a reload (a new Streamlit session) finds its recent conversions again
+    requested = st.query_params.get("session")
+    st.session_state["session_id"] = requested if valid_key(requested) else uuid.uuid4().hex
+    st.query_params["session"] = st.session_state["session_id"]
+SESSION_ID = st.session_state["session_id"]
 
 # ==============================================================================
 # Sidebar - Advanced Settings
@@ -67,62 +83,306 @@ with st.sidebar:
     st.markdown("### ⚙️ Advanced Settings")
     st.markdown("Adjust these settings if you are facing accuracy issues.")
     
-    # DPI Slider
+    # OCR profile: engine/segmentation mode, model set and the defaults below
+    profile_names = list(PROFILES)
+    ocr_profile = PROFILES[st.selectbox(
+        "OCR Profile",
+        profile_names,
+        index=profile_names.index(get_profile().name),
+        format_func=lambda name: PROFILES[name].label,
+        help="Draft is fastest, Archive is most accurate. Sets the defaults below."
+    )]
+    st.caption(ocr_profile.description)
+    if not ocr_profile.models_available():
+        st.caption(f"⚠️ {ocr_profile.models}/ not found; using the default models. Run: {ocr_profile.setup_command()}")
+    
+    # DPI Slider (its default follows the profile)
     pdf_dpi = st.slider(
         "PDF Conversion Quality (DPI)",
         min_value=72,
         max_value=600,
-        value=300,
+        value=ocr_profile.dpi,
         step=50,
-        help="Higher DPI improves accuracy but takes longer. Default is 300."
+        help="Higher DPI improves accuracy but takes longer. The default comes from the OCR profile."
     )
     
+    # Two-pass OCR: the DPI above is the first pass; unclear lines are re-read sharper
+    two_pass_ocr = st.checkbox(
+        "Two-pass OCR (re-read unclear lines)",
+        value=False,
+        help="Reads pages at the DPI above (200-300 is enough), then re-renders only low-confidence lines "
+             "at high DPI and keeps the better reading. Much cheaper than a high DPI for every page."
+    )
+    second_pass_dpi = None
+    if two_pass_ocr:
+        second_pass_dpi = st.select_slider("Re-read DPI", options=[400, 450, 500, 600], value=DEFAULT_SECOND_PASS_DPI)
+    
     # Image Upscale
     img_upscale_factor = st.slider(
         "Image Upscaling Factor",
         min_value=1.0,
         max_value=3.0,
-        value=2.0,
+        value=ocr_profile.upscale_factor,
         step=0.5,
-        help="Upscales uploaded images to improve OCR for small text. Default is 2.0x."
+        help="Upscales uploaded images to improve OCR for small text. The default comes from the OCR profile."
     )
     
     # Advanced Enhancement Options
+    enhancement_modes = list(ENHANCEMENT_MODES)
     enhancement_mode = st.selectbox(
         "Text Enhancement Mode",
-        ["Standard (Auto)", "Denoise & Sharpen", "Thicken Text (Dilation)", "Thin Text (Erosion)"],
-        index=0,
+        enhancement_modes,
+        index=enhancement_modes.index(ocr_profile.mode),
         help="Choose a preprocessing mode to handle specific document issues."
     )
     
+    reuse_regions = st.checkbox(
+        "Skip repeated headers/footers",
+        value=True,
+        help="Title blocks, CONFIDENTIAL strips and footers identical on every page are read once per document "
+             "and reused. Not applied when a searchable PDF is requested."
+    )
+    
+    st.markdown("---")
+    st.markdown("### 📦 Output Options")
+    make_searchable_pdf = st.checkbox(
+        "Also create searchable PDF",
+        value=False,
+        help="Produces a PDF with an invisible text layer from the same OCR pass as the Word document (no extra OCR time)."
+    )
+    
     st.markdown("---")
     st.markdown("### 🛠️ Corrections")
     enable_corrections = st.checkbox("Enable Auto-Corrections", value=True, help="Automatically fix common Tamil OCR errors (e.g., இரசு -> அரசு).")
 
+    st.markdown("---")
+    load = scheduler.stats()
+    st.caption(f"Server load: {load['running']}/{load['max_workers']} pages running, {load['waiting']} jobs queued.")
+    mem = governor.stats()
+    if mem["rss_bytes"]:
+        st.caption(f"Memory: {mem['rss_bytes'] // (1024 * 1024)} / {mem['budget_bytes'] // (1024 * 1024)} MB budget.")
+
+    # Admin: per-job traces (only on servers started with PDF_TOOL_ADMIN=1)
+    if os.getenv("PDF_TOOL_ADMIN") == "1":
+        with st.expander("🔧 Admin: Job Traces"):
+            trace_store.enabled = st.checkbox(
+                "Trace new conversions (all users)",
+                value=trace_store.enabled,
+                help="Records every page's render, preprocess, OCR and DOCX timings, image sizes and memory changes."
+            )
+            traces = trace_store.recent()
+            if traces:
+                trace = traces[st.selectbox(
+                    "Recent jobs",
+                    range(len(traces)),
+                    format_func=lambda i: f"{traces[i].name} ({time.strftime('%H:%M:%S', time.localtime(traces[i].started))})"
+                )]
+                st.download_button(
+                    "⬇️ Download Trace (JSON)",
+                    data=trace.to_json(),
+                    file_name=f"{os.path.splitext(trace.name)[0]}.trace.json",
+                    mime="application/json",
+                    key="dl_trace"
+                )
+                st.caption("Open in ui.perfetto.dev or chrome://tracing (both load the file locally).")
+            else:
+                st.caption("No traced jobs yet.")
+
 
 # ==============================================================================
 # Assets & Helpers
 # ==============================================================================
 
-def correct_tamil_errors(text):
+def show_queue_status(status_text, position, wait_seconds):
+    """Shows the job's place in the shared queue while it waits for a slot."""
+    status_text.markdown(
+        f"<p style='color: #fbbf24;'>Server busy - queued at position {position} "
+        f"(estimated wait ~{int(wait_seconds) + 1}s)...</p>",
+        unsafe_allow_html=True
+    )
+
+def show_memory_status(status_text, used_bytes, budget_bytes):
+    """Shows that a page is held back until memory frees up."""
+    status_text.markdown(
+        f"<p style='color: #fbbf24;'>Memory budget reached ({used_bytes // (1024 * 1024)} / "
+        f"{budget_bytes // (1024 * 1024)} MB) - waiting for other pages to finish...</p>",
+        unsafe_allow_html=True
+    )
+
+DOCX_MIME = OUTPUTS["docx"][1]
+DOWNLOAD_HELP = {"json": "Word boxes, lines and confidences for downstream tools (one JSON object per page)."}
+PREVIEW_PAGES = 5
+SEARCH_LIMIT = 50
+PICKER_PAGES = 24   # Thumbnails shown at once in the page picker
+PICKER_COLUMNS = 6
+
+def _job_panel(job, key):
     """
-    Fixes common Tamil OCR errors.
+    Live status, per-page previews and downloads for a background job.
+    `key` namespaces the widgets and session state ("pdf" -> st.session_state["pdf_job"]).
     """
-    if not text:
-        return text
-        
-    # Common replacements (Context-aware if possible, but simple string replace for now)
-    corrections = {
-        "இரசு": "அரசு",
-        "இராஜ": "ராஜ",
-        # Add more common misreadings here
+    # The fragment ticks while the job runs; once it ends, rerun the app once
+    # so the panel is rebuilt without the timer.
+    if not job.is_running and st.session_state.get(f"{key}_job_ticking"):
+        st.session_state[f"{key}_job_ticking"] = False
+        st.rerun()
+
+    for notice in job.notices:
+        st.warning(notice)
+
+    progress = job.completed / max(job.total_pages, 1)
+    st.progress(int(progress * 100))
+    if job.is_running:
+        position = scheduler.queue_position(job.scheduler_job_id)
+        if position:
+            show_queue_status(st, position, scheduler.estimated_wait(job.scheduler_job_id))
+        elif job.memory_wait:
+            show_memory_status(st, job.memory_wait.get("used", 0), job.memory_wait.get("budget", 0))
+        else:
+            st.markdown(f"<p style='color: #34d399;'>Converted {job.completed}/{job.total_pages} pages of {job.name}...</p>", unsafe_allow_html=True)
+        if st.button("Cancel Conversion", key=f"btn_{key}_cancel"):
+            job.cancel()
+    elif job.status == "done":
+        st.markdown("<p style='color: #34d399;'>Conversion Complete!</p>", unsafe_allow_html=True)
+    elif job.status == "cancelled":
+        st.warning(f"Conversion cancelled after {job.completed} of {job.total_pages} pages.")
+    else:
+        st.error(f"An error occurred: {job.error}")
+
+    for i, message in sorted(job.page_errors.items()):
+        st.error(f"Error on page {job.page_number(i)}: {message}")
+
+    base_name = os.path.splitext(job.name)[0]
+    if job.status == "done":
+        st.success("✅ Document converted successfully!")
+        if job.result is not None:
+            # Saved to the result store: serve from disk and drop the in-memory copies
+            job.docx_bytes = job.json_bytes = job.pdf_bytes = None
+            download_buttons(stored_files(job.result), key)
+        else:
+            download_buttons({kind: (base_name + OUTPUTS[kind][0], data)
+                              for kind, data in job.outputs().items() if data}, key)
+    elif job.completed:
+        # Building a DOCX costs time, so it is only prepared on request
+        done_pages = format_page_ranges(job.page_number(i) for i in range(job.completed))
+        if st.button(f"Prepare Download of Pages {done_pages}", key=f"btn_{key}_partial"):
+            st.session_state[f"{key}_partial"] = (done_pages, job.partial_docx_bytes())
+        partial = st.session_state.get(f"{key}_partial")
+        if partial:
+            st.download_button(
+                label=f"⬇️ Download Pages {partial[0]} (partial)",
+                data=partial[1],
+                file_name=f"{base_name}_pages_{partial[0].replace(',', '_')}.docx",
+                mime=DOCX_MIME,
+                key=f"dl_{key}_partial"
+            )
+
+    # Recognised text appears as soon as each page finishes
+    finished = sorted(job.page_texts)
+    if finished:
+        show_all = st.checkbox("Show all converted pages", key=f"{key}_preview_all")
+        for i in (finished if show_all else finished[-PREVIEW_PAGES:]):
+            with st.expander(job.page_label(i), expanded=(i == finished[-1])):
+                st.text(job.page_texts[i] or "(no text detected)")
+
+def stored_files(meta):
+    """{kind: (file name, loader)} for a result store entry; files are read only when downloaded."""
+    return {
+        kind: (info["file_name"], lambda k=kind: result_store.read(SESSION_ID, meta["job_id"], k) or b"")
+        for kind, info in meta["files"].items()
     }
+
+def download_buttons(files, key):
+    """One download button per output ({kind: (file name, bytes or loader)}), in OUTPUTS order."""
+    for kind in OUTPUTS:
+        if kind in files:
+            file_name, data = files[kind]
+            st.download_button(
+                label=f"⬇️ Download {OUTPUTS[kind][2]}",
+                data=data,
+                file_name=file_name,
+                mime=OUTPUTS[kind][1],
+                key=f"dl_{key}_{kind}",
+                help=DOWNLOAD_HELP.get(kind)
+            )
+
+@st.cache_data(max_entries=8, show_spinner="Rendering page thumbnails...")
+def pdf_page_thumbnails(file_id, _pdf_bytes):
+    """Low-DPI JPEG thumbnails of an uploaded PDF, rendered once per upload (keyed by its file id)."""
+    return render_pdf_thumbnails(_pdf_bytes, POPPLER_PATH)
+
+def show_page_picker(thumbnails, selected_pages):
+    """Thumbnail grid, PICKER_PAGES at a time, with the selected pages marked."""
+    selected = set(selected_pages)
+    start = 0
+    if len(thumbnails) > PICKER_PAGES:
+        groups = list(range(0, len(thumbnails), PICKER_PAGES))
+        start = st.selectbox(
+            "Browse pages",
+            groups,
+            format_func=lambda g: f"Pages {g + 1}-{min(g + PICKER_PAGES, len(thumbnails))}",
+            key="pdf_picker_group"
+        )
+    columns = st.columns(PICKER_COLUMNS)
+    for i, thumbnail in enumerate(thumbnails[start:start + PICKER_PAGES]):
+        page = start + i + 1
+        columns[i % PICKER_COLUMNS].image(thumbnail, caption=f"✅ {page}" if page in selected else str(page))
+
+def show_job(key):
+    job = st.session_state.get(f"{key}_job")
+    if job is None:
+        return
+    st.session_state[f"{key}_job_ticking"] = job.is_running
+    st.fragment(_job_panel, run_every=1.0 if job.is_running else None)(job, key)
+
+def start_job(key, job, source, page_bytes, preprocess_kwargs, sha256):
+    """
+    Runs `source` through the conversion pipeline on a background thread and
+    stores the job under st.session_state[f"{key}_job"]. `page_bytes[i]` is
+    page i's predicted memory footprint; the finished job is added to the
+    search index under `sha256` (unless None) and its outputs to the result store.
+    """
+    session_id = SESSION_ID
+    admit_page, release_page = scheduled_hooks(job, scheduler, governor, session_id, page_bytes)
     
-    for wrong, right in corrections.items():
-        text = text.replace(wrong, right)
-        
-    return text
+    def finish_job(j):
+        scheduler.finish(j.scheduler_job_id)
+        if j.status == "done":
+            try:
+                j.result = result_store.save(session_id, j.job_id, j.name, j.outputs(), pages=j.total_pages)
+            except Exception as e:
+                j.notices.append(f"Could not keep this result for later downloads: {e}")
+        if j.status == "done" and sha256 is not None and j.page_errors:
+            # Indexed content is keyed by hash, so a partial entry would block the full one later
+            j.notices.append(f"Not added to the search index because {len(j.page_errors)} page(s) failed; "
+                             "convert it again to index it.")
+        elif j.status == "done" and sha256 is not None:
+            try:
+                j.index_into(get_search_index(), f"upload:{sha256}", sha256)
+            except Exception as e:
+                j.notices.append(f"Could not add this document to the search index: {e}")
+    
+    pipeline = ConversionPipeline(
+        source,
+        preprocess_kwargs=preprocess_kwargs,
+        config=f"{TESSDATA_CONFIG} {ocr_profile.tesseract_config()}".strip(),
+        tesseract_cmd=TESSERACT_CMD,
+        admit=admit_page,
+        release=release_page,
+        searchable_pdf=make_searchable_pdf,
+        thumbnails=True,
+        reuse_regions=reuse_regions,
+        second_pass_dpi=second_pass_dpi,
+        trace=trace_store.new_trace(job.name)
+    )
+    
+    previous = st.session_state.get(f"{key}_job")
+    if previous is not None and previous.is_running:
+        previous.cancel()
+    st.session_state.pop(f"{key}_partial", None)
+    st.session_state[f"{key}_job"] = job.start(pipeline, on_finish=finish_job)
 
+@st.cache_data
 def get_base64_of_bin_file(bin_file):
     with open(bin_file, 'rb') as f:
         data = f.read()
@@ -386,203 +646,15 @@ st.markdown(f"""
 # Logic Functions
 # ==============================================================================
 
-def preprocess_image(pil_image, upscale_factor=1.0, mode="Standard (Auto)"):
-    open_cv_image = np.array(pil_image) 
-    if len(open_cv_image.shape) == 3:
-        open_cv_image = open_cv_image[:, :, ::-1].copy()
-
-    # Upscale if requested (for better OCR on small text)
-    if upscale_factor > 1.0:
-        height, width = open_cv_image.shape[:2]
-        new_width = int(width * upscale_factor)
-        new_height = int(height * upscale_factor)
-        open_cv_image = cv2.resize(open_cv_image, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-
-    gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
-    
-    # Enhancement Modes
-    if mode == "Denoise & Sharpen":
-        # Denoise
-        gray = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-        # Sharpen
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        gray = cv2.filter2D(gray, -1, kernel)
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-    elif mode == "Thicken Text (Dilation)":
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        # Invert for morphological operations (text needs to be white)
-        thresh = cv2.bitwise_not(thresh)
-        kernel = np.ones((2,2), np.uint8)
-        thresh = cv2.dilate(thresh, kernel, iterations=1)
-        thresh = cv2.bitwise_not(thresh)
-        
-    elif mode == "Thin Text (Erosion)":
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        # Invert
-        thresh = cv2.bitwise_not(thresh)
-        kernel = np.ones((2,2), np.uint8)
-        thresh = cv2.erode(thresh, kernel, iterations=1)
-        thresh = cv2.bitwise_not(thresh)
-        
-    else: # Standard (Auto)
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-    return Image.fromarray(thresh)
-
-def parse_bbox(title_str):
-    if not title_str:
-        return None
-    match = re.search(r'bbox (\d+) (\d+) (\d+) (\d+)', title_str)
-    if match:
-        return [int(g) for g in match.groups()]
-    return None
-
-def hocr_to_docx(hocr_content, doc, page_num):
-    """
-    Robust HOCR parser that handles both PDF-based and Image-based HOCR outputs.
-    Optimized for Script/Screenplay formatting (Tamil/English).
-    """
-    soup = BeautifulSoup(hocr_content, 'lxml')
-    
-    # 1. Determine Page Width
-    page_width = 1000  # Default fallback
-    page_div = soup.find('div', class_='ocr_page')
-    if page_div:
-        bbox = parse_bbox(page_div.get('title'))
-        if bbox:
-            page_width = bbox[2] - bbox[0]
-
-    # 2. Extract Lines Directly (Stricter Line Preservation)
-    # Instead of relying on paragraphs, we iterate lines to preserve script formatting exactly.
-    lines = soup.find_all('span', class_='ocr_line')
-    
-    has_content = False
-    
-    for line in lines:
-        # Check if line has actual text
-        words = line.find_all('span', class_='ocrx_word')
-        line_text_parts = []
-        for word in words:
-            text = word.get_text().strip()
-            if text:
-                line_text_parts.append(text)
-        
-        full_text = " ".join(line_text_parts).strip()
-        
-        if not full_text:
-            continue
-            
-        # Auto-Correction
-        if enable_corrections:
-            full_text = correct_tamil_errors(full_text)
-
-        docx_p = doc.add_paragraph()
-        docx_p.paragraph_format.space_after = Pt(0) # Minimal spacing between lines to mimic PDF tight layout if needed, or Pt(6) for readabilty. 
-        # For scripts, usually single spacing within blocks, double between blocks. 
-        # But since we are mapping 1 line -> 1 para, let's keep it tight? 
-        # User complained about "proper formatting", usually implies it looks like the PDF.
-        # Let's use small space after.
-        docx_p.paragraph_format.space_after = Pt(2)
-
-        # Layout Analysis (Alignment/Indent)
-        bbox = parse_bbox(line.get('title'))
-        align = WD_ALIGN_PARAGRAPH.LEFT
-        indent = 0
-        
-        if bbox:
-            x0, y0, x1, y1 = bbox
-            x_center = (x0 + x1) / 2
-            page_center = page_width / 2
-            
-            # Script formatting heuristics
-            # Center alignment check (Relaxed tolerance to 20% to capture loosely centered text)
-            if abs(x_center - page_center) < (page_width * 0.20):
-                align = WD_ALIGN_PARAGRAPH.CENTER
-            elif x1 > (page_width * 0.9) and x0 > (page_width * 0.6):
-                align = WD_ALIGN_PARAGRAPH.RIGHT
-            elif x0 > (page_width * 0.1):
-                indent_ratio = x0 / page_width
-                indent_inches = indent_ratio * 8.27
-                indent = min(indent_inches, 4.0)
-
-        docx_p.alignment = align
-        if indent > 0:
-            docx_p.paragraph_format.left_indent = Inches(indent)
-
-        has_content = True
-        
-        # Script Dialogue Detection: "Name : Dialogue"
-        # Pattern: Start of line, some text, spaces, colon, spaces, rest of text
-        # We want to bold the "Name :" part
-        dialogue_match = re.match(r'^([^:]+)(\s*:\s*)(.*)$', full_text)
-        
-        # Heuristic: Name shouldn't be too long (e.g. < 30 chars) to avoid false positives on regular sentences with colons
-        is_dialogue = False
-        if dialogue_match and len(dialogue_match.group(1)) < 30:
-            is_dialogue = True
-            name_part = dialogue_match.group(1)
-            separator = dialogue_match.group(2)
-            content_part = dialogue_match.group(3)
-            
-            # Add Name (Bold)
-            run_name = docx_p.add_run(name_part)
-            run_name.font.size = Pt(11)
-            run_name.bold = True
-            
-            # Add Separator (Regular)
-            run_sep = docx_p.add_run(separator)
-            run_sep.font.size = Pt(11)
-            
-            # Add Content (Regular)
-            run_content = docx_p.add_run(content_part)
-            run_content.font.size = Pt(11)
-            
-        else:
-            # Regular processing
-            run = docx_p.add_run(full_text)
-            run.font.size = Pt(11)
-            
-            # Basic styling heuristics for Headers/Scenes
-            # 1. Short, Uppercase, Centered -> Likely Character Name (Standard format) or Title
-            if len(full_text) < 50 and full_text.isupper() and align == WD_ALIGN_PARAGRAPH.CENTER:
-                run.bold = True
-            
-            # 2. Explicit Scene Headings
-            if any(keyword in full_text.upper() for keyword in ["SCENE:", "LOCATION:", "EFFECTS:", "காட்சி:", "இடம்:", "நேரம்:"]):
-                run.bold = True
-                
-            # 3. Scene Summary Headers (Tamil)
-            if "காட்சிச்சுருக்கம்" in full_text:
-                run.bold = True
-
-
-    # Fallback if HOCR failed to produce any text
-    if not has_content:
-        # Try raw text extraction if HOCR layout failed
-        raw_text = soup.get_text()
-        if raw_text.strip():
-             doc.add_paragraph(raw_text.strip())
-             has_content = True
-
-    # Footer
-    if page_num > 0:
-        section = doc.sections[-1]
-        footer = section.footer
-        # Clear existing footer content if any (to avoid duplicates in loop)
-        for p in footer.paragraphs:
-            p.text = ""
-        footer_p = footer.add_paragraph()
-        footer_p.text = f"Page {page_num}"
-        footer_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    return has_content
+# Page preprocessing, hOCR parsing and DOCX formatting live in conversion_core.py
+# (shared with pdf_to_docx.py).
 
 # ==============================================================================
 # Main UI
 # ==============================================================================
 
-tab1, tab2, tab3 = st.tabs(["📄 PDF to Word", "🖼️ Image to Word", "📑 Merge PDFs"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📄 PDF to Word", "🖼️ Image to Word", "📑 Merge PDFs", "🗜️ Compress PDF",
+                                              "🔎 Search", "🕘 Recent"])
 
 # ------------------------------------------------------------------------------
 # Tab 1: PDF to Word
@@ -595,66 +667,72 @@ with tab1:
     uploaded_pdf = st.file_uploader("Choose a PDF file", type="pdf", label_visibility="collapsed", key="pdf_uploader")
 
     if uploaded_pdf is not None:
+        page_choice = st.radio("Pages", ["All pages", "Selected pages"], horizontal=True, key="pdf_page_choice",
+                               help="Convert only revised pages: conversion time is proportional to the pages chosen.")
+        selected_pages = None
+        if page_choice == "Selected pages":
+            try:
+                thumbnails = pdf_page_thumbnails(uploaded_pdf.file_id, uploaded_pdf.getbuffer())
+            except Exception as e:
+                st.error(f"Could not render page thumbnails: {e}")
+                st.stop()
+            page_spec = st.text_input("Pages to convert", placeholder="e.g. 12-18, 40", key="pdf_page_spec")
+            selected_pages = []
+            if page_spec.strip():
+                try:
+                    selected_pages = parse_page_ranges(page_spec, len(thumbnails))
+                    st.caption(f"{len(selected_pages)} of {len(thumbnails)} pages selected.")
+                except ValueError as e:
+                    st.error(str(e))
+            show_page_picker(thumbnails, selected_pages)
+        
         if st.button("Start Conversion", key="btn_pdf"):
+            from pypdf import PdfReader
             try:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                status_text.markdown("<p style='color: #34d399;'>Initializing...</p>", unsafe_allow_html=True)
-                
-                file_bytes = uploaded_pdf.read()
+                if selected_pages == []:
+                    st.error("Enter the pages to convert, e.g. 12-18, 40.")
+                    st.stop()
+                file_bytes = uploaded_pdf.getvalue()
                 # Quick Poppler validation
                 if POPPLER_PATH and not os.path.exists(os.path.join(POPPLER_PATH, "pdftoppm.exe")):
                     st.error("Poppler not found. Please install Poppler and set POPPLER_PATH to its bin folder.")
                     st.stop()
                 
+                pdf_reader = PdfReader(io.BytesIO(file_bytes))
+                page_sizes = page_sizes_from_reader(pdf_reader)
+                pages = selected_pages or list(range(1, len(page_sizes) + 1))
+                name = uploaded_pdf.name
+                if selected_pages:
+                    stem = os.path.splitext(name)[0]
+                    name = f"{stem}_pages_{format_page_ranges(selected_pages).replace(',', '_')}.pdf"
+                job = ConversionJob(name, len(pages), corrections=enable_corrections, source_pages=selected_pages)
+                
                 # Warn for extremely high DPI
                 if pdf_dpi > 450:
-                    st.warning("High DPI selected. Conversion may take longer.")
-                
-                # Convert page-by-page to avoid long initialization and show progress
-                reader_stream = io.BytesIO(file_bytes)
-                pdf_reader = PdfReader(reader_stream)
-                total_pages = len(pdf_reader.pages)
-                doc = Document()
+                    job.notices.append("High DPI selected. Conversion may take longer.")
                 
-                for i in range(total_pages):
-                    status_text.markdown(f"<p style='color: #34d399;'>Converting page {i+1}/{total_pages} (DPI {pdf_dpi})...</p>", unsafe_allow_html=True)
-                    progress_bar.progress(int((i / max(total_pages, 1)) * 100))
-                    # Render only the current page
-                    imgs = convert_from_bytes(file_bytes, poppler_path=POPPLER_PATH, dpi=pdf_dpi, first_page=i+1, last_page=i+1)
-                    image = imgs[0]
-                    
-                    processed_img = preprocess_image(image, upscale_factor=1.0, mode=enhancement_mode)
-                    try:
-                        hocr = pytesseract.image_to_pdf_or_hocr(
-                            processed_img,
-                            extension='hocr',
-                            lang='eng+tam',
-                            config=TESSDATA_CONFIG + " -c hocr_font_info=1"
-                        )
-                        hocr_to_docx(hocr, doc, i + 1)
-                        if i < total_pages - 1:
-                            doc.add_page_break()
-                    except Exception as e:
-                        st.error(f"Error on page {i+1}: {e}")
+                # Predict each page's raster footprint and lower DPI where it would not fit
+                page_plans = [governor.plan_dpi(*page_sizes[page - 1], pdf_dpi) for page in pages]
+                lowered = [i for i, (dpi, _) in enumerate(page_plans) if dpi < pdf_dpi]
+                if lowered:
+                    job.notices.append(f"Memory limit: {len(lowered)} large page(s) will be rendered at reduced DPI "
+                                       f"(e.g. page {pages[lowered[0]]} at {page_plans[lowered[0]][0]} DPI).")
                 
-                progress_bar.progress(100)
-                status_text.markdown("<p style='color: #34d399;'>Conversion Complete!</p>", unsafe_allow_html=True)
-                
-                docx_buffer = io.BytesIO()
-                doc.save(docx_buffer)
-                docx_buffer.seek(0)
-                
-                st.success("✅ Document converted successfully!")
-                st.download_button(
-                    label="⬇️ Download Word Document",
-                    data=docx_buffer,
-                    file_name=f"{os.path.splitext(uploaded_pdf.name)[0]}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                start_job(
+                    "pdf", job,
+                    PdfSource(pdf_bytes=file_bytes, poppler_path=POPPLER_PATH, page_dpis=[dpi for dpi, _ in page_plans],
+                              pages=selected_pages),
+                    page_bytes=[nbytes for _, nbytes in page_plans],
+                    preprocess_kwargs={"upscale_factor": 1.0, "mode": enhancement_mode},
+                    # Only complete documents go into the search index
+                    sha256=None if selected_pages else sha256_of_bytes(file_bytes)
                 )
                 
             except Exception as e:
                 st.error(f"An error occurred: {e}")
+    
+    # The job keeps running across reruns (downloads, widget changes); the panel polls it
+    show_job("pdf")
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ------------------------------------------------------------------------------
@@ -663,61 +741,55 @@ with tab1:
 with tab2:
     st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
     st.markdown("<h3>Convert Image to Word</h3>", unsafe_allow_html=True)
-    st.markdown("<p>Extract text from images (JPG/PNG) into editable Word documents.</p>", unsafe_allow_html=True)
-
-    uploaded_img = st.file_uploader("Choose an Image", type=["jpg", "jpeg", "png"], label_visibility="collapsed", key="img_uploader")
-
-    if uploaded_img is not None:
+    st.markdown("<p>Extract text from images (JPG/PNG) into editable Word documents. Select several photos to get one multi-page document.</p>", unsafe_allow_html=True)
+
+    uploaded_imgs = st.file_uploader("Choose images", type=["jpg", "jpeg", "png"], accept_multiple_files=True,
+                                     label_visibility="collapsed", key="img_uploader")
+
+    if uploaded_imgs:
+        order_label = st.radio("Page order", ["File name", "Photo time (EXIF)"], horizontal=True, key="img_order",
+                               help="Photo time uses the capture time stored by the phone; images without one go last.")
+        # getbuffer() shares the upload's memory: no copy per rerun, and render
+        # threads never touch the upload's file position
+        images = order_images([(f.name, f.getbuffer()) for f in uploaded_imgs],
+                              by="exif" if order_label.startswith("Photo") else "name")
+        if len(images) > 1:
+            st.caption("Order: " + ", ".join(name for name, _ in images[:6]) + (" ..." if len(images) > 6 else ""))
+        
         if st.button("Start Conversion", key="btn_img"):
+            from PIL import Image
             try:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                status_text.markdown("<p style='color: #34d399;'>Processing Image...</p>", unsafe_allow_html=True)
+                # Image.open only reads the header, so sizes are known before decoding;
+                # each image's upscale is lowered where it would not fit the memory budget
+                plans = []
+                for _, data in images:
+                    with Image.open(io.BytesIO(data)) as img:
+                        plans.append(governor.plan_upscale(img.width, img.height, img_upscale_factor))
                 
-                image = Image.open(uploaded_img)
-                # Use upscale factor from sidebar
-                processed_img = preprocess_image(image, upscale_factor=img_upscale_factor, mode=enhancement_mode)
-                
-                doc = Document()
-                
-                try:
-                    # Get HOCR
-                    hocr = pytesseract.image_to_pdf_or_hocr(
-                        processed_img, 
-                        extension='hocr',
-                        lang='eng+tam',
-                        config=TESSDATA_CONFIG + " -c hocr_font_info=1"
-                    )
-                    
-                    # Debug: Check if HOCR is valid
-                    if not hocr or len(hocr) < 10:
-                        st.warning("OCR warning: Low confidence or empty output from Tesseract.")
-                    
-                    # Convert
-                    has_content = hocr_to_docx(hocr, doc, 0) # 0 = no page number for single image
-                    
-                    if not has_content:
-                         st.warning("No text could be detected in this image.")
-                    else:
-                        progress_bar.progress(100)
-                        status_text.markdown("<p style='color: #34d399;'>Conversion Complete!</p>", unsafe_allow_html=True)
-                        
-                        docx_buffer = io.BytesIO()
-                        doc.save(docx_buffer)
-                        docx_buffer.seek(0)
-                        
-                        st.success("✅ Image converted successfully!")
-                        st.download_button(
-                            label="⬇️ Download Word Document",
-                            data=docx_buffer,
-                            file_name=f"{os.path.splitext(uploaded_img.name)[0]}.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        )
-                except Exception as e:
-                    st.error(f"OCR Logic Error: {e}")
+                names = [name for name, _ in images]
+                stems = [os.path.splitext(name)[0] for name in names]
+                job = ConversionJob(
+                    stems[0] if len(images) == 1 else f"{stems[0]}-{stems[-1]}",
+                    len(images),
+                    corrections=enable_corrections,
+                    page_names=names,
+                    page_numbers=len(images) > 1  # A single image gets no page footer
+                )
+                reduced = [names[i] for i, (factor, _) in enumerate(plans) if factor < img_upscale_factor]
+                if reduced:
+                    job.notices.append(f"Memory limit: upscaling reduced for {len(reduced)} large image(s) (e.g. {reduced[0]}).")
                 
+                start_job(
+                    "img", job,
+                    ImageSource(images, page_upscales=[factor for factor, _ in plans]),
+                    page_bytes=[nbytes for _, nbytes in plans],
+                    preprocess_kwargs={"mode": enhancement_mode},
+                    sha256=sha256_of_parts(data for _, data in images)
+                )
             except Exception as e:
                 st.error(f"An error occurred: {e}")
+    
+    show_job("img")
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ------------------------------------------------------------------------------
@@ -732,6 +804,7 @@ with tab3:
 
     if uploaded_pdfs:
         if st.button("Merge PDFs", key="btn_merge"):
+            from pypdf import PdfWriter, PdfReader
             try:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
@@ -765,5 +838,135 @@ with tab3:
                 st.error(f"Merge Error: {e}")
     st.markdown("</div>", unsafe_allow_html=True)
 
+# ------------------------------------------------------------------------------
+# Tab 4: Compress scanned PDFs
+# ------------------------------------------------------------------------------
+with tab4:
+    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+    st.markdown("<h3>Compress Scanned PDFs</h3>", unsafe_allow_html=True)
+    st.markdown("<p>Rewrite scanned pages as sharp black-and-white images (CCITT G4), usually a fraction of the size.</p>",
+                unsafe_allow_html=True)
+
+    compress_files = st.file_uploader("Choose PDF files", type="pdf", accept_multiple_files=True,
+                                      label_visibility="collapsed", key="compress_uploader")
+    compress_dpi = st.select_slider("Output resolution (DPI)", options=[150, 200, 300, 400, 600],
+                                    value=DEFAULT_COMPRESS_DPI,
+                                    help="300 DPI keeps small print legible; lower values give smaller files.")
+    compress_ocr = st.checkbox("Keep searchable text layer (OCR)", value=False, key="compress_ocr",
+                               help="Adds invisible text from Tesseract so the compressed PDF can be searched and "
+                                    "copied. Much slower than compression alone.")
+    st.caption(f"Pages are binarised with the sidebar's Text Enhancement Mode ({enhancement_mode}).")
+
+    # Kept across reruns so every file stays downloadable after one download button is clicked
+    compress_results = st.session_state.setdefault("compress_results", {})
+    if compress_files and st.button("Compress PDFs", key="btn_compress"):
+        import tempfile
+        from pypdf import PdfReader
+
+        compress_results.clear()
+        for pdf in compress_files:
+            pdf_bytes = pdf.getvalue()
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            status_text.markdown(f"<p style='color: #34d399;'>Compressing {pdf.name}...</p>", unsafe_allow_html=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+            job_id = None
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(pdf_bytes)
+                page_count = len(PdfReader(tmp_path).pages)
+                # Pages share the server's fair-share slots with conversions
+                job_id = scheduler.submit(SESSION_ID, page_count)
+                slot_started = {}
+
+                def admit_page(i, job_id=job_id, slot_started=slot_started):
+                    if not scheduler.acquire(job_id):
+                        return False
+                    slot_started[i] = time.time()
+                    return True
+
+                def release_page(i, job_id=job_id, slot_started=slot_started):
+                    scheduler.release(job_id, elapsed=time.time() - slot_started.pop(i))
+
+                data = compress_pdf(
+                    tmp_path, dpi=compress_dpi, mode=enhancement_mode, text_layer=compress_ocr,
+                    config=f"{TESSDATA_CONFIG} {ocr_profile.tesseract_config()}".strip(),
+                    poppler_path=POPPLER_PATH, tesseract_cmd=TESSERACT_CMD,
+                    admit=admit_page,
+                    release=release_page,
+                    on_page=lambda done, total: progress_bar.progress(int(done / total * 100))
+                )
+                report = size_report(len(pdf_bytes), len(data))
+                status_text.markdown(f"<p style='color: #34d399;'>{pdf.name}: {report}</p>", unsafe_allow_html=True)
+                compress_results[pdf.file_id] = (f"{os.path.splitext(pdf.name)[0]}_compressed.pdf", data, report)
+            except Exception as e:
+                st.error(f"Compression Error ({pdf.name}): {e}")
+            finally:
+                if job_id is not None:
+                    scheduler.finish(job_id)
+                os.remove(tmp_path)
+    if compress_files:
+        for file_id, (file_name, data, report) in compress_results.items():
+            st.download_button(
+                label=f"⬇️ {file_name}",
+                data=data,
+                file_name=file_name,
+                mime="application/pdf",
+                key=f"dl_compressed_{file_id}"
+            )
+            st.caption(report)
+    else:
+        compress_results.clear()
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ------------------------------------------------------------------------------
+# Tab 5: Search converted documents
+# ------------------------------------------------------------------------------
+with tab5:
+    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+    st.markdown("<h3>Search Converted Scripts</h3>", unsafe_allow_html=True)
+    st.markdown("<p>Find a line in any document converted on this server (Tamil or English).</p>", unsafe_allow_html=True)
+
+    query = st.text_input("Search", placeholder="e.g. கோவில் or scene 42", label_visibility="collapsed", key="search_query")
+    search_index = get_search_index()
+
+    if query.strip():
+        start = time.perf_counter()
+        hits = search_index.search(query, limit=SEARCH_LIMIT)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.caption(f"{len(hits)} result(s) in {elapsed_ms:.0f} ms"
+                   + (f" (showing the first {SEARCH_LIMIT})" if len(hits) == SEARCH_LIMIT else ""))
+        for hit in hits:
+            thumb_col, text_col = st.columns([1, 5])
+            thumbnail = search_index.thumbnail(hit["doc_id"], hit["page"])
+            if thumbnail:
+                thumb_col.image(thumbnail)
+            text_col.markdown(f"**{hit['name']}** - page {hit['page']}, line {hit['line']}")
+            text_col.markdown(hit["snippet"])
+    else:
+        stats = search_index.stats()
+        st.caption(f"{stats['documents']} document(s), {stats['pages']} page(s) indexed.")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ------------------------------------------------------------------------------
+# Tab 6: Recent conversions (from the result store)
+# ------------------------------------------------------------------------------
+with tab6:
+    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+    st.markdown("<h3>Recent Conversions</h3>", unsafe_allow_html=True)
+    ttl_hours = result_store.ttl_seconds / 3600
+    st.markdown(f"<p>Download your finished documents again without converting. "
+                f"Results are kept for {ttl_hours:g} hours.</p>", unsafe_allow_html=True)
+    entries = result_store.recent(SESSION_ID)
+    for meta in entries:
+        created = time.strftime("%d %b %H:%M", time.localtime(meta["created"]))
+        with st.expander(f"{meta['name']} - {meta['pages']} page(s), {created}"):
+            download_buttons(stored_files(meta), f"recent_{meta['job_id']}")
+    if entries:
+        st.caption("Bookmark this page to get back to these results from another tab or after a restart.")
+    else:
+        st.caption("No finished conversions yet.")
+    st.markdown("</div>", unsafe_allow_html=True)
+
 # Security Note
 st.markdown("<div class='security-note'>🔒 All processing is done locally on this machine. No data is uploaded to external servers.</div>", unsafe_allow_html=True)
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import threading
+
+from search_index import sha256_of_file
+
+# ==============================================================================
+# Incremental Batch Manifest
+# ==============================================================================
+# `pdf_to_docx.py <dir>` walks the folder tree and records, per PDF, its size,
+# mtime and SHA-256, the conversion settings and the outputs written, in
+# <dir>/.pdf_to_docx_manifest.json. A later run skips a PDF when its entry
+# matches and every output still exists, like make: size and mtime are checked
+# first, and the file is only hashed when they changed (a touched but
+# identical PDF is not converted again). Changed settings reconvert everything.
+
+MANIFEST_NAME = ".pdf_to_docx_manifest.json"
+MANIFEST_VERSION = 1
+
+# Files this tool writes next to its inputs; never treated as inputs
+GENERATED_SUFFIXES = ("_searchable.pdf", "_compressed.pdf")
+
+
+def find_pdfs(root):
+    """PDFs under `root` (recursive, sorted), skipping hidden folders and generated PDFs."""
+    found = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.lower().endswith(".pdf") and not name.lower().endswith(GENERATED_SUFFIXES):
+                found.append(os.path.join(folder, name))
+    return found
+
+
+class BatchManifest:
+    """What each PDF under a batch folder was converted with. Thread-safe."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self._entries = data["files"]
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable manifest: everything is converted
+
+    def _key(self, pdf):
+        return os.path.relpath(os.path.abspath(pdf), self.root).replace(os.sep, "/")
+
+    def is_current(self, pdf, settings, outputs):
+        """
+        True if `pdf` was converted with `settings` into `outputs` (paths,
+        None entries ignored) and has not changed since.
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(pdf))
+        if entry is None or entry["settings"] != settings:
+            return False
+        if entry["outputs"] != sorted(self._key(p) for p in outputs if p):
+            return False
+        if not all(os.path.exists(p) for p in outputs if p):
+            return False
+        stat = os.stat(pdf)
+        if (stat.st_size, stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+            return True
+        if stat.st_size != entry["size"] or sha256_of_file(pdf) != entry["sha256"]:
+            return False
+        with self._lock:  # Touched but identical: remember the new mtime, skip hashing next time
+            entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def fingerprint(self, pdf):
+        """(size, mtime_ns, sha256) of `pdf`; take it before converting so edits made meanwhile are noticed."""
+        stat = os.stat(pdf)
+        return stat.st_size, stat.st_mtime_ns, sha256_of_file(pdf)
+
+    def record(self, pdf, settings, outputs, fingerprint):
+        """Marks `pdf` as converted; `fingerprint` comes from fingerprint() before the conversion."""
+        size, mtime_ns, sha256 = fingerprint
+        entry = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "settings": settings,
+            "outputs": sorted(self._key(p) for p in outputs if p),
+            "converted": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with self._lock:
+            self._entries[self._key(pdf)] = entry
+
+    def forget(self, pdf):
+        """Drops `pdf` (e.g. after a failed conversion) so the next run retries it."""
+        with self._lock:
+            self._entries.pop(self._key(pdf), None)
+
+    def save(self):
+        """Writes the manifest atomically; entries of PDFs that no longer exist are dropped."""
+        with self._lock:
+            files = {key: entry for key, entry in self._entries.items()
+                     if os.path.exists(os.path.join(self.root, key))}
+            staging = self.path + ".tmp"
+            with open(staging, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=1, sort_keys=True)
+            os.replace(staging, self.path)
@@ -0,0 +1,83 @@
+import os
+import io
+import sys
+import time
+import argparse
+import statistics
+
+from conversion_core import (load_engine_config, preprocess_image, ocr_page_outputs, pnm_bytes, hocr_to_text,
+                             OCR_TRANSPORTS)
+from ocr_profiles import PROFILES, get_profile
+
+# Measures the per-page cost of handing preprocessed pages to Tesseract:
+# "png" (pytesseract's temp-file PNG) against "pnm" (raw PBM/PGM on stdin,
+# the default). Pages are OCR'd one at a time in this process, so the numbers
+# are per-page latency without pool contention.
+# Run from the project folder: python bench_ocr_transport.py [sample.pdf] [--repeats N]
+
+
+def encode_ms(image, transport, repeats):
+    """Median time to encode one page for the transport (PNG is what pytesseract writes)."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        if transport == "png":
+            image.save(io.BytesIO(), "PNG")
+        else:
+            pnm_bytes(image)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    tesseract_cmd, poppler_path, tessdata_config = load_engine_config()
+    parser = argparse.ArgumentParser(description="Compare Tesseract input transports per page.")
+    parser.add_argument("sample", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_document.pdf"),
+                        help="PDF with typical pages (first 4 pages are used)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None)
+    parser.add_argument("--dpi", type=int, default=None, help="Rendering DPI (default: the profile's)")
+    parser.add_argument("--repeats", type=int, default=3, help="OCR runs per page and transport (median is reported)")
+    parser.add_argument("--formats", default="hocr", help="Tesseract renderers, e.g. 'hocr pdf'")
+    args = parser.parse_args()
+
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    profile = get_profile(args.profile)
+    dpi = args.dpi or profile.dpi
+    config = f"{tessdata_config} {profile.tesseract_config()}".strip()
+    formats = tuple(args.formats.split())
+    pages = [preprocess_image(image, **profile.preprocess_kwargs(upscale_factor=1.0))
+             for image in convert_from_path(args.sample, dpi=dpi, poppler_path=poppler_path, last_page=4)]
+    print(f"{len(pages)} pages of {args.sample} at {dpi} DPI ({pages[0].width}x{pages[0].height}), "
+          f"profile {profile.label}, outputs {' '.join(formats)}")
+
+    results = {}
+    for transport in OCR_TRANSPORTS:
+        ocr_ms, texts = [], []
+        for page in pages:
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                outputs = ocr_page_outputs(page, config=config, formats=formats, dpi=dpi, transport=transport)
+                timings.append(time.perf_counter() - start)
+            ocr_ms.append(statistics.median(timings) * 1000)
+            if "hocr" in outputs:
+                texts.append(hocr_to_text(outputs["hocr"], corrections=False))
+        results[transport] = (statistics.mean(ocr_ms), statistics.mean(encode_ms(p, transport, args.repeats) for p in pages),
+                              texts)
+
+    print(f"{'Transport':>10}{'Encode ms':>12}{'Page ms':>10}")
+    for transport, (page_ms, enc_ms, _) in results.items():
+        print(f"{transport:>10}{enc_ms:>12.1f}{page_ms:>10.1f}")
+    png_ms, pnm_ms = results["png"][0], results["pnm"][0]
+    print(f"Saving per page: {png_ms - pnm_ms:.1f} ms ({100 * (png_ms - pnm_ms) / png_ms:.1f}%)")
+    if results["png"][2] != results["pnm"][2]:
+        print("Warning: recognised text differs between transports")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
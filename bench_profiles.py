@@ -0,0 +1,144 @@
+import os
+import sys
+import glob
+import time
+import argparse
+
+from conversion_core import (load_engine_config, hocr_to_text, get_ocr_pool,
+                             ConversionPipeline, PdfSource, ImageSource, order_images)
+from ocr_profiles import PROFILES
+from search_index import normalize_text
+
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:  # rapidfuzz is optional; the pure-Python distance is just slower
+    Levenshtein = None
+
+# Compares OCR profiles on a corpus: pages/sec and character error rate (CER).
+# Corpus folder layout (ground truth next to each file, Tesseract's .gt.txt convention):
+#   scene12.pdf + scene12.gt.txt   pages separated by form feeds (\f)
+#   page_001.jpg + page_001.gt.txt
+# Files without a .gt.txt are timed but not scored.
+# Run: python bench_profiles.py <corpus_dir> [--profiles draft,balanced] [--max-cer 3]
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+
+def normalize(text):
+    """Index normalisation plus single spaces: layout differences are not errors."""
+    return " ".join(normalize_text(text).split())
+
+
+def edit_distance(a, b):
+    if Levenshtein is not None:
+        return Levenshtein.distance(a, b)
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def read_ground_truth(path):
+    gt_path = os.path.splitext(path)[0] + ".gt.txt"
+    if not os.path.exists(gt_path):
+        return None
+    with open(gt_path, encoding="utf-8") as f:
+        return f.read().split("\f")
+
+
+def load_corpus(corpus_dir):
+    """Returns [(kind, path, [page ground truth or None, ...]), ...] for PDFs and images."""
+    items = []
+    for pdf in sorted(glob.glob(os.path.join(corpus_dir, "*.pdf"))):
+        items.append(("pdf", pdf, read_ground_truth(pdf)))
+    images = [p for p in glob.glob(os.path.join(corpus_dir, "*")) if p.lower().endswith(IMAGE_EXTENSIONS)]
+    for _, path in order_images([(os.path.basename(p), p) for p in images]):
+        truth = read_ground_truth(path)
+        items.append(("image", path, truth[:1] if truth else None))
+    return items
+
+
+def run_profile(profile, corpus, tesseract_cmd, poppler_path, tessdata_config, corrections):
+    """OCRs the whole corpus with one profile; returns (pages, seconds, errors, reference_chars)."""
+    config = f"{tessdata_config} {profile.tesseract_config()}".strip()
+    pages = errors = reference_chars = 0
+    start = time.perf_counter()
+    for kind, path, truth in corpus:
+        if kind == "pdf":
+            source = PdfSource(pdf_path=path, dpi=profile.dpi, poppler_path=poppler_path)
+            preprocess_kwargs = profile.preprocess_kwargs(upscale_factor=1.0)
+        else:
+            source = ImageSource([(os.path.basename(path), path)])
+            preprocess_kwargs = profile.preprocess_kwargs()
+        pipeline = ConversionPipeline(source, preprocess_kwargs=preprocess_kwargs, config=config,
+                                      tesseract_cmd=tesseract_cmd)
+        for result in pipeline.results():
+            pages += 1
+            if result.error is not None:
+                print(f"  {os.path.basename(path)} page {result.page_num}: {result.error}")
+                continue
+            if truth and result.index < len(truth):
+                reference = normalize(truth[result.index])
+                hypothesis = normalize(hocr_to_text(result.hocr, corrections=corrections))
+                errors += edit_distance(reference, hypothesis)
+                reference_chars += len(reference)
+    return pages, time.perf_counter() - start, errors, reference_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR profiles: pages/sec and character error rate.")
+    parser.add_argument("corpus", help="Folder of PDFs/images with <name>.gt.txt ground truth")
+    parser.add_argument("--profiles", default=",".join(PROFILES),
+                        help=f"Comma-separated profiles to compare (default: {','.join(PROFILES)})")
+    parser.add_argument("--max-cer", type=float, default=None,
+                        help="Quality bar in percent; reports the fastest profile that meets it")
+    parser.add_argument("--no-corrections", action="store_true", help="Score raw OCR without Tamil auto-corrections")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profile(s): {', '.join(unknown)}")
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"No PDFs or images found in {args.corpus}")
+        return 1
+
+    tesseract_cmd, poppler_path, tessdata_config = load_engine_config()
+    # Start the OCR worker processes before timing anything
+    pool = get_ocr_pool(tesseract_cmd)
+    list(pool.map(abs, range(os.cpu_count() or 1)))
+
+    print(f"Corpus: {len(corpus)} file(s), "
+          f"{sum(1 for _, _, truth in corpus if truth)} with ground truth")
+    print(f"{'Profile':<16}{'Pages':>7}{'Seconds':>10}{'Pages/s':>9}{'CER':>9}  Models")
+    rows = []
+    for name in names:
+        profile = PROFILES[name]
+        pages, seconds, errors, reference_chars = run_profile(
+            profile, corpus, tesseract_cmd, poppler_path, tessdata_config, not args.no_corrections
+        )
+        rate = pages / seconds if seconds else 0.0
+        cer = 100.0 * errors / reference_chars if reference_chars else None
+        models = profile.models if profile.models_available() else "default (missing: " + profile.models + ")"
+        print(f"{profile.label:<16}{pages:>7}{seconds:>10.1f}{rate:>9.2f}"
+              f"{(f'{cer:.2f}%' if cer is not None else 'n/a'):>9}  {models or 'default'}")
+        rows.append((profile, rate, cer))
+
+    if args.max_cer is not None:
+        passing = [(rate, profile) for profile, rate, cer in rows if cer is not None and cer <= args.max_cer]
+        if passing:
+            rate, profile = max(passing, key=lambda item: item[0])
+            print(f"\nFastest profile with CER <= {args.max_cer}%: {profile.label} ({rate:.2f} pages/s)")
+        else:
+            print(f"\nNo profile reached CER <= {args.max_cer}%.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import statistics
+
+# Measures app.py first paint and rerun latency headlessly (no browser).
+# Run from the project folder: python bench_startup.py [reruns]
+# Each invocation is a fresh interpreter, so the first run includes all imports.
+
+os.environ.setdefault("LOCALAPPDATA", "")
+
+from streamlit.testing.v1 import AppTest
+
+
+def main():
+    reruns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+    at = AppTest.from_file(app_path, default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    first_paint = time.perf_counter() - start
+    if at.exception:
+        print(f"App raised: {at.exception[0].message}")
+        return
+
+    # Per-interaction rerun: move a sidebar slider back and forth
+    timings = []
+    for i in range(reruns):
+        value = 350 if i % 2 == 0 else 300
+        start = time.perf_counter()
+        at.sidebar.slider[0].set_value(value).run()
+        timings.append(time.perf_counter() - start)
+
+    print(f"First paint:       {first_paint * 1000:8.1f} ms")
+    print(f"Rerun (median):    {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"Rerun (max):       {max(timings) * 1000:8.1f} ms")
+    print(f"Heavy modules loaded after first paint: "
+          f"{sorted(m for m in ('cv2', 'numpy', 'pytesseract', 'bs4', 'pypdf', 'docx', 'pdf2image') if m in sys.modules)}")
+
+
+if __name__ == "__main__":
+    main()
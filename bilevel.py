@@ -0,0 +1,83 @@
+# ==============================================================================
+# Packed Bilevel Pages
+# ==============================================================================
+# After Otsu thresholding a page is pure black and white, yet an 8-bit array
+# or PIL "L" image spends a byte per pixel on it. BilevelPage keeps 8 pixels
+# per byte (np.packbits, rows padded to whole bytes, 1 = white, most
+# significant bit first). That is exactly PIL's mode "1" raw layout, so
+# to_pil() and from_pil() are plain byte copies, and PBM (P4, 1 = black) is the
+# same rows inverted. A 300 DPI A4 page is ~1.1 MB instead of ~8.7 MB while it
+# waits for an OCR worker, and it is pickled to the worker at that size too.
+# numpy and PIL are imported lazily so importing this module stays cheap.
+
+
+class BilevelPage:
+    """A black-and-white page packed 8 pixels per byte, with its size and DPI."""
+
+    def __init__(self, bits, width, height, dpi=None):
+        self.bits = bits      # uint8 array, shape (height, ceil(width / 8))
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+
+    @classmethod
+    def from_array(cls, pixels, dpi=None, threshold=128):
+        """From a 2-D uint8 array (OpenCV grayscale/threshold output); pixels >= threshold are white."""
+        import numpy as np
+
+        height, width = pixels.shape
+        return cls(np.packbits(pixels >= threshold, axis=1), width, height, dpi)
+
+    @classmethod
+    def from_ink(cls, ink, dpi=None):
+        """From a boolean mask that is True where the page is black."""
+        import numpy as np
+
+        height, width = ink.shape
+        return cls(np.packbits(~ink, axis=1), width, height, dpi)
+
+    @classmethod
+    def from_pil(cls, image, dpi=None):
+        """From a PIL image; mode "1" is copied as is, other modes are thresholded at 128."""
+        import numpy as np
+
+        if image.mode != "1":
+            return cls.from_array(np.asarray(image if image.mode == "L" else image.convert("L")), dpi)
+        width, height = image.size
+        bits = np.frombuffer(image.tobytes(), dtype=np.uint8).reshape(height, (width + 7) // 8)
+        return cls(bits, width, height, dpi)
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def to_array(self):
+        """2-D uint8 array of 0/255, as OpenCV's threshold produces."""
+        import numpy as np
+
+        return np.unpackbits(self.bits, axis=1, count=self.width) * np.uint8(255)
+
+    def to_ink(self):
+        """Boolean mask, True where the page is black."""
+        import numpy as np
+
+        return np.unpackbits(self.bits, axis=1, count=self.width) == 0
+
+    def to_pil(self):
+        """PIL mode "1" image (with the DPI set, when known)."""
+        from PIL import Image
+
+        image = Image.frombytes("1", self.size, self.bits.tobytes())
+        if self.dpi:
+            image.info["dpi"] = (self.dpi, self.dpi)
+        return image
+
+    def to_pbm(self):
+        """Binary PBM (P4) bytes, which Tesseract reads from stdin without decompression."""
+        import numpy as np
+
+        return b"P4\n%d %d\n" % (self.width, self.height) + np.invert(self.bits).tobytes()
@@ -0,0 +1,94 @@
+import io
+from collections import deque
+
+from conversion_core import (DEFAULT_LANG, preprocess_image, ocr_page_outputs, get_ocr_pool, default_ocr_workers,
+                             merge_pdf_pages)
+
+# ==============================================================================
+# Scanned-PDF Compression
+# ==============================================================================
+# Scans stored as colour JPEG pages are large. Each page is rendered,
+# binarised with the same enhancement modes used for OCR, and stored as a
+# 1-bit CCITT G4 image, typically a tenth of the size or less. Optionally
+# Tesseract adds an invisible text layer from the same image (its PDF
+# renderer also stores 1-bit images as G4). Pages run in the OCR worker
+# processes and are reassembled in order.
+
+DEFAULT_COMPRESS_DPI = 300
+
+
+def bilevel_page_pdf(image, dpi):
+    """Single-page PDF of a 1-bit image, CCITT G4 encoded (Pillow writes G4 when built with libtiff)."""
+    from PIL import features
+
+    if not features.check("libtiff"):
+        raise RuntimeError("Pillow was built without libtiff, so CCITT G4 compression is unavailable")
+    buffer = io.BytesIO()
+    image.save(buffer, "PDF", resolution=float(dpi))
+    return buffer.getvalue()
+
+
+def compress_page(pdf_path, page_num, dpi=DEFAULT_COMPRESS_DPI, mode="Standard (Auto)", poppler_path=None,
+                  text_layer=False, lang=DEFAULT_LANG, config=""):
+    """Renders, binarises and re-encodes one page; returns single-page PDF bytes. Runs in an OCR worker."""
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    image = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num,
+                              poppler_path=poppler_path)[0]
+    bilevel = preprocess_image(image, upscale_factor=1.0, mode=mode).convert("1", dither=Image.Dither.NONE)
+    del image
+    if text_layer:
+        return ocr_page_outputs(bilevel, lang, config, ("pdf",), dpi)["pdf"]
+    return bilevel_page_pdf(bilevel, dpi)
+
+
+def compress_pdf(pdf_path, dpi=DEFAULT_COMPRESS_DPI, mode="Standard (Auto)", text_layer=False, lang=DEFAULT_LANG,
+                 config="", poppler_path=None, tesseract_cmd=None, pages=None, admit=None, release=None,
+                 on_page=None):
+    """
+    Returns the compressed PDF as bytes. Pages (1-based `pages`, default all)
+    are processed in parallel in the OCR pool. admit(i)/release(i) are
+    optional hooks around each page (e.g. scheduler slots); on_page(done,
+    total) reports progress.
+    """
+    from pypdf import PdfReader
+
+    pages = pages or list(range(1, len(PdfReader(pdf_path).pages) + 1))
+    pool = get_ocr_pool(tesseract_cmd)
+    window = 2 * default_ocr_workers()  # Pages in flight; results are collected in page order
+    in_flight = deque()
+    results = []
+
+    def collect():
+        results.append(in_flight.popleft().result())
+        if on_page:
+            on_page(len(results), len(pages))
+
+    try:
+        for i, page_num in enumerate(pages):
+            if len(in_flight) >= window:
+                collect()
+            if admit:
+                admit(i)
+            future = pool.submit(compress_page, pdf_path, page_num, dpi, mode, poppler_path, text_layer, lang, config)
+            if release:
+                # Slots go back as soon as a worker finishes, so a blocked admit() never waits on collect()
+                future.add_done_callback(lambda _, i=i: release(i))
+            in_flight.append(future)
+        while in_flight:
+            collect()
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return merge_pdf_pages(results)
+
+
+def size_report(original_bytes, compressed_bytes):
+    """'12.4 MB -> 1.1 MB (91% smaller)'"""
+    def mb(n):
+        return f"{n / (1024 * 1024):.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
+
+    saved = 100.0 * (1 - compressed_bytes / original_bytes) if original_bytes else 0.0
+    change = f"{saved:.0f}% smaller" if saved >= 0 else f"{-saved:.0f}% larger"
+    return f"{mb(original_bytes)} -> {mb(compressed_bytes)} ({change})"
@@ -0,0 +1,949 @@
+import os
+import io
+import re
+import time
+import queue
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bilevel import BilevelPage
+from repeated_regions import RepeatedRegionCache
+from two_pass import DEFAULT_MIN_CONFIDENCE, refine_page
+from trace_recorder import span, run_traced
+
+# Shared conversion core used by app.py and pdf_to_docx.py.
+# Heavy libraries are imported inside the functions that need them so that
+# importing this module (and the Streamlit first paint) stays cheap.
+
+# ==============================================================================
+# Engine Configuration
+# ==============================================================================
+
+LOCAL_POPPLER_PATH = r"C:\Users\richardjoel.d\AppData\Local\Microsoft\WinGet\Packages\oschwartz10612.Poppler_Microsoft.Winget.Source_8wekyb3d8bbwe\poppler-25.07.0\Library\bin"
+
+def find_tesseract():
+    """Returns the Tesseract executable from common Windows locations, or None (use PATH)."""
+    possible_tesseract_paths = [
+        r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+        r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+        os.path.join(os.getenv('LOCALAPPDATA', ''), r"Tesseract-OCR\tesseract.exe")
+    ]
+    for path in possible_tesseract_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_engine_config():
+    """
+    Locates Tesseract, Poppler and tessdata.
+    Returns (tesseract_cmd, poppler_path, tessdata_config). Sets TESSDATA_PREFIX
+    to the bundled tessdata folder when the system install lacks Tamil.
+    """
+    tesseract_cmd = find_tesseract()
+
+    # Check for local Windows path first, otherwise assume it's in system PATH (Linux/Cloud)
+    poppler_path = LOCAL_POPPLER_PATH if os.path.exists(LOCAL_POPPLER_PATH) else None
+
+    if tesseract_cmd:
+        tess_base = os.path.dirname(tesseract_cmd)
+        sys_tessdata = os.path.join(tess_base, "tessdata")
+        if not os.path.exists(os.path.join(sys_tessdata, "tam.traineddata")):
+            local_tessdata = os.path.join(os.getcwd(), "tessdata")
+            if os.path.exists(os.path.join(local_tessdata, "tam.traineddata")):
+                os.environ["TESSDATA_PREFIX"] = local_tessdata
+
+    return tesseract_cmd, poppler_path, ""
+
+# ==============================================================================
+# Page Logic
+# ==============================================================================
+
+def correct_tamil_errors(text):
+    """
+    Fixes common Tamil OCR errors.
+    """
+    if not text:
+        return text
+        
+    # Common replacements (Context-aware if possible, but simple string replace for now)
+    corrections = {
+        "இரசு": "அரசு",
+        "இராஜ": "ராஜ",
+        # Add more common misreadings here
+    }
+    
+    for wrong, right in corrections.items():
+        text = text.replace(wrong, right)
+        
+    return text
+
+_cv2_threads_applied = None
+
+def _apply_cv2_threads(cv2):
+    """Applies PDF_TOOL_CV2_THREADS (set by tuning.py) to OpenCV's thread pool."""
+    global _cv2_threads_applied
+    threads = os.getenv("PDF_TOOL_CV2_THREADS")
+    if threads and threads != _cv2_threads_applied:
+        cv2.setNumThreads(int(threads))
+        _cv2_threads_applied = threads
+
+ENHANCEMENT_MODES = ("Standard (Auto)", "Denoise & Sharpen", "Thicken Text (Dilation)", "Thin Text (Erosion)")
+
+def preprocess_image(pil_image, upscale_factor=1.0, mode="Standard (Auto)"):
+    import numpy as np
+    import cv2
+    from PIL import Image
+
+    _apply_cv2_threads(cv2)
+
+    open_cv_image = np.array(pil_image) 
+    if len(open_cv_image.shape) == 3:
+        open_cv_image = open_cv_image[:, :, ::-1].copy()
+
+    # Upscale if requested (for better OCR on small text)
+    if upscale_factor > 1.0:
+        height, width = open_cv_image.shape[:2]
+        new_width = int(width * upscale_factor)
+        new_height = int(height * upscale_factor)
+        open_cv_image = cv2.resize(open_cv_image, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+
+    gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
+    
+    # Enhancement Modes
+    if mode == "Denoise & Sharpen":
+        # Denoise
+        gray = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        # Sharpen
+        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+        gray = cv2.filter2D(gray, -1, kernel)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+    elif mode == "Thicken Text (Dilation)":
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Invert for morphological operations (text needs to be white)
+        thresh = cv2.bitwise_not(thresh)
+        kernel = np.ones((2,2), np.uint8)
+        thresh = cv2.dilate(thresh, kernel, iterations=1)
+        thresh = cv2.bitwise_not(thresh)
+        
+    elif mode == "Thin Text (Erosion)":
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Invert
+        thresh = cv2.bitwise_not(thresh)
+        kernel = np.ones((2,2), np.uint8)
+        thresh = cv2.erode(thresh, kernel, iterations=1)
+        thresh = cv2.bitwise_not(thresh)
+        
+    else: # Standard (Auto)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+    return Image.fromarray(thresh)
+
+def parse_bbox(title_str):
+    if not title_str:
+        return None
+    match = re.search(r'bbox (\d+) (\d+) (\d+) (\d+)', title_str)
+    if match:
+        return [int(g) for g in match.groups()]
+    return None
+
+def hocr_to_docx(hocr_content, doc, page_num, corrections=True):
+    """
+    Robust HOCR parser that handles both PDF-based and Image-based HOCR outputs.
+    Optimized for Script/Screenplay formatting (Tamil/English).
+    """
+    from bs4 import BeautifulSoup
+    from docx.shared import Pt, Inches
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    soup = BeautifulSoup(hocr_content, 'lxml')
+    
+    # 1. Determine Page Width
+    page_width = 1000  # Default fallback
+    page_div = soup.find('div', class_='ocr_page')
+    if page_div:
+        bbox = parse_bbox(page_div.get('title'))
+        if bbox:
+            page_width = bbox[2] - bbox[0]
+
+    # 2. Extract Lines Directly (Stricter Line Preservation)
+    # Instead of relying on paragraphs, we iterate lines to preserve script formatting exactly.
+    lines = soup.find_all('span', class_='ocr_line')
+    
+    has_content = False
+    
+    for line in lines:
+        # Check if line has actual text
+        words = line.find_all('span', class_='ocrx_word')
+        line_text_parts = []
+        for word in words:
+            text = word.get_text().strip()
+            if text:
+                line_text_parts.append(text)
+        
+        full_text = " ".join(line_text_parts).strip()
+        
+        if not full_text:
+            continue
+            
+        # Auto-Correction
+        if corrections:
+            full_text = correct_tamil_errors(full_text)
+
+        docx_p = doc.add_paragraph()
+        docx_p.paragraph_format.space_after = Pt(0) # Minimal spacing between lines to mimic PDF tight layout if needed, or Pt(6) for readabilty. 
+        # For scripts, usually single spacing within blocks, double between blocks. 
+        # But since we are mapping 1 line -> 1 para, let's keep it tight? 
+        # User complained about "proper formatting", usually implies it looks like the PDF.
+        # Let's use small space after.
+        docx_p.paragraph_format.space_after = Pt(2)
+
+        # Layout Analysis (Alignment/Indent)
+        bbox = parse_bbox(line.get('title'))
+        align = WD_ALIGN_PARAGRAPH.LEFT
+        indent = 0
+        
+        if bbox:
+            x0, y0, x1, y1 = bbox
+            x_center = (x0 + x1) / 2
+            page_center = page_width / 2
+            
+            # Script formatting heuristics
+            # Center alignment check (Relaxed tolerance to 20% to capture loosely centered text)
+            if abs(x_center - page_center) < (page_width * 0.20):
+                align = WD_ALIGN_PARAGRAPH.CENTER
+            elif x1 > (page_width * 0.9) and x0 > (page_width * 0.6):
+                align = WD_ALIGN_PARAGRAPH.RIGHT
+            elif x0 > (page_width * 0.1):
+                indent_ratio = x0 / page_width
+                indent_inches = indent_ratio * 8.27
+                indent = min(indent_inches, 4.0)
+
+        docx_p.alignment = align
+        if indent > 0:
+            docx_p.paragraph_format.left_indent = Inches(indent)
+
+        has_content = True
+        
+        # Script Dialogue Detection: "Name : Dialogue"
+        # Pattern: Start of line, some text, spaces, colon, spaces, rest of text
+        # We want to bold the "Name :" part
+        dialogue_match = re.match(r'^([^:]+)(\s*:\s*)(.*)$', full_text)
+        
+        # Heuristic: Name shouldn't be too long (e.g. < 30 chars) to avoid false positives on regular sentences with colons
+        is_dialogue = False
+        if dialogue_match and len(dialogue_match.group(1)) < 30:
+            is_dialogue = True
+            name_part = dialogue_match.group(1)
+            separator = dialogue_match.group(2)
+            content_part = dialogue_match.group(3)
+            
+            # Add Name (Bold)
+            run_name = docx_p.add_run(name_part)
+            run_name.font.size = Pt(11)
+            run_name.bold = True
+            
+            # Add Separator (Regular)
+            run_sep = docx_p.add_run(separator)
+            run_sep.font.size = Pt(11)
+            
+            # Add Content (Regular)
+            run_content = docx_p.add_run(content_part)
+            run_content.font.size = Pt(11)
+            
+        else:
+            # Regular processing
+            run = docx_p.add_run(full_text)
+            run.font.size = Pt(11)
+            
+            # Basic styling heuristics for Headers/Scenes
+            # 1. Short, Uppercase, Centered -> Likely Character Name (Standard format) or Title
+            if len(full_text) < 50 and full_text.isupper() and align == WD_ALIGN_PARAGRAPH.CENTER:
+                run.bold = True
+            
+            # 2. Explicit Scene Headings
+            if any(keyword in full_text.upper() for keyword in ["SCENE:", "LOCATION:", "EFFECTS:", "காட்சி:", "இடம்:", "நேரம்:"]):
+                run.bold = True
+                
+            # 3. Scene Summary Headers (Tamil)
+            if "காட்சிச்சுருக்கம்" in full_text:
+                run.bold = True
+
+
+    # Fallback if HOCR failed to produce any text
+    if not has_content:
+        # Try raw text extraction if HOCR layout failed
+        raw_text = soup.get_text()
+        if raw_text.strip():
+             doc.add_paragraph(raw_text.strip())
+             has_content = True
+
+    # Footer
+    if page_num > 0:
+        section = doc.sections[-1]
+        footer = section.footer
+        # Clear existing footer content if any (to avoid duplicates in loop)
+        for p in footer.paragraphs:
+            p.text = ""
+        footer_p = footer.add_paragraph()
+        footer_p.text = f"Page {page_num}"
+        footer_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    return has_content
+
+def hocr_to_text(hocr_content, corrections=True):
+    """Plain text of an hOCR page, one OCR line per text line (for previews)."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(hocr_content, 'lxml')
+    text_lines = []
+    for line in soup.find_all('span', class_='ocr_line'):
+        words = [w.get_text().strip() for w in line.find_all('span', class_='ocrx_word')]
+        full_text = " ".join(w for w in words if w).strip()
+        if not full_text:
+            continue
+        if corrections:
+            full_text = correct_tamil_errors(full_text)
+        text_lines.append(full_text)
+    return "\n".join(text_lines)
+
+# ==============================================================================
+# Staged Conversion Pipeline
+# ==============================================================================
+# render (threads, pdftoppm subprocess) -> preprocess (threads, OpenCV releases
+# the GIL) -> OCR (process pool) -> caller (hOCR parse + DOCX write, in order).
+# Stages are connected by bounded queues, and a window semaphore caps the number
+# of pages alive between render and the caller, so memory stays bounded even
+# when an early page is slow and later pages pile up in the reorder buffer.
+
+DEFAULT_LANG = 'eng+tam'
+HOCR_CONFIG = " -c hocr_font_info=1"
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def _init_ocr_worker(tesseract_cmd, tessdata_prefix):
+    import pytesseract
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    if tessdata_prefix:
+        os.environ["TESSDATA_PREFIX"] = tessdata_prefix
+
+# Pages reach Tesseract as uncompressed PNM on its stdin (PBM when the page is
+# already black and white, as preprocess_image() output is), so no PNG is
+# encoded, written and decoded again for every page. Only Tesseract's output
+# files touch disk, in tmpfs (/dev/shm) where available.
+# PDF_TOOL_OCR_TRANSPORT=png restores the temp-file PNG path (see bench_ocr_transport.py).
+OCR_TRANSPORTS = ("pnm", "png")
+
+def _ocr_temp_dir():
+    return os.getenv("PDF_TOOL_OCR_TMPDIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+def pnm_bytes(image):
+    """Header plus raw pixels: PBM for a pure 0/255 page, else PGM/PPM. Costs a copy, no compression."""
+    from PIL import Image
+
+    if isinstance(image, BilevelPage):
+        return image.to_pbm()
+    if image.mode == "L" and not any(image.histogram()[1:255]):
+        image = image.convert("1", dither=Image.Dither.NONE)  # 8x fewer bytes, identical pixels
+    elif image.mode not in ("1", "L", "RGB"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "PPM")
+    return buffer.getvalue()
+
+def _run_tesseract_stdin(image_bytes, output_base, lang, config, formats):
+    import shlex
+    import subprocess
+    from pytesseract import pytesseract as pt
+
+    args = [pt.tesseract_cmd, "stdin", output_base, "-l", lang, *shlex.split(config, posix=os.name != "nt"), *formats]
+    try:
+        proc = subprocess.Popen(args, **pt.subprocess_args())
+    except FileNotFoundError:
+        raise pt.TesseractNotFoundError()
+    _, errors = proc.communicate(image_bytes)
+    if proc.returncode:
+        raise pt.TesseractError(proc.returncode, pt.get_errors(errors))
+
+def ocr_page_outputs(image, lang=DEFAULT_LANG, config="", formats=("hocr",), dpi=None, transport=None):
+    """
+    Runs Tesseract once on a preprocessed page and returns {format: bytes}
+    for every requested renderer (e.g. ("hocr", "pdf") for hOCR plus a
+    searchable PDF page from the same recognition pass). `image` is a PIL
+    image or a BilevelPage.
+    """
+    if isinstance(image, BilevelPage):
+        dpi = dpi or image.dpi
+    if dpi:
+        config = f"--dpi {int(dpi)} {config}"
+    if (transport or os.getenv("PDF_TOOL_OCR_TRANSPORT", "pnm")) == "png":
+        from pytesseract.pytesseract import save, run_tesseract
+
+        if isinstance(image, BilevelPage):
+            image = image.to_pil()
+        with save(image) as (temp_name, input_filename):
+            run_tesseract(input_filename, temp_name, " ".join(formats), lang, config + HOCR_CONFIG)
+            outputs = {}
+            for fmt in formats:
+                with open(f"{temp_name}.{fmt}", "rb") as f:
+                    outputs[fmt] = f.read()
+        return outputs
+
+    with tempfile.TemporaryDirectory(prefix="tess_", dir=_ocr_temp_dir()) as temp_dir:
+        output_base = os.path.join(temp_dir, "page")
+        _run_tesseract_stdin(pnm_bytes(image), output_base, lang, config + HOCR_CONFIG, formats)
+        outputs = {}
+        for fmt in formats:
+            with open(f"{output_base}.{fmt}", "rb") as f:
+                outputs[fmt] = f.read()
+    return outputs
+
+def ocr_page(image, lang=DEFAULT_LANG, config="", dpi=None):
+    """Runs Tesseract on one preprocessed page and returns hOCR bytes."""
+    return ocr_page_outputs(image, lang, config, ("hocr",), dpi)["hocr"]
+
+THUMBNAIL_SIZE = (180, 255)
+
+def make_thumbnail(image, max_size=THUMBNAIL_SIZE):
+    """Small JPEG of a rendered page (for search results and page pickers)."""
+    scale = min(max_size[0] / image.width, max_size[1] / image.height, 1.0)
+    thumb = image.convert("RGB").resize(
+        (max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+        reducing_gap=2.0
+    )
+    buffer = io.BytesIO()
+    thumb.save(buffer, "JPEG", quality=70)
+    return buffer.getvalue()
+
+PICKER_DPI = 30  # Page-picker thumbnails: enough to recognise a page, fast for hundreds of pages
+
+def render_pdf_thumbnails(pdf_bytes, poppler_path=None, dpi=PICKER_DPI):
+    """JPEG thumbnails of every page of a PDF, rendered at low DPI (for page pickers)."""
+    from pdf2image import convert_from_bytes
+
+    images = convert_from_bytes(pdf_bytes, dpi=dpi, poppler_path=poppler_path,
+                                thread_count=min(4, os.cpu_count() or 1))
+    return [make_thumbnail(image) for image in images]
+
+def parse_page_ranges(text, page_count):
+    """
+    '12-18, 40' -> [12, 13, ..., 18, 40]: sorted, unique, 1-based page numbers.
+    'N-' runs to the last page. Raises ValueError for malformed or out-of-range input.
+    """
+    pages = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        match = re.fullmatch(r'(\d+)(?:-(\d*))?', part)
+        if not match:
+            raise ValueError(f"Invalid page range '{part}' (use e.g. 12-18,40)")
+        first = int(match.group(1))
+        last = first if match.group(2) is None else int(match.group(2) or page_count)
+        if first > last:
+            raise ValueError(f"Invalid page range '{part}' (the first page comes after the last)")
+        if first < 1 or last > page_count:
+            raise ValueError(f"Page range '{part}' is outside 1-{page_count}")
+        pages.update(range(first, last + 1))
+    if not pages:
+        raise ValueError("No pages selected")
+    return sorted(pages)
+
+def format_page_ranges(pages):
+    """[12, 13, 14, 40] -> '12-14,40'"""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def merge_pdf_pages(pdf_pages):
+    """Concatenates single-page PDFs (e.g. Tesseract text-layer pages) into one PDF."""
+    from pypdf import PdfWriter, PdfReader
+
+    writer = PdfWriter()
+    for page_bytes in pdf_pages:
+        writer.append(PdfReader(io.BytesIO(page_bytes)))
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    writer.close()
+    return buffer.getvalue()
+
+def default_ocr_workers():
+    """OCR processes: PDF_TOOL_OCR_WORKERS (see tuning.py) or one per core."""
+    return int(os.getenv("PDF_TOOL_OCR_WORKERS", "0")) or os.cpu_count() or 1
+
+def get_ocr_pool(tesseract_cmd=None, max_workers=None):
+    """
+    Process pool shared by every job in this process (spawn is slow on Windows,
+    so it is created once). Uses 'spawn' because the Streamlit server is threaded.
+    Workers inherit the environment, including OMP_THREAD_LIMIT for Tesseract.
+    A pool broken by a dead worker (e.g. OOM-killed) is replaced, so one crash
+    does not fail every later job.
+    """
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None and _ocr_pool._broken:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+            _ocr_pool = None
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=max_workers or default_ocr_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_ocr_worker,
+                initargs=(tesseract_cmd, os.environ.get("TESSDATA_PREFIX"))
+            )
+        return _ocr_pool
+
+def shutdown_ocr_pool():
+    """Stops the shared pool; the next get_ocr_pool() starts a fresh one (used when tuning)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=True)
+            _ocr_pool = None
+
+
+class PdfSource:
+    """
+    Renders single PDF pages with pdftoppm. The PDF is written to disk once.
+    `pages` (1-based numbers) limits the conversion to those pages, in that
+    order; `page_dpis` then holds one DPI per selected page.
+    """
+
+    def __init__(self, pdf_path=None, pdf_bytes=None, dpi=300, poppler_path=None, page_dpis=None, pages=None):
+        self._tmp_path = None
+        if pdf_path is None:
+            fd, self._tmp_path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            pdf_path = self._tmp_path
+        self.pdf_path = pdf_path
+        self.poppler_path = poppler_path
+        if page_dpis is None:
+            if pages is None:
+                from pypdf import PdfReader
+                page_dpis = [dpi] * len(PdfReader(pdf_path).pages)
+            else:
+                page_dpis = [dpi] * len(pages)
+        self.page_dpis = page_dpis
+        self.pages = pages
+        self.page_count = len(page_dpis)
+
+    def __len__(self):
+        return self.page_count
+
+    def page_dpi(self, index):
+        return self.page_dpis[index]
+
+    def page_number(self, index):
+        """Page number in the PDF of the index-th converted page."""
+        return self.pages[index] if self.pages is not None else index + 1
+
+    def region_spec(self, index):
+        """What a worker process needs to re-render part of a page (see two_pass.py)."""
+        return {"pdf_path": self.pdf_path, "page_num": self.page_number(index), "page_dpi": self.page_dpis[index],
+                "poppler_path": self.poppler_path}
+
+    def render(self, index):
+        from pdf2image import convert_from_path
+        imgs = convert_from_path(
+            self.pdf_path,
+            dpi=self.page_dpis[index],
+            first_page=self.page_number(index),
+            last_page=self.page_number(index),
+            poppler_path=self.poppler_path
+        )
+        return imgs[0]
+
+    def close(self):
+        if self._tmp_path and os.path.exists(self._tmp_path):
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                return  # Still open in a renderer (Windows); the last renderer's close() retries
+            self._tmp_path = None
+
+
+IMAGE_ORDERS = ("name", "exif")
+EXIF_DATETIME_TAGS = (36867, 36868, 306)  # DateTimeOriginal, DateTimeDigitized, DateTime
+
+def _natural_key(name):
+    """Sort key so IMG_2.jpg comes before IMG_10.jpg."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def _open_image(data):
+    """Opens an image given as bytes (or a memoryview of them) or a path."""
+    from PIL import Image
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = io.BytesIO(data)
+    return Image.open(data)
+
+def _exif_datetime(data):
+    """'YYYY:MM:DD HH:MM:SS' capture time of an image, or None."""
+    try:
+        with _open_image(data) as img:
+            exif = img.getexif()
+            values = dict(exif.get_ifd(0x8769))  # Exif sub-IFD holds the capture times
+            values.update(exif)
+    except Exception:
+        return None
+    for tag in EXIF_DATETIME_TAGS:
+        value = values.get(tag)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+def order_images(images, by="name"):
+    """
+    Orders [(name, image), ...] by file name (natural order) or by EXIF
+    capture time; images without a capture time follow, in name order.
+    """
+    if by not in IMAGE_ORDERS:
+        raise ValueError(f"Unknown image order: {by}")
+    by_name = sorted(images, key=lambda item: _natural_key(item[0]))
+    if by == "name":
+        return by_name
+    stamps = [_exif_datetime(data) for _, data in by_name]
+    order = sorted(range(len(by_name)), key=lambda i: (stamps[i] is None, stamps[i] or "", i))
+    return [by_name[i] for i in order]
+
+
+class ImageSource:
+    """
+    Pages from images given as bytes, memoryviews or paths, in the given
+    order (see order_images).
+    """
+
+    def __init__(self, images, page_upscales=None):
+        self.names = [name for name, _ in images]
+        self._images = [data for _, data in images]
+        self.page_upscales = page_upscales
+
+    def __len__(self):
+        return len(self._images)
+
+    def page_preprocess_kwargs(self, index):
+        return {"upscale_factor": self.page_upscales[index]} if self.page_upscales else {}
+
+    def render(self, index):
+        from PIL import ImageOps
+
+        with _open_image(self._images[index]) as img:
+            # Phone photos are often stored sideways with an EXIF rotation flag
+            return ImageOps.exif_transpose(img).convert("RGB")
+
+    def close(self):
+        self._images = []
+
+
+class PageResult:
+    def __init__(self, index, hocr=None, error=None, pdf=None, dpi=None, thumbnail=None):
+        self.index = index
+        self.page_num = index + 1
+        self.hocr = hocr
+        self.error = error
+        self.pdf = pdf  # Searchable single-page PDF, when requested
+        self.dpi = dpi
+        self.thumbnail = thumbnail  # JPEG bytes, when thumbnails were requested
+
+
+class ConversionPipeline:
+    """
+    Runs render, preprocess and OCR concurrently for every page of `source`.
+    Iterate `results()` in the calling thread to receive PageResults in page order.
+
+    admit(index) / release(index) are optional hooks called before a page is
+    rendered and after its OCR finishes (e.g. shared scheduler slots). When
+    admit returns False the page fails as cancelled and release is not called.
+    searchable_pdf=True also returns a text-layer PDF page from the same OCR pass
+    (an image-only page when OCR fails, so the PDF keeps every page);
+    thumbnails=True adds a small JPEG of each rendered page; reuse_regions=True
+    OCRs repeated headers/footers once per document (see repeated_regions.py;
+    ignored with searchable_pdf, whose text layer needs every region OCR'd).
+    second_pass_dpi re-reads low-confidence lines of PDF pages at that DPI
+    (see two_pass.py; the searchable PDF keeps the first-pass text layer).
+    trace is an optional TraceRecorder that receives a span per page and stage.
+    """
+
+    def __init__(self, source, preprocess_kwargs=None, lang=DEFAULT_LANG, config="",
+                 tesseract_cmd=None, render_workers=2, preprocess_workers=2,
+                 ocr_workers=None, max_in_flight=None, admit=None, release=None,
+                 searchable_pdf=False, thumbnails=False, reuse_regions=False,
+                 second_pass_dpi=None, min_confidence=DEFAULT_MIN_CONFIDENCE, trace=None):
+        self.source = source
+        self.preprocess_kwargs = preprocess_kwargs or {}
+        self.lang = lang
+        self.config = config
+        self.formats = ("hocr", "pdf") if searchable_pdf else ("hocr",)
+        self.thumbnails = thumbnails
+        self._thumbs = {}
+        self.region_cache = RepeatedRegionCache() if reuse_regions and not searchable_pdf else None
+        self._region_plans = {}
+        self.second_pass_dpi = second_pass_dpi if hasattr(source, "region_spec") else None
+        self.min_confidence = min_confidence
+        self.second_pass_stats = {"lines": 0, "improved": 0}
+        self.admit = admit
+        self.release = release
+        self.trace = trace
+        self._page_started = {}
+        self.total = len(source)
+        self.render_workers = max(1, min(render_workers, self.total))
+        self.preprocess_workers = max(1, preprocess_workers)
+
+        ocr_workers = ocr_workers or default_ocr_workers()
+        self._pool = get_ocr_pool(tesseract_cmd, ocr_workers)
+        self._pool_args = (tesseract_cmd, ocr_workers)
+        self._window = threading.Semaphore(max_in_flight or (ocr_workers + self.render_workers + 1))
+        self._render_q = queue.Queue(maxsize=self.preprocess_workers * 2)
+        self._next_index = 0
+        self._index_lock = threading.Lock()
+        self._renderers_left = self.render_workers
+        self._done = {}
+        self._done_cond = threading.Condition()
+        self._refine_pending = []  # (index, first-pass outputs) waiting for a second pass
+        self._stop = threading.Event()
+        self._threads = []
+
+    # --- Stages ---------------------------------------------------------------
+
+    def _take_index(self):
+        with self._index_lock:
+            if self._stop.is_set() or self._next_index >= self.total:
+                return None
+            index = self._next_index
+            self._next_index += 1
+            return index
+
+    def _render_stage(self):
+        try:
+            while True:
+                self._window.acquire()
+                index = self._take_index()
+                if index is None:
+                    self._window.release()
+                    break
+                self._page_started[index] = time.time()
+                if self.admit:
+                    with span(self.trace, "admit", "queue", page=index + 1):
+                        admitted = self.admit(index) is not False
+                    if not admitted:  # No slot was taken, so none is released
+                        self._finish(index, None, RuntimeError("Conversion cancelled"), release=False)
+                        continue
+                if self._stop.is_set():
+                    self._finish(index, None, RuntimeError("Conversion cancelled"))
+                    continue
+                try:
+                    with span(self.trace, "render", page=index + 1) as info:
+                        image = self.source.render(index)
+                        info["size"] = f"{image.width}x{image.height}"
+                    if self.thumbnails:
+                        self._thumbs[index] = make_thumbnail(image)
+                except Exception as e:
+                    self._finish(index, None, e)
+                    continue
+                self._render_q.put((index, image))
+        finally:
+            with self._index_lock:
+                self._renderers_left -= 1
+                last = self._renderers_left == 0
+            if last:
+                # Nothing renders any more: free the source (unless second-pass
+                # re-renders still need it) and stop the preprocessors
+                if not self.second_pass_dpi:
+                    self.source.close()
+                for _ in range(self.preprocess_workers):
+                    self._render_q.put(None)
+
+    def _preprocess_stage(self):
+        while True:
+            item = self._render_q.get()
+            if item is None:
+                break
+            index, image = item
+            if self._stop.is_set():
+                self._finish(index, None, RuntimeError("Conversion cancelled"))
+                continue
+            try:
+                kwargs = self.preprocess_kwargs
+                if hasattr(self.source, "page_preprocess_kwargs"):
+                    kwargs = {**kwargs, **self.source.page_preprocess_kwargs(index)}
+                with span(self.trace, "preprocess", page=index + 1, **kwargs) as info:
+                    info["input_size"] = f"{image.width}x{image.height}"
+                    processed = preprocess_image(image, **kwargs)
+                    info["output_size"] = f"{processed.width}x{processed.height}"
+                del image
+                if self.region_cache is not None:
+                    with span(self.trace, "regions", page=index + 1):
+                        processed, self._region_plans[index] = self.region_cache.prepare(processed)
+                dpi = self.source.page_dpi(index) if hasattr(self.source, "page_dpi") else None
+                # Waits for a worker and is pickled to it 1 bit per pixel (see bilevel.py)
+                processed = BilevelPage.from_pil(processed, dpi)
+                ocr_info = {"page": index + 1, "lang": self.lang, "dpi": dpi,
+                            "size": f"{processed.width}x{processed.height}", "packed_kb": processed.nbytes // 1024}
+                future = self._submit(ocr_page_outputs, processed, self.lang, self.config, self.formats, dpi)
+            except Exception as e:
+                self._finish(index, None, e)
+                continue
+            future.add_done_callback(lambda f, i=index, info=ocr_info: self._on_ocr_done(i, f, info))
+
+    def _submit(self, fn, *args, **kwargs):
+        """
+        Submits to the OCR pool; when tracing, the worker also reports its timing.
+        If a worker died, later pages go to the fresh pool get_ocr_pool() starts.
+        """
+        submitted = time.time()
+        if self.trace is not None:
+            args, fn = (fn, *args), run_traced
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._pool = get_ocr_pool(*self._pool_args)
+            future = self._pool.submit(fn, *args, **kwargs)
+        if self.trace is not None:
+            future.submitted = submitted
+        return future
+
+    def _unwrap(self, future, name, info):
+        """Result of a _submit() future, recording the worker's span when tracing."""
+        if self.trace is None:
+            return future.result()
+        result, timing = future.result()
+        self.trace.add_worker_span(name, timing, info, future.submitted)
+        return result
+
+    def _on_ocr_done(self, index, future, info):
+        # Runs on the pool's management thread: only record the outcome here
+        try:
+            error = future.exception()
+            outputs = {} if error else self._unwrap(future, "ocr", info)
+        except Exception as e:
+            error, outputs = e, {}
+        if self.second_pass_dpi and not error and not self._stop.is_set():
+            with self._done_cond:  # Submitted by the results() thread (see _submit_refines)
+                self._refine_pending.append((index, outputs))
+                self._done_cond.notify_all()
+            return
+        self._finish(index, outputs.get("hocr"), error, outputs.get("pdf"))
+
+    def _submit_refines(self, pending):
+        """Submits second-pass re-reads; a page whose re-read cannot start keeps its first pass."""
+        for index, outputs in pending:
+            try:
+                if self._stop.is_set():
+                    raise RuntimeError("Conversion cancelled")
+                refine = self._submit(
+                    refine_page, outputs["hocr"], upscale_factor=self.preprocess_kwargs.get("upscale_factor", 1.0),
+                    second_pass_dpi=self.second_pass_dpi, min_confidence=self.min_confidence, lang=self.lang,
+                    config=self.config, mode=self.preprocess_kwargs.get("mode", "Standard (Auto)"),
+                    **self.source.region_spec(index)
+                )
+            except Exception:
+                self._finish(index, outputs["hocr"], None, outputs.get("pdf"))
+                continue
+            refine.add_done_callback(lambda f, i=index, o=outputs: self._on_refine_done(i, o, f))
+
+    def _on_refine_done(self, index, outputs, future):
+        hocr = outputs["hocr"]
+        try:
+            if future.exception() is None:  # A failed re-read keeps the first-pass text
+                hocr, checked, improved = self._unwrap(future, "second pass",
+                                                       {"page": index + 1, "dpi": self.second_pass_dpi})
+                with self._done_cond:
+                    self.second_pass_stats["lines"] += checked
+                    self.second_pass_stats["improved"] += improved
+        except Exception:
+            hocr = outputs["hocr"]
+        self._finish(index, hocr, None, outputs.get("pdf"))
+
+    def _finish(self, index, hocr, error, pdf=None, release=True):
+        if self.release and release:
+            self.release(index)
+        dpi = self.source.page_dpi(index) if hasattr(self.source, "page_dpi") else None
+        thumbnail = self._thumbs.pop(index, None)
+        started = self._page_started.pop(index, None)
+        if self.trace is not None and started is not None:
+            self.trace.add_page(index, started, time.time(), {"error": str(error)} if error else {})
+        with self._done_cond:
+            self._done[index] = PageResult(index, hocr, error, pdf, dpi, thumbnail)
+            self._done_cond.notify_all()
+
+    # --- Public API -----------------------------------------------------------
+
+    def start(self):
+        for n in range(self.render_workers):
+            self._threads.append(threading.Thread(target=self._render_stage, name=f"render-{n + 1}", daemon=True))
+        for n in range(self.preprocess_workers):
+            self._threads.append(threading.Thread(target=self._preprocess_stage, name=f"preprocess-{n + 1}",
+                                                  daemon=True))
+        for t in self._threads:
+            t.start()
+        return self
+
+    def results(self, poll_interval=None):
+        """
+        Yields PageResults in page order. With `poll_interval`, yields None
+        whenever nothing finished for that long, so callers can refresh a UI.
+        """
+        if not self._threads:
+            self.start()
+        try:
+            for index in range(self.total):
+                while True:
+                    with self._done_cond:
+                        if index not in self._done and not self._refine_pending:
+                            self._done_cond.wait(poll_interval)
+                        result = self._done.pop(index, None)
+                        pending, self._refine_pending = self._refine_pending, []
+                    if pending:
+                        self._submit_refines(pending)
+                    if result is not None:
+                        break
+                    if poll_interval:
+                        yield None
+                self._window.release()
+                plan = self._region_plans.pop(index, None)
+                if plan is not None and result.hocr is not None:
+                    try:
+                        with span(self.trace, "regions", page=index + 1):
+                            result.hocr = self.region_cache.complete(plan, result.hocr)
+                    except Exception as e:
+                        result.error = e
+                if result.error is not None and result.pdf is None and "pdf" in self.formats:
+                    result.pdf = self._image_only_pdf(index)
+                yield result
+        finally:
+            self.close()
+            self.source.close()  # Also when cancelled while renderers are still blocked in admit()
+
+    def _image_only_pdf(self, index):
+        """
+        Single-page PDF of the page image without a text layer, standing in for
+        a page whose OCR failed so the searchable PDF keeps every page. None if
+        the job was cancelled or the page cannot be rendered either.
+        """
+        if self._stop.is_set():
+            return None
+        try:
+            dpi = self.source.page_dpi(index) if hasattr(self.source, "page_dpi") else 300
+            buffer = io.BytesIO()
+            self.source.render(index).convert("RGB").save(buffer, "PDF", resolution=float(dpi))
+            return buffer.getvalue()
+        except Exception:
+            return None
+
+    def close(self):
+        """Stops feeding new pages; pages already in OCR finish in the background."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        # Unblock renderers waiting for window space
+        for _ in range(self.render_workers):
+            self._window.release()
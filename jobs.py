@@ -0,0 +1,221 @@
+import io
+import time
+import uuid
+import threading
+
+from conversion_core import hocr_to_docx, hocr_to_text, merge_pdf_pages, format_page_ranges
+from ocr_export import hocr_to_json_line
+from trace_recorder import span
+
+# ==============================================================================
+# Background Conversion Jobs
+# ==============================================================================
+# A Streamlit rerun (any widget click, including a download) stops the script
+# thread, so long conversions run on a background thread instead and the UI
+# polls the job. Finished pages are available immediately: their text for
+# preview and their hOCR for a "what's done so far" DOCX.
+
+
+class ConversionJob:
+    def __init__(self, name, total_pages, corrections=True, page_names=None, page_numbers=True, source_pages=None):
+        self.job_id = uuid.uuid4().hex
+        self.name = name
+        self.total_pages = total_pages
+        self.corrections = corrections
+        self.page_names = page_names      # e.g. image file names, for previews
+        self.page_numbers = page_numbers  # "Page N" footers in the DOCX
+        self.source_pages = source_pages  # Original page numbers when only some pages are converted
+        self.status = "running"  # running | done | error | cancelled
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.completed = 0
+        self.page_texts = {}     # page index -> recognised text
+        self.page_errors = {}    # page index -> error message
+        self.thumbnails = {}     # page number -> JPEG bytes (when the pipeline made them)
+        self.memory_wait = {}    # filled by pipeline hooks while held back
+        self.notices = []        # warnings to keep showing while the job runs
+        self.scheduler_job_id = None
+        self.trace = None        # TraceRecorder, when the pipeline was given one
+        self.queue_seconds = 0.0 # Time pages spent waiting for a scheduler slot or memory (see scheduled_hooks)
+        self.first_page_admitted = None
+        self.docx_bytes = None
+        self.pdf_bytes = None    # Searchable PDF, when the pipeline produced text-layer pages
+        self.json_bytes = None   # Word boxes and confidences (see ocr_export.py)
+        self.result = None       # Result store metadata once the outputs are saved to disk
+        self._searchable_pdf = False
+        self._page_pdf = []
+        self._pdf_without_text = []  # page numbers in the searchable PDF as image only (OCR failed)
+        self._pdf_dropped = []       # page numbers missing from the searchable PDF
+        self._page_json = []
+        self._page_hocr = []     # hOCR (or None on error) for pages 0..completed-1
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+        self._partial_cache = (None, None)
+
+    @property
+    def is_running(self):
+        return self.status == "running"
+
+    def start(self, pipeline, on_finish=None):
+        """Consumes `pipeline` results on a daemon thread."""
+        self.trace = pipeline.trace
+        self._searchable_pdf = "pdf" in pipeline.formats
+        self._thread = threading.Thread(target=self._run, args=(pipeline, on_finish), daemon=True)
+        self._thread.start()
+        return self
+
+    def outputs(self):
+        """Finished outputs by kind (see result_store.OUTPUTS); None where not produced."""
+        return {"docx": self.docx_bytes, "json": self.json_bytes, "pdf": self.pdf_bytes}
+
+    def wait(self, timeout=None):
+        """Blocks until the job's thread has finished (or `timeout` seconds pass)."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self, pipeline, on_finish):
+        from docx import Document
+
+        doc = Document()
+        results = pipeline.results(poll_interval=0.5)
+        try:
+            for result in results:
+                if self._cancel.is_set():
+                    self.status = "cancelled"
+                    break
+                if result is None:
+                    continue
+                self._add_page(doc, result)
+            else:
+                with span(self.trace, "docx save", "output"):
+                    buffer = io.BytesIO()
+                    doc.save(buffer)
+                    self.docx_bytes = buffer.getvalue()
+                if self._page_pdf:
+                    with span(self.trace, "pdf merge", "output", pages=len(self._page_pdf)):
+                        self.pdf_bytes = merge_pdf_pages(self._page_pdf)
+                    if self._pdf_without_text:
+                        self.notices.append(f"Searchable PDF: page(s) {format_page_ranges(self._pdf_without_text)} "
+                                            "have no text layer because their OCR failed.")
+                    if self._pdf_dropped:
+                        self.notices.append(f"Searchable PDF: page(s) {format_page_ranges(self._pdf_dropped)} "
+                                            "are missing because they could not be converted.")
+                self.json_bytes = b"".join(self._page_json)
+                self.status = "done"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "error"
+        finally:
+            results.close()  # Stops the pipeline and removes its temp files now, not when garbage collected
+            self.finished = time.time()
+            if on_finish:
+                on_finish(self)
+
+    def _add_page(self, doc, result):
+        i = result.index
+        hocr = None
+        if result.error is not None:
+            self.page_errors[i] = str(result.error)
+            doc.add_paragraph(f"[Error reading page {self.page_number(i)}]")
+        else:
+            try:
+                with span(self.trace, "docx append", "output", page=self.page_number(i)):
+                    hocr_to_docx(result.hocr, doc, self._footer_number(i), corrections=self.corrections)
+                with span(self.trace, "parse", "output", page=self.page_number(i)):
+                    self.page_texts[i] = hocr_to_text(result.hocr, corrections=self.corrections)
+                    self._page_json.append(hocr_to_json_line(result.hocr, self.page_number(i), result.dpi))
+                hocr = result.hocr
+            except Exception as e:
+                self.page_errors[i] = str(e)
+        if i < self.total_pages - 1:
+            doc.add_page_break()
+        if result.pdf is not None:
+            self._page_pdf.append(result.pdf)
+            if result.error is not None:
+                self._pdf_without_text.append(self.page_number(i))
+        elif self._searchable_pdf:
+            self._pdf_dropped.append(self.page_number(i))
+        if result.thumbnail is not None:
+            self.thumbnails[self.page_number(i)] = result.thumbnail
+        with self._lock:
+            self._page_hocr.append(hocr)
+            self.completed = len(self._page_hocr)
+
+    def page_number(self, index):
+        """Number of the index-th converted page in the original document."""
+        return self.source_pages[index] if self.source_pages else index + 1
+
+    def _footer_number(self, index):
+        return self.page_number(index) if self.page_numbers else 0  # 0 = no footer
+
+    def page_label(self, index):
+        label = f"Page {self.page_number(index)}"
+        if self.page_names:
+            label += f" - {self.page_names[index]}"
+        return label
+
+    def index_into(self, search_index, source, sha256):
+        """Adds the finished job's text (and thumbnails) to a SearchIndex."""
+        pages = [(self.page_number(i), text) for i, text in sorted(self.page_texts.items())]
+        return search_index.index_document(source, self.name, sha256, pages, self.thumbnails)
+
+    def partial_docx_bytes(self):
+        """DOCX of the pages finished so far (built separately; the job's own document keeps growing)."""
+        from docx import Document
+
+        with self._lock:
+            pages = list(self._page_hocr)
+        cached_count, cached_bytes = self._partial_cache
+        if cached_count == len(pages):
+            return cached_bytes
+
+        doc = Document()
+        for i, hocr in enumerate(pages):
+            if hocr is None:
+                doc.add_paragraph(f"[Error reading page {self.page_number(i)}]")
+            else:
+                hocr_to_docx(hocr, doc, self._footer_number(i), corrections=self.corrections)
+            if i < len(pages) - 1:
+                doc.add_page_break()
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        self._partial_cache = (len(pages), buffer.getvalue())
+        return self._partial_cache[1]
+
+
+def scheduled_hooks(job, scheduler, governor, session_id, page_bytes):
+    """
+    Registers `job` with the fair-share scheduler and returns the pipeline
+    (admit, release) hooks: each page holds a scheduler slot and a memory
+    reservation of `page_bytes[i]`. Call scheduler.finish(job.scheduler_job_id)
+    when the job ends. Pipeline hooks run on worker threads: they only record
+    state, the UI reads it.
+    """
+    job.scheduler_job_id = scheduler.submit(session_id, job.total_pages)
+    slot_started = {}  # page index -> when it got its slot, for the scheduler's wait estimate
+
+    def admit(i):
+        start = time.time()
+        if not scheduler.acquire(job.scheduler_job_id):
+            return False  # The job was finished (cancelled or replaced) while this page waited
+        slot_started[i] = time.time()
+        governor.acquire(page_bytes[i], on_wait=lambda used, budget: job.memory_wait.update(used=used, budget=budget))
+        job.memory_wait.clear()
+        now = time.time()
+        with job._lock:
+            job.queue_seconds += now - start
+            if job.first_page_admitted is None:
+                job.first_page_admitted = now
+        return True
+
+    def release(i):
+        governor.release(page_bytes[i])
+        started = slot_started.pop(i, None)
+        scheduler.release(job.scheduler_job_id, elapsed=None if started is None else time.time() - started)
+
+    return admit, release
@@ -0,0 +1,356 @@
+import io
+import os
+import sys
+import json
+import glob
+import math
+import time
+import random
+import argparse
+import threading
+
+from conversion_core import (load_engine_config, get_ocr_pool, merge_pdf_pages,
+                             ConversionPipeline, PdfSource, ImageSource)
+from jobs import ConversionJob, scheduled_hooks
+from scheduler import get_scheduler
+from memory_governor import get_governor, current_rss, children_rss, page_sizes_from_reader
+from ocr_profiles import PROFILES, get_profile
+from tuning import apply_tuning
+
+# Simulates concurrent users of the app headlessly (no browser, no Streamlit):
+# each user is a thread with its own session id that submits a mix of PDF
+# conversions, image conversions and merges through the same scheduler,
+# memory governor and OCR pool the server uses, with think time between jobs.
+# Reports latency percentiles per job type, throughput, queue times and RSS
+# (this process plus the OCR workers) over time.
+# Run: python load_test.py --users 8 --jobs 3 [--corpus <dir>] [--mix pdf=5,image=3,merge=2]
+# Without --corpus, synthetic text pages are generated.
+
+JOB_TYPES = ("pdf", "image", "merge")
+DEFAULT_MIX = "pdf=5,image=3,merge=2"
+PERCENTILES = (50, 90, 95, 99)
+TIMELINE_ROWS = 20  # RSS samples printed (evenly spaced); --json keeps all of them
+
+
+# ==============================================================================
+# Inputs
+# ==============================================================================
+
+def synthetic_page(number, width=1240, height=1754):
+    """A white A4 page at 150 DPI with a few lines of text."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        font = ImageFont.load_default()
+    draw.text((120, 100), f"SCENE {number}", fill="black", font=font)
+    for line in range(24):
+        draw.text((120, 200 + line * 60), f"Line {line + 1} of page {number}: the quick brown fox jumps.",
+                  fill="black", font=font)
+    return image
+
+
+def synthetic_corpus(pdf_pages=(1, 3, 6)):
+    """(pdfs, images): PDFs of the given page counts and single-page PNGs, as bytes."""
+    pdfs = []
+    for count in pdf_pages:
+        pages = [synthetic_page(n + 1) for n in range(count)]
+        buffer = io.BytesIO()
+        pages[0].save(buffer, "PDF", resolution=150.0, save_all=True, append_images=pages[1:])
+        pdfs.append((f"synthetic_{count}p.pdf", buffer.getvalue()))
+    images = []
+    for n in range(3):
+        buffer = io.BytesIO()
+        synthetic_page(n + 1).save(buffer, "PNG")
+        images.append((f"photo_{n + 1}.png", buffer.getvalue()))
+    return pdfs, images
+
+
+def load_corpus(corpus_dir):
+    """(pdfs, images) from a folder, as (name, bytes) lists."""
+    def read(paths):
+        items = []
+        for path in sorted(paths):
+            with open(path, "rb") as f:
+                items.append((os.path.basename(path), f.read()))
+        return items
+
+    files = glob.glob(os.path.join(corpus_dir, "*"))
+    return (read(p for p in files if p.lower().endswith(".pdf")),
+            read(p for p in files if p.lower().endswith((".png", ".jpg", ".jpeg"))))
+
+
+def parse_mix(text):
+    """'pdf=5,image=3,merge=2' -> {'pdf': 5.0, 'image': 3.0, 'merge': 2.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in JOB_TYPES:
+            raise ValueError(f"unknown job type '{name}' (choose from {', '.join(JOB_TYPES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ==============================================================================
+# Simulated Users
+# ==============================================================================
+
+class LoadTest:
+    def __init__(self, pdfs, images, profile, tesseract_cmd, poppler_path, tessdata_config,
+                 searchable_pdf=False):
+        self.pdfs = pdfs
+        self.images = images
+        self.profile = profile
+        self.tesseract_cmd = tesseract_cmd
+        self.poppler_path = poppler_path
+        self.config = f"{tessdata_config} {profile.tesseract_config()}".strip()
+        self.searchable_pdf = searchable_pdf
+        self.scheduler = get_scheduler()
+        self.governor = get_governor()
+        self.records = []  # One dict per finished job
+        self._lock = threading.Lock()
+
+    def _convert(self, session_id, job, source, page_bytes, preprocess_kwargs):
+        """Runs one conversion the way app.start_job does and waits for it."""
+        admit, release = scheduled_hooks(job, self.scheduler, self.governor, session_id, page_bytes)
+        pipeline = ConversionPipeline(source, preprocess_kwargs=preprocess_kwargs, config=self.config,
+                                      tesseract_cmd=self.tesseract_cmd, admit=admit, release=release,
+                                      searchable_pdf=self.searchable_pdf, thumbnails=True)
+        job.start(pipeline, on_finish=lambda j: self.scheduler.finish(j.scheduler_job_id))
+        job.wait()
+        return {
+            "pages": job.total_pages,
+            "status": job.status if not job.page_errors else "page_errors",
+            "error": job.error or next(iter(job.page_errors.values()), None),
+            "queue_first": (job.first_page_admitted or job.finished) - job.started,
+            "queue_total": job.queue_seconds,
+        }
+
+    def run_pdf(self, session_id, rng):
+        from pypdf import PdfReader
+
+        name, data = rng.choice(self.pdfs)
+        reader = PdfReader(io.BytesIO(data))
+        plans = [self.governor.plan_dpi(w, h, self.profile.dpi) for w, h in page_sizes_from_reader(reader)]
+        job = ConversionJob(name, len(plans))
+        source = PdfSource(pdf_bytes=data, poppler_path=self.poppler_path, page_dpis=[dpi for dpi, _ in plans])
+        return self._convert(session_id, job, source, [nbytes for _, nbytes in plans],
+                             self.profile.preprocess_kwargs(upscale_factor=1.0))
+
+    def run_image(self, session_id, rng):
+        from PIL import Image
+
+        images = rng.sample(self.images, rng.randint(1, min(3, len(self.images))))
+        plans = []
+        for _, data in images:
+            with Image.open(io.BytesIO(data)) as img:
+                plans.append(self.governor.plan_upscale(img.width, img.height, self.profile.upscale_factor))
+        job = ConversionJob(images[0][0], len(images), page_names=[name for name, _ in images])
+        source = ImageSource(images, page_upscales=[factor for factor, _ in plans])
+        return self._convert(session_id, job, source, [nbytes for _, nbytes in plans],
+                             {"mode": self.profile.mode})
+
+    def run_merge(self, session_id, rng):
+        # The Merge tab runs on the script thread without the scheduler; so does this
+        files = rng.sample(self.pdfs, min(len(self.pdfs), rng.randint(2, 4)))
+        merged = merge_pdf_pages([data for _, data in files])
+        return {"pages": len(files), "status": "done" if merged else "error", "error": None,
+                "queue_first": 0.0, "queue_total": 0.0}
+
+    def user(self, number, jobs, mix, think_time, start_delay, seed):
+        rng = random.Random(seed + number)
+        session_id = f"loadtest-user-{number}"
+        time.sleep(start_delay)
+        kinds, weights = list(mix), list(mix.values())
+        for _ in range(jobs):
+            kind = rng.choices(kinds, weights)[0]
+            submitted = time.time()
+            try:
+                record = getattr(self, f"run_{kind}")(session_id, rng)
+            except Exception as e:
+                record = {"pages": 0, "status": "error", "error": str(e), "queue_first": 0.0, "queue_total": 0.0}
+            record.update(user=number, kind=kind, submitted=submitted, latency=time.time() - submitted)
+            with self._lock:
+                self.records.append(record)
+            if think_time:
+                time.sleep(rng.expovariate(1.0 / think_time))
+
+
+class ResourceSampler:
+    """Samples RSS (this process and its children, e.g. OCR workers) and scheduler load on a thread."""
+
+    def __init__(self, scheduler, interval=1.0):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._start = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            stats = self.scheduler.stats()
+            self.samples.append({
+                "t": time.time() - self._start,
+                "rss": current_rss(),
+                "children_rss": children_rss(),
+                "running": stats["running"],
+                "waiting": stats["waiting"],
+                "jobs": stats["jobs"],
+            })
+            if self._stop.wait(self.interval):
+                break
+
+
+# ==============================================================================
+# Report
+# ==============================================================================
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100.0 * len(ordered)) - 1)]
+
+
+def _mb(nbytes):
+    return f"{nbytes / (1024 * 1024):.0f}" if nbytes is not None else "n/a"
+
+
+def summarize(records, wall_seconds):
+    """{kind or 'all': {count, errors, pages, latency percentiles, queue percentiles}}"""
+    summary = {}
+    for kind in JOB_TYPES + ("all",):
+        rows = [r for r in records if kind in ("all", r["kind"])]
+        if not rows:
+            continue
+        ok = [r for r in rows if r["status"] == "done"]
+        entry = {"count": len(rows), "errors": len(rows) - len(ok), "pages": sum(r["pages"] for r in ok)}
+        for field in ("latency", "queue_first", "queue_total"):
+            values = [r[field] for r in ok] or [0.0]
+            entry[field] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+            entry[field]["max"] = max(values)
+        entry["jobs_per_min"] = 60.0 * len(ok) / wall_seconds if wall_seconds else 0.0
+        summary[kind] = entry
+    return summary
+
+
+def print_report(summary, samples, wall_seconds, records):
+    print(f"\nWall time: {wall_seconds:.1f} s")
+    header = "".join(f"{'p' + str(p):>8}" for p in PERCENTILES)
+    print(f"\n{'Latency (s)':<12}{'Jobs':>6}{'Errors':>8}{header}{'max':>8}{'Jobs/min':>10}")
+    for kind, entry in summary.items():
+        latency = entry["latency"]
+        print(f"{kind:<12}{entry['count']:>6}{entry['errors']:>8}"
+              + "".join(f"{latency[f'p{p}']:>8.1f}" for p in PERCENTILES)
+              + f"{latency['max']:>8.1f}{entry['jobs_per_min']:>10.1f}")
+
+    converted = summary.get("all", {})
+    ocr_pages = sum(r["pages"] for r in records if r["kind"] != "merge" and r["status"] == "done")
+    print(f"\nThroughput: {ocr_pages / wall_seconds if wall_seconds else 0:.2f} OCR pages/s, "
+          f"{converted.get('jobs_per_min', 0):.1f} jobs/min")
+
+    print(f"\n{'Queue (s)':<28}" + "".join(f"{'p' + str(p):>8}" for p in PERCENTILES) + f"{'max':>8}")
+    for kind in ("pdf", "image"):
+        if kind in summary:
+            for field, label in (("queue_first", "until first page"), ("queue_total", "summed over pages")):
+                values = summary[kind][field]
+                print(f"{kind + ' ' + label:<28}" + "".join(f"{values[f'p{p}']:>8.1f}" for p in PERCENTILES)
+                      + f"{values['max']:>8.1f}")
+
+    if samples:
+        print(f"\n{'t (s)':>7}{'RSS MB':>9}{'Workers MB':>12}{'Running':>9}{'Waiting':>9}{'Jobs':>6}")
+        step = max(1, len(samples) // TIMELINE_ROWS)
+        for sample in samples[::step]:
+            print(f"{sample['t']:>7.0f}{_mb(sample['rss']):>9}{_mb(sample['children_rss']):>12}"
+                  f"{sample['running']:>9}{sample['waiting']:>9}{sample['jobs']:>6}")
+        peak = max(samples, key=lambda s: (s["rss"] or 0) + (s["children_rss"] or 0))
+        print(f"Peak RSS: {_mb(peak['rss'])} MB + {_mb(peak['children_rss'])} MB OCR workers "
+              f"at t={peak['t']:.0f} s")
+
+    errors = [r for r in records if r["status"] != "done"]
+    for record in errors[:5]:
+        print(f"Error ({record['kind']}, user {record['user']}): {record['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test of the conversion service (headless).")
+    parser.add_argument("--users", type=int, default=4, help="Simulated users (default 4)")
+    parser.add_argument("--jobs", type=int, default=3, help="Jobs per user (default 3)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Job type weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="Mean seconds a user waits between jobs (exponential; default 2, 0 = none)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which users start (default 5)")
+    parser.add_argument("--corpus", help="Folder of PDFs/images to upload instead of synthetic pages")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None, help="OCR profile (default balanced)")
+    parser.add_argument("--searchable-pdf", action="store_true", help="Also produce searchable PDFs, as users can")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the job mix (default 1)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="Exit with status 1 if the p95 latency of all jobs exceeds this many seconds")
+    parser.add_argument("--json", metavar="PATH", help="Write every job record and RSS sample as JSON")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    pdfs, images = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if ("pdf" in mix or "merge" in mix) and not pdfs or "image" in mix and not images:
+        parser.error("the corpus needs PDFs for pdf/merge jobs and images for image jobs (adjust --mix)")
+
+    apply_tuning()  # Before the scheduler and OCR pool exist, as in the app
+    tesseract_cmd, poppler_path, tessdata_config = load_engine_config()
+    profile = get_profile(args.profile)
+    test = LoadTest(pdfs, images, profile, tesseract_cmd, poppler_path, tessdata_config, args.searchable_pdf)
+    stats = test.scheduler.stats()
+    print(f"{args.users} user(s) x {args.jobs} job(s), mix {args.mix}, profile {profile.label}, "
+          f"{len(pdfs)} PDF(s) / {len(images)} image(s)")
+    print(f"Scheduler: {stats['max_workers']} page slots, {stats['session_quota']} per session; "
+          f"memory budget {_mb(test.governor.budget_bytes)} MB")
+
+    # Start the OCR worker processes before timing anything
+    pool = get_ocr_pool(tesseract_cmd)
+    list(pool.map(abs, range(os.cpu_count() or 1)))
+
+    sampler = ResourceSampler(test.scheduler, args.sample_interval).start()
+    start = time.time()
+    users = [threading.Thread(target=test.user, daemon=True,
+                              args=(n, args.jobs, mix, args.think_time, n * args.ramp / max(args.users, 1), args.seed))
+             for n in range(args.users)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    wall_seconds = time.time() - start
+    sampler.stop()
+
+    summary = summarize(test.records, wall_seconds)
+    print_report(summary, sampler.samples, wall_seconds, test.records)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "wall_seconds": wall_seconds, "summary": summary,
+                       "jobs": test.records, "samples": sampler.samples}, f, indent=2)
+        print(f"Saved: {args.json}")
+
+    if any(r["status"] != "done" for r in test.records):
+        return 1
+    if args.max_p95 is not None and summary["all"]["latency"]["p95"] > args.max_p95:
+        print(f"p95 latency {summary['all']['latency']['p95']:.1f} s exceeds --max-p95 {args.max_p95} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
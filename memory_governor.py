@@ -0,0 +1,211 @@
+import os
+import threading
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; fall back to /proc on Linux
+    psutil = None
+
+# ==============================================================================
+# Memory Budget Governor
+# ==============================================================================
+# Predicts how much memory a page will need *before* it is rendered and only
+# admits work while the server and its OCR workers (with their Tesseract runs)
+# stay under an RSS budget. When a single page would not fit, the DPI (or
+# image upscale) is lowered instead of crashing.
+
+# Bytes per output pixel held at the peak of one page: pdftoppm RGB raster,
+# PIL -> numpy copy, BGR copy, grayscale, threshold and the PIL threshold image.
+BYTES_PER_PIXEL = 3 + 3 + 3 + 1 + 1 + 1
+
+# A single page may use at most this fraction of the budget.
+MAX_PAGE_FRACTION = 0.5
+
+MIN_DPI = 150
+DPI_STEP = 50
+MIN_UPSCALE = 1.0
+UPSCALE_STEP = 0.5
+
+
+def _default_budget_bytes():
+    env_mb = os.getenv("PDF_TOOL_RSS_BUDGET_MB")
+    if env_mb:
+        return int(float(env_mb) * 1024 * 1024)
+    # Respect container limits (cgroup v2 / v1) before physical memory
+    for limit_file in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(limit_file) as f:
+                value = f.read().strip()
+            if value.isdigit() and int(value) < (1 << 60):
+                return int(int(value) * 0.75)
+        except OSError:
+            pass
+    if psutil is not None:
+        return int(psutil.virtual_memory().total * 0.75)
+    return 4096 * 1024 * 1024
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unknown."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _proc_children_rss():
+    """children_rss() without psutil: walks /proc for descendants of this process (Linux only)."""
+    parents, rss = {}, {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/statm") as f:
+                rss[int(entry)] = int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            parents.pop(int(entry), None)  # Exited while listing
+    descendants, frontier = set(), [os.getpid()]
+    while frontier:
+        parent = frontier.pop()
+        for pid, ppid in parents.items():
+            if ppid == parent and pid not in descendants:
+                descendants.add(pid)
+                frontier.append(pid)
+    return sum(rss.get(pid, 0) for pid in descendants)
+
+
+def children_rss():
+    """
+    Combined RSS of this process's descendants in bytes (OCR workers and their
+    Tesseract runs), or None if unknown.
+    """
+    if psutil is None:
+        try:
+            return _proc_children_rss()
+        except OSError:
+            return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass  # Exited between listing and reading (e.g. a finished tesseract run)
+    return total
+
+
+def used_bytes():
+    """Memory the budget is checked against: this process plus its OCR workers."""
+    return (current_rss() or 0) + (children_rss() or 0)
+
+
+def page_sizes_from_reader(pdf_reader):
+    """Returns (width_pt, height_pt) for every page of a pypdf PdfReader."""
+    sizes = []
+    for page in pdf_reader.pages:
+        box = page.mediabox
+        user_unit = float(page.get("/UserUnit", 1))
+        sizes.append((float(box.width) * user_unit, float(box.height) * user_unit))
+    return sizes
+
+
+def predict_page_bytes(width_pt, height_pt, dpi):
+    """Peak memory to render and preprocess one PDF page at `dpi`."""
+    width_px = width_pt / 72.0 * dpi
+    height_px = height_pt / 72.0 * dpi
+    return int(width_px * height_px * BYTES_PER_PIXEL)
+
+
+def predict_image_bytes(width_px, height_px, upscale_factor=1.0):
+    """Peak memory to preprocess an uploaded image at `upscale_factor`."""
+    source = width_px * height_px * 3 * 2  # Decoded RGB + BGR copy
+    scaled = (width_px * upscale_factor) * (height_px * upscale_factor)
+    return int(source + scaled * (3 + 1 + 1 + 1))
+
+
+class MemoryGovernor:
+    """
+    Admission control for page work against an RSS budget.
+    Pages reserve their predicted footprint; a page waits while the RSS of
+    the process and its OCR workers plus outstanding reservations would
+    exceed the budget. A page is
+    always admitted when nothing else is reserved, so work never deadlocks.
+    """
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes or _default_budget_bytes()
+        self._cond = threading.Condition()
+        self._reserved = 0
+
+    @property
+    def page_limit_bytes(self):
+        return int(self.budget_bytes * MAX_PAGE_FRACTION)
+
+    def plan_dpi(self, width_pt, height_pt, dpi):
+        """Returns (dpi, predicted_bytes) lowered until the page fits its share."""
+        predicted = predict_page_bytes(width_pt, height_pt, dpi)
+        while predicted > self.page_limit_bytes and dpi - DPI_STEP >= MIN_DPI:
+            dpi -= DPI_STEP
+            predicted = predict_page_bytes(width_pt, height_pt, dpi)
+        return dpi, predicted
+
+    def plan_upscale(self, width_px, height_px, upscale_factor):
+        """Returns (upscale_factor, predicted_bytes) lowered until the image fits."""
+        predicted = predict_image_bytes(width_px, height_px, upscale_factor)
+        while predicted > self.page_limit_bytes and upscale_factor - UPSCALE_STEP >= MIN_UPSCALE:
+            upscale_factor -= UPSCALE_STEP
+            predicted = predict_image_bytes(width_px, height_px, upscale_factor)
+        return upscale_factor, predicted
+
+    def _fits(self, nbytes):
+        if self._reserved == 0:
+            return True
+        return used_bytes() + self._reserved + nbytes <= self.budget_bytes
+
+    def acquire(self, nbytes, on_wait=None, poll_interval=0.5):
+        """
+        Reserves `nbytes` of the budget, waiting while it would be exceeded.
+        `on_wait(used_bytes, budget_bytes)` is called while the page is held back.
+        """
+        with self._cond:
+            while not self._fits(nbytes):
+                if on_wait:
+                    used = used_bytes() + self._reserved
+                    self._cond.release()
+                    try:
+                        on_wait(used, self.budget_bytes)
+                    finally:
+                        self._cond.acquire()
+                self._cond.wait(poll_interval)
+            self._reserved += nbytes
+
+    def release(self, nbytes):
+        with self._cond:
+            self._reserved -= nbytes
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "reserved_bytes": self._reserved,
+                "rss_bytes": used_bytes(),  # Including OCR workers
+            }
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Process-wide governor shared by every Streamlit session."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = MemoryGovernor()
+        return _governor
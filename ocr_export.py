@@ -0,0 +1,131 @@
+import re
+import json
+
+# ==============================================================================
+# Structured OCR Export (newline-delimited JSON)
+# ==============================================================================
+# One JSON object per page, columnar so it stays compact:
+#
+#   {"page": 1, "dpi": 300, "width": 2480, "height": 3508,
+#    "lines": {"x0": [...], "y0": [...], "x1": [...], "y1": [...], "words": [3, 5, ...]},
+#    "words": {"text": [...], "x0": [...], "y0": [...], "x1": [...], "y1": [...], "conf": [...]}}
+#
+# Coordinates are integer pixels of the OCR'd page image; "conf" is Tesseract's
+# x_wconf (0-100). lines.words[i] is the number of words on line i, words are
+# stored in reading order, so line i owns the next lines.words[i] word entries.
+# Text is stored as UTF-8 (not \u escapes) to keep Tamil compact.
+
+BBOX_RE = re.compile(r'bbox (\d+) (\d+) (\d+) (\d+)')
+CONF_RE = re.compile(r'x_wconf (\d+)')
+
+
+def _bbox(title):
+    match = BBOX_RE.search(title or "")
+    return [int(g) for g in match.groups()] if match else [0, 0, 0, 0]
+
+
+def parse_hocr(hocr_content):
+    """lxml tree of Tesseract hOCR, read as UTF-8 even without a charset declaration."""
+    import lxml.html
+
+    if isinstance(hocr_content, str):
+        hocr_content = hocr_content.encode("utf-8")
+    return lxml.html.document_fromstring(hocr_content, parser=lxml.html.HTMLParser(encoding="utf-8"))
+
+
+def hocr_tostring(root):
+    """
+    Serialises a parse_hocr() tree back to hOCR bytes. Written as HTML: the
+    HTML parser keeps xmlns/xml:lang as plain attributes, which an XML
+    serialiser would repeat. The charset is declared because the parser drops
+    Tesseract's http-equiv meta.
+    """
+    import lxml.html
+
+    head = root.find("head")
+    if head is not None and not head.xpath("meta[@charset]"):
+        meta = lxml.html.Element("meta")
+        meta.set("charset", "utf-8")
+        head.insert(0, meta)
+    return lxml.html.tostring(root, encoding="unicode", method="html", doctype="<!DOCTYPE html>").encode("utf-8")
+
+
+def hocr_to_record(hocr_content, page_num, dpi=None):
+    """Builds the columnar page record from Tesseract hOCR output."""
+    root = parse_hocr(hocr_content)
+    record = {"page": page_num, "dpi": dpi, "width": 0, "height": 0}
+    pages = root.xpath("//div[@class='ocr_page']")
+    if pages:
+        x0, y0, x1, y1 = _bbox(pages[0].get("title"))
+        record["width"], record["height"] = x1 - x0, y1 - y0
+
+    lines = {"x0": [], "y0": [], "x1": [], "y1": [], "words": []}
+    words = {"text": [], "x0": [], "y0": [], "x1": [], "y1": [], "conf": []}
+    for line in root.xpath("//span[@class='ocr_line' or @class='ocr_caption' "
+                           "or @class='ocr_header' or @class='ocr_textfloat']"):
+        count = 0
+        for word in line.xpath(".//span[@class='ocrx_word']"):
+            text = word.text_content().strip()
+            if not text:
+                continue
+            title = word.get("title")
+            bx0, by0, bx1, by1 = _bbox(title)
+            conf = CONF_RE.search(title or "")
+            words["text"].append(text)
+            words["x0"].append(bx0)
+            words["y0"].append(by0)
+            words["x1"].append(bx1)
+            words["y1"].append(by1)
+            words["conf"].append(int(conf.group(1)) if conf else -1)
+            count += 1
+        if not count:
+            continue
+        lx0, ly0, lx1, ly1 = _bbox(line.get("title"))
+        lines["x0"].append(lx0)
+        lines["y0"].append(ly0)
+        lines["x1"].append(lx1)
+        lines["y1"].append(ly1)
+        lines["words"].append(count)
+
+    record["lines"] = lines
+    record["words"] = words
+    return record
+
+
+def record_to_json_line(record):
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def hocr_to_json_line(hocr_content, page_num, dpi=None):
+    """One NDJSON line (bytes) for a page."""
+    return record_to_json_line(hocr_to_record(hocr_content, page_num, dpi))
+
+
+# ==============================================================================
+# Reader
+# ==============================================================================
+
+def iter_pages(path_or_file):
+    """Yields page records from an NDJSON export (path or binary/text file object)."""
+    if not hasattr(path_or_file, "read"):
+        with open(path_or_file, "rb") as f:
+            yield from iter_pages(f)
+        return
+    for raw in path_or_file:
+        raw = raw.strip()
+        if raw:
+            yield json.loads(raw)
+
+
+def iter_lines(record):
+    """Yields (line_bbox, [(text, bbox, conf), ...]) for every line of a page record."""
+    lines, words = record["lines"], record["words"]
+    w = 0
+    for i, count in enumerate(lines["words"]):
+        line_bbox = (lines["x0"][i], lines["y0"][i], lines["x1"][i], lines["y1"][i])
+        line_words = []
+        for j in range(w, w + count):
+            bbox = (words["x0"][j], words["y0"][j], words["x1"][j], words["y1"][j])
+            line_words.append((words["text"][j], bbox, words["conf"][j]))
+        w += count
+        yield line_bbox, line_words
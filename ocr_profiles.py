@@ -0,0 +1,96 @@
+import os
+import shlex
+
+from conversion_core import DEFAULT_LANG
+
+# ==============================================================================
+# OCR Profiles (speed vs. accuracy)
+# ==============================================================================
+# Each profile fixes the Tesseract engine mode (OEM), page segmentation mode
+# (PSM), the model set and the preprocessing defaults. Model sets live next to
+# the app in tessdata_fast/ and tessdata_best/ (see setup_tesseract.py --models);
+# a profile whose models are missing falls back to the default tessdata.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class OcrProfile:
+    def __init__(self, name, label, description, oem, psm, models, dpi, upscale_factor, mode):
+        self.name = name
+        self.label = label
+        self.description = description
+        self.oem = oem                        # 1 = LSTM only (the fast/best models have no legacy engine)
+        self.psm = psm                        # 3 = automatic layout, 6 = one uniform block of text
+        self.models = models                  # Model folder next to the app, or None for the default tessdata
+        self.dpi = dpi                        # PDF render DPI
+        self.upscale_factor = upscale_factor  # Image upscale (the PDF path renders at `dpi` instead)
+        self.mode = mode                      # preprocess_image() enhancement mode
+
+    def tessdata_dir(self, lang=DEFAULT_LANG):
+        """The profile's model folder if it holds every language (and the hOCR config), else None."""
+        if not self.models:
+            return None
+        path = os.path.join(APP_DIR, self.models)
+        required = [f"{code}.traineddata" for code in lang.split("+")] + [os.path.join("configs", "hocr")]
+        if all(os.path.exists(os.path.join(path, name)) for name in required):
+            return path
+        return None
+
+    def models_available(self, lang=DEFAULT_LANG):
+        return not self.models or self.tessdata_dir(lang) is not None
+
+    def setup_command(self):
+        """How to download this profile's models."""
+        return f"python setup_tesseract.py --models {self.models.replace('tessdata_', '')}"
+
+    def tesseract_config(self, lang=DEFAULT_LANG):
+        """Tesseract command-line options for this profile."""
+        options = [f"--oem {self.oem}", f"--psm {self.psm}"]
+        path = self.tessdata_dir(lang)
+        if path:
+            options.insert(0, f"--tessdata-dir {_quote_path(path)}")
+        return " ".join(options)
+
+    def preprocess_kwargs(self, upscale_factor=None):
+        return {"upscale_factor": self.upscale_factor if upscale_factor is None else upscale_factor, "mode": self.mode}
+
+
+def _quote_path(path):
+    # pytesseract splits the config with shlex (non-POSIX rules on Windows,
+    # where quotes would be passed through), so on Windows a path with spaces
+    # is given relative to the working directory instead.
+    if not any(c.isspace() for c in path):
+        return path
+    if os.name != "nt":
+        return shlex.quote(path)
+    relative = os.path.relpath(path)
+    return relative if not any(c.isspace() for c in relative) else path
+
+
+PROFILES = {
+    "draft": OcrProfile(
+        "draft", "Draft (fast)",
+        "Fast integer models, one text block per page, 200 DPI. For quick read-throughs.",
+        oem=1, psm=6, models="tessdata_fast", dpi=200, upscale_factor=1.0, mode="Standard (Auto)"
+    ),
+    "balanced": OcrProfile(
+        "balanced", "Balanced",
+        "Standard models with automatic layout at 300 DPI. A good default for most scripts.",
+        oem=1, psm=3, models=None, dpi=300, upscale_factor=2.0, mode="Standard (Auto)"
+    ),
+    "archive": OcrProfile(
+        "archive", "Archive (best)",
+        "Most accurate float models at 400 DPI with denoising. Slowest.",
+        oem=1, psm=3, models="tessdata_best", dpi=400, upscale_factor=2.5, mode="Denoise & Sharpen"
+    ),
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def get_profile(name=None):
+    """Looks up a profile by name (or label); raises ValueError for unknown names."""
+    name = name or os.getenv("PDF_TOOL_OCR_PROFILE") or DEFAULT_PROFILE
+    for profile in PROFILES.values():
+        if name.lower() in (profile.name, profile.label.lower()):
+            return profile
+    raise ValueError(f"Unknown OCR profile '{name}'. Choose from: {', '.join(PROFILES)}")
@@ -1,75 +1,32 @@
 import os
+import re
 import sys
-import numpy as np
-import cv2
-from PIL import Image
-from pdf2image import convert_from_path
-import pytesseract
+import argparse
 from docx import Document
 from docx.shared import Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from tqdm import tqdm
 import glob
 from bs4 import BeautifulSoup
-import re
+from conversion_core import (load_engine_config, parse_bbox, hocr_to_text, ConversionPipeline, PdfSource,
+                             merge_pdf_pages, parse_page_ranges, format_page_ranges, ENHANCEMENT_MODES)
+from ocr_export import hocr_to_json_line
+from search_index import SearchIndex, sha256_of_file
+from ocr_profiles import PROFILES, DEFAULT_PROFILE, get_profile
+from tuning import apply_tuning
+from two_pass import DEFAULT_SECOND_PASS_DPI, DEFAULT_MIN_CONFIDENCE
+from trace_recorder import TraceRecorder, span
 
 # Configuration
 # ==============================================================================
 
-# 1. Tesseract Executable Path
-possible_tesseract_paths = [
-    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-    os.path.join(os.getenv('LOCALAPPDATA'), r"Tesseract-OCR\tesseract.exe")
-]
-TESSERACT_CMD = None
-for path in possible_tesseract_paths:
-    if os.path.exists(path):
-        TESSERACT_CMD = path
-        break
-
-if not TESSERACT_CMD:
-    print("Warning: Tesseract executable not found in common locations.")
-    print("Please ensure Tesseract is installed and added to PATH, or update the script.")
-else:
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
-
-# 2. Poppler Path
-POPPLER_PATH = r"C:\Users\richardjoel.d\AppData\Local\Microsoft\WinGet\Packages\oschwartz10612.Poppler_Microsoft.Winget.Source_8wekyb3d8bbwe\poppler-25.07.0\Library\bin"
-
-# 3. Tesseract Data Path
-TESSDATA_CONFIG = ""
-if TESSERACT_CMD:
-    tess_base = os.path.dirname(TESSERACT_CMD)
-    sys_tessdata = os.path.join(tess_base, "tessdata")
-    if not os.path.exists(os.path.join(sys_tessdata, "tam.traineddata")):
-        local_tessdata = os.path.join(os.getcwd(), "tessdata")
-        if os.path.exists(os.path.join(local_tessdata, "tam.traineddata")):
-            os.environ["TESSDATA_PREFIX"] = local_tessdata
-            print(f"Using local tessdata: {local_tessdata}")
+# Tesseract executable, Poppler and tessdata discovery are shared with app.py
+TESSERACT_CMD, POPPLER_PATH, TESSDATA_CONFIG = load_engine_config()
 
-# ==============================================================================
+BATCH_JOBS = 2                     # Documents converted at once in batch mode (they share the OCR processes)
+BATCH_MANIFEST_SAVE_SECONDS = 30
 
-def preprocess_image(pil_image):
-    """
-    Increases contrast and converts to grayscale to improve OCR accuracy.
-    """
-    open_cv_image = np.array(pil_image) 
-    if len(open_cv_image.shape) == 3:
-        open_cv_image = open_cv_image[:, :, ::-1].copy()
-
-    gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return Image.fromarray(thresh)
-
-def parse_bbox(title_str):
-    """Parses 'bbox x0 y0 x1 y1' from title attribute"""
-    if not title_str:
-        return None
-    match = re.search(r'bbox (\d+) (\d+) (\d+) (\d+)', title_str)
-    if match:
-        return [int(g) for g in match.groups()]
-    return None
+# ==============================================================================
 
 def hocr_to_docx(hocr_content, doc, page_num):
     """
@@ -176,70 +133,354 @@ def hocr_to_docx(hocr_content, doc, page_num):
     # Add page break after processing page (except last one handled by loop)
     # doc.add_page_break() # Handled in main loop
 
-def pdf_to_docx(pdf_file, output_docx):
+def pdf_to_docx(pdf_file, output_docx, output_pdf=None, output_json=None, output_trace=None, search_index=None,
+                profile=None, reuse_regions=True, second_pass_dpi=None, min_confidence=DEFAULT_MIN_CONFIDENCE,
+                pages=None, progress=True):
+    """
+    Converts a scanned PDF to DOCX and returns True if every page was read. With `output_pdf`, also writes a
+    searchable PDF built from the same OCR pass; with `output_json`, the word
+    boxes and confidences as JSON Lines (see ocr_export.py); with
+    `output_trace`, a Chrome trace of every page and stage (see
+    trace_recorder.py). With `search_index`, the recognised lines are added to that SearchIndex.
+    `profile` is an OcrProfile (default: $PDF_TOOL_OCR_PROFILE or Balanced).
+    With `reuse_regions`, headers/footers repeated on every page are OCR'd once.
+    With `second_pass_dpi`, lines below `min_confidence` are re-read at that DPI.
+    `pages` ("12-18,40") converts only those pages; partial documents are not indexed.
+    progress=False hides the page progress bar (several documents at once).
+    """
+    profile = profile or get_profile()
     print(f"Processing: {pdf_file}")
     
-    # Step 1: Convert PDF to Images
+    # Pages are rendered, preprocessed and OCR'd concurrently by the shared
+    # pipeline; results arrive here in page order for DOCX writing.
     try:
-        print("Converting PDF pages to images...")
-        images = convert_from_path(pdf_file, poppler_path=POPPLER_PATH)
+        selected = None
+        if pages:
+            from pypdf import PdfReader
+            selected = parse_page_ranges(pages, len(PdfReader(pdf_file).pages))
+            search_index = None  # A partial document would replace the full one in the index
+        source = PdfSource(pdf_path=pdf_file, dpi=profile.dpi, poppler_path=POPPLER_PATH, pages=selected)
     except Exception as e:
-        print(f"Error converting PDF to images: {e}")
-        return
+        print(f"Error reading PDF {pdf_file}: {e}")
+        return False
 
     doc = Document()
+    total_pages = len(source)
     
-    print(f"Starting OCR and HOCR parsing for {len(images)} pages...")
+    if selected:
+        print(f"Starting OCR and HOCR parsing for {total_pages} selected pages ({pages})...")
+    else:
+        print(f"Starting OCR and HOCR parsing for {total_pages} pages...")
     
-    for i, image in enumerate(tqdm(images, desc="Processing Pages", unit="page")):
-        # Preprocess
-        processed_img = preprocess_image(image)
-        
-        try:
-            # Get HOCR output
-            hocr = pytesseract.image_to_pdf_or_hocr(
-                processed_img, 
-                extension='hocr',
-                lang='eng+tam',
-                config=TESSDATA_CONFIG + " -c hocr_font_info=1"
-            )
-            
+    trace = TraceRecorder(os.path.basename(pdf_file)) if output_trace else None
+    pipeline = ConversionPipeline(source, preprocess_kwargs=profile.preprocess_kwargs(upscale_factor=1.0),
+                                  config=f"{TESSDATA_CONFIG} {profile.tesseract_config()}".strip(),
+                                  tesseract_cmd=TESSERACT_CMD,
+                                  searchable_pdf=output_pdf is not None,
+                                  thumbnails=search_index is not None,
+                                  reuse_regions=reuse_regions,
+                                  second_pass_dpi=second_pass_dpi, min_confidence=min_confidence,
+                                  trace=trace)
+    pdf_pages = []
+    pdf_without_text = []
+    pdf_dropped = []
+    page_texts = []
+    thumbnails = {}
+    page_errors = 0
+    json_file = open(output_json, "wb") if output_json else None
+    try:
+        for result in tqdm(pipeline.results(), total=total_pages, desc="Processing Pages", unit="page",
+                           disable=not progress):
+            i = result.index
+            page_num = source.page_number(i)  # Number in the PDF (differs with `pages`)
+            if result.error is not None:
+                page_errors += 1
+                print(f"Error on page {page_num} of {pdf_file}: {result.error}")
+                doc.add_paragraph(f"[Error reading page {page_num}]")
+                if result.pdf is not None:  # Image-only page, so the searchable PDF keeps its numbering
+                    pdf_pages.append(result.pdf)
+                    pdf_without_text.append(page_num)
+                elif output_pdf:
+                    pdf_dropped.append(page_num)
+                continue
+
             # Parse and write to DOCX
-            hocr_to_docx(hocr, doc, i + 1)
+            with span(trace, "docx append", "output", page=page_num):
+                hocr_to_docx(result.hocr, doc, page_num)
+            if result.pdf is not None:
+                pdf_pages.append(result.pdf)
+            with span(trace, "parse", "output", page=page_num):
+                if json_file:
+                    json_file.write(hocr_to_json_line(result.hocr, page_num, result.dpi))
+                if search_index is not None:
+                    page_texts.append((page_num, hocr_to_text(result.hocr, corrections=False)))
+                    if result.thumbnail is not None:
+                        thumbnails[page_num] = result.thumbnail
             
             # Add page break between pages
-            if i < len(images) - 1:
+            if i < total_pages - 1:
                 doc.add_page_break()
-                
-        except pytesseract.TesseractError as e:
-            print(f"Error on page {i+1}: {e}")
-            doc.add_paragraph(f"[Error reading page {i+1}]")
+    finally:
+        if json_file:
+            json_file.close()
+
+    if pipeline.second_pass_dpi:
+        stats = pipeline.second_pass_stats
+        print(f"Two-pass OCR: re-read {stats['lines']} low-confidence line(s) at {second_pass_dpi} DPI, "
+              f"{stats['improved']} improved")
+    if pipeline.region_cache is not None and pipeline.region_cache.reused_count:
+        print(f"Reused text of {pipeline.region_cache.reused_count} repeated header/footer region(s)")
 
     # Save
-    doc.save(output_docx)
+    with span(trace, "docx save", "output"):
+        doc.save(output_docx)
     print(f"Successfully saved to: {output_docx}")
+    if output_pdf and pdf_pages:
+        with span(trace, "pdf merge", "output", pages=len(pdf_pages)):
+            with open(output_pdf, "wb") as f:
+                f.write(merge_pdf_pages(pdf_pages))
+        print(f"Searchable PDF saved to: {output_pdf}")
+        if pdf_without_text:
+            print(f"Warning: page(s) {format_page_ranges(pdf_without_text)} have no text layer (OCR failed)")
+        if pdf_dropped:
+            print(f"Warning: page(s) {format_page_ranges(pdf_dropped)} are missing from the searchable PDF")
+    if search_index is not None and page_errors:
+        # Indexed content is keyed by hash, so a partial entry would block the full one later
+        print(f"Not indexed for search: {page_errors} page(s) failed")
+    elif search_index is not None:
+        try:
+            source_path = os.path.abspath(pdf_file)
+            search_index.index_document(source_path, os.path.basename(pdf_file),
+                                        sha256_of_file(source_path), page_texts, thumbnails)
+            print(f"Indexed for search: {search_index.path}")
+        except Exception as e:
+            print(f"Could not update search index: {e}")
+    if trace is not None:
+        trace.save(output_trace)
+        print(f"Trace saved to: {output_trace} (open in https://ui.perfetto.dev or chrome://tracing)")
+    return page_errors == 0
+
+def output_paths(pdf, args):
+    """Returns (docx, searchable PDF or None, JSON or None, trace or None) paths next to the input PDF."""
+    base = os.path.splitext(pdf)[0]
+    if args.pages:
+        base += "_pages_" + re.sub(r"[^0-9-]+", "_", args.pages.strip())  # Keep the full conversion's files
+    return (
+        base + ".docx",
+        (base + "_searchable.pdf") if args.searchable_pdf else None,
+        None if args.no_json else (base + ".ocr.jsonl"),
+        (base + ".trace.json") if args.trace else None
+    )
+
+def batch_settings(args, profile):
+    """Everything besides the input that changes a batch's outputs; a change reconverts every PDF."""
+    return {
+        "profile": profile.name, "dpi": profile.dpi, "mode": profile.mode,
+        "tesseract_config": profile.tesseract_config(), "reuse_regions": not args.no_region_reuse,
+        "two_pass": args.two_pass, "min_conf": args.min_conf if args.two_pass else None, "pages": args.pages,
+    }
+
+def convert_batch(root, args, search_index, profile):
+    """
+    Converts the new and changed PDFs under `root` (recursively), `args.jobs`
+    documents at a time, and prints a summary. Returns the number of failures.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from batch_manifest import BatchManifest, find_pdfs
+
+    manifest = BatchManifest(root)
+    settings = batch_settings(args, profile)
+    pdf_files = find_pdfs(root)
+    todo = [pdf for pdf in pdf_files if args.force or not manifest.is_current(pdf, settings, output_paths(pdf, args))]
+    print(f"{len(pdf_files)} PDF(s) under {root}: {len(todo)} to convert, {len(pdf_files) - len(todo)} up to date")
+
+    def convert(pdf):
+        outputs = output_paths(pdf, args)
+        fingerprint = manifest.fingerprint(pdf)
+        complete = pdf_to_docx(pdf, *outputs, search_index=search_index, profile=profile,
+                               reuse_regions=not args.no_region_reuse, second_pass_dpi=args.two_pass,
+                               min_confidence=args.min_conf, pages=args.pages, progress=args.jobs == 1)
+        if complete:
+            manifest.record(pdf, settings, outputs, fingerprint)
+        else:
+            manifest.forget(pdf)  # Retried on the next run
+        return complete
+
+    start = last_save = time.time()
+    converted, failed = [], []
+    try:
+        # Documents overlap, so the shared OCR pool stays busy across document boundaries
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            futures = {pool.submit(convert, pdf): pdf for pdf in todo}
+            for future in as_completed(futures):
+                pdf = futures[future]
+                try:
+                    complete = future.result()
+                except Exception as e:
+                    print(f"Error converting {pdf}: {e}")
+                    complete = False
+                (converted if complete else failed).append(pdf)
+                print(f"[{len(converted) + len(failed)}/{len(todo)}] {'Done' if complete else 'FAILED'}: {pdf}")
+                if time.time() - last_save > BATCH_MANIFEST_SAVE_SECONDS:  # An interrupted run keeps its progress
+                    manifest.save()
+                    last_save = time.time()
+    finally:
+        manifest.save()
+
+    elapsed = time.time() - start
+    print(f"\nBatch summary: {len(converted)} converted, {len(pdf_files) - len(todo)} up to date, "
+          f"{len(failed)} failed in {int(elapsed // 60)}m {elapsed % 60:.0f}s (manifest: {manifest.path})")
+    for pdf in failed:
+        print(f"  Failed or incomplete: {pdf}")
+    return len(failed)
+
+def tune(argv):
+    """`pdf_to_docx.py tune`: finds the fastest worker/thread settings for this machine."""
+    from tuning import DEFAULT_TUNING_PATH, candidate_settings, render_samples, calibrate, save_tuning
+
+    parser = argparse.ArgumentParser(prog="pdf_to_docx.py tune",
+                                     description="Calibrate OCR processes, OMP_THREAD_LIMIT and OpenCV threads.")
+    parser.add_argument("sample", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_document.pdf"),
+                        help="PDF with typical pages (first 8 pages are used)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None, help="OCR profile to calibrate with")
+    parser.add_argument("--pages", type=int, default=None, help="Pages per measurement (default: 2 per core)")
+    parser.add_argument("--output", default=DEFAULT_TUNING_PATH, help=f"Where to save the settings (default: {DEFAULT_TUNING_PATH})")
+    args = parser.parse_args(argv)
+
+    profile = get_profile(args.profile)
+    samples = render_samples(args.sample, profile.dpi, POPPLER_PATH, args.pages)
+    candidates = candidate_settings()
+    print(f"Calibrating on {len(samples)} pages of {args.sample} ({len(candidates)} combinations, profile {profile.label})")
+    print(f"{'Processes':>10}{'OMP threads':>13}{'cv2 threads':>13}{'Pages/s':>10}")
+
+    def report(settings, rate):
+        workers, omp, cv = settings
+        print(f"{workers:>10}{omp or 'default':>13}{cv or 'default':>13}{rate:>10.2f}")
+
+    best = calibrate(samples, candidates, tesseract_cmd=TESSERACT_CMD,
+                     config=f"{TESSDATA_CONFIG} {profile.tesseract_config()}".strip(),
+                     preprocess_kwargs=profile.preprocess_kwargs(upscale_factor=1.0), on_result=report)
+    path = save_tuning(best, args.output)
+    print(f"\nBest: {best['ocr_workers']} processes, OMP_THREAD_LIMIT={best['omp_thread_limit'] or 'default'}, "
+          f"cv2 threads={best['cv2_threads'] or 'default'}: {best['pages_per_sec']:.2f} pages/s "
+          f"(untuned: {best['baseline_pages_per_sec']:.2f} pages/s)")
+    print(f"Saved to {path}; the app and CLI load it at startup.")
+
+def compress(argv):
+    """`pdf_to_docx.py compress`: rewrites scanned PDFs as compact bilevel (CCITT G4) pages."""
+    from compress_pdf import DEFAULT_COMPRESS_DPI, compress_pdf, size_report
+
+    parser = argparse.ArgumentParser(prog="pdf_to_docx.py compress",
+                                     description="Shrink scanned PDFs: pages are binarised and stored as CCITT G4 images.")
+    parser.add_argument("input", help="PDF file or directory of PDF files")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_COMPRESS_DPI,
+                        help=f"Rendering resolution of the rewritten pages (default {DEFAULT_COMPRESS_DPI})")
+    parser.add_argument("--mode", choices=ENHANCEMENT_MODES, default=ENHANCEMENT_MODES[0],
+                        help="Binarisation / text enhancement mode (default: %(default)s)")
+    parser.add_argument("--ocr", action="store_true", help="Keep the document searchable: add an OCR text layer")
+    parser.add_argument("--pages", metavar="RANGES", help="Keep only these pages, e.g. 1-10,12")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None, help="OCR profile for --ocr")
+    args = parser.parse_args(argv)
+
+    profile = get_profile(args.profile)
+    if os.path.isdir(args.input):
+        pdf_files = sorted(glob.glob(os.path.join(args.input, "*.pdf")))
+    else:
+        pdf_files = [args.input]
+    pdf_files = [pdf for pdf in pdf_files if not pdf.endswith("_compressed.pdf")]
+    total_before = total_after = 0
+    for pdf in pdf_files:
+        from pypdf import PdfReader
+
+        page_count = len(PdfReader(pdf).pages)
+        pages = parse_page_ranges(args.pages, page_count) if args.pages else list(range(1, page_count + 1))
+        output = os.path.splitext(pdf)[0] + "_compressed.pdf"
+        with tqdm(total=len(pages), desc=os.path.basename(pdf), unit="page") as bar:
+            data = compress_pdf(pdf, dpi=args.dpi, mode=args.mode, text_layer=args.ocr,
+                                config=f"{TESSDATA_CONFIG} {profile.tesseract_config()}".strip(),
+                                poppler_path=POPPLER_PATH, tesseract_cmd=TESSERACT_CMD, pages=pages,
+                                on_page=lambda done, total: bar.update(done - bar.n))
+        with open(output, "wb") as f:
+            f.write(data)
+        before, after = os.path.getsize(pdf), len(data)
+        total_before += before
+        total_after += after
+        print(f"{os.path.basename(pdf)}: {size_report(before, after)} -> {output}")
+    if len(pdf_files) > 1:
+        print(f"Total: {size_report(total_before, total_after)}")
 
 def main():
-    if len(sys.argv) > 1:
-        input_path = sys.argv[1]
+    if len(sys.argv) > 1 and sys.argv[1] == "tune":
+        return tune(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "compress":
+        apply_tuning()
+        return compress(sys.argv[2:])
+    apply_tuning()
+
+    parser = argparse.ArgumentParser(description="Convert scanned PDF scripts into editable Word documents. "
+                                                 "Run 'pdf_to_docx.py tune' once to calibrate this machine; "
+                                                 "'pdf_to_docx.py compress' shrinks scanned PDFs.")
+    parser.add_argument("input", nargs="?",
+                        help="PDF file, or a directory: its PDFs (recursively) that are new or changed since the last run")
+    parser.add_argument("--searchable-pdf", action="store_true",
+                        help="Also write <name>_searchable.pdf with a text layer from the same OCR pass")
+    parser.add_argument("--no-json", action="store_true",
+                        help="Do not write <name>.ocr.jsonl (word boxes and confidences)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="Do not add the converted text to the search index (PDF_TOOL_INDEX_PATH)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None,
+                        help=f"OCR speed/accuracy profile (default: $PDF_TOOL_OCR_PROFILE or {DEFAULT_PROFILE})")
+    parser.add_argument("--no-region-reuse", action="store_true",
+                        help="OCR headers/footers on every page even when they repeat")
+    parser.add_argument("--two-pass", nargs="?", type=int, const=DEFAULT_SECOND_PASS_DPI, default=None, metavar="DPI",
+                        help=f"Re-read low-confidence lines at DPI (default {DEFAULT_SECOND_PASS_DPI}) after the first pass")
+    parser.add_argument("--min-conf", type=int, default=DEFAULT_MIN_CONFIDENCE,
+                        help=f"Two-pass: re-read lines whose mean word confidence is below this (default {DEFAULT_MIN_CONFIDENCE})")
+    parser.add_argument("--pages", metavar="RANGES",
+                        help="Convert only these pages, e.g. 12-18,40 (output: <name>_pages_12-18_40.docx)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Write <name>.trace.json: per-page stage timings in Chrome trace-event format")
+    parser.add_argument("--jobs", type=int, default=BATCH_JOBS,
+                        help=f"Directory input: documents converted at once (default {BATCH_JOBS})")
+    parser.add_argument("--force", action="store_true",
+                        help="Directory input: reconvert every PDF, even those up to date in the manifest")
+    args = parser.parse_args()
+    index = None if args.no_index else SearchIndex()
+    profile = get_profile(args.profile)
+
+    if not TESSERACT_CMD:
+        print("Warning: Tesseract executable not found in common locations.")
+        print("Please ensure Tesseract is installed and added to PATH, or update the script.")
+    elif os.getenv("TESSDATA_PREFIX"):
+        print(f"Using local tessdata: {os.environ['TESSDATA_PREFIX']}")
+    print(f"OCR profile: {profile.label}")
+    if not profile.models_available():
+        print(f"Warning: {profile.models}/ not found, using the default models (run: {profile.setup_command()})")
+
+    if args.input:
+        input_path = args.input
         if os.path.isdir(input_path):
-            pdf_files = glob.glob(os.path.join(input_path, "*.pdf"))
-            for pdf in pdf_files:
-                out_name = os.path.splitext(pdf)[0] + ".docx"
-                pdf_to_docx(pdf, out_name)
+            return 1 if convert_batch(input_path, args, index, profile) else 0
         elif os.path.isfile(input_path) and input_path.lower().endswith(".pdf"):
-            out_name = os.path.splitext(input_path)[0] + ".docx"
-            pdf_to_docx(input_path, out_name)
+            complete = pdf_to_docx(input_path, *output_paths(input_path, args), search_index=index, profile=profile,
+                                   reuse_regions=not args.no_region_reuse, second_pass_dpi=args.two_pass,
+                                   min_confidence=args.min_conf, pages=args.pages)
+            return 0 if complete else 1
         else:
             print("Invalid input. Please provide a PDF file or directory.")
+            return 2
     else:
         print("Usage: python pdf_to_docx.py <path_to_pdf_or_directory>")
         path = input("Enter path to PDF file: ").strip().strip('"')
         if os.path.isfile(path):
-            out_name = os.path.splitext(path)[0] + ".docx"
-            pdf_to_docx(path, out_name)
+            complete = pdf_to_docx(path, *output_paths(path, args), search_index=index, profile=profile,
+                                   reuse_regions=not args.no_region_reuse, second_pass_dpi=args.two_pass,
+                                   min_confidence=args.min_conf, pages=args.pages)
+            return 0 if complete else 1
         else:
             print("File not found.")
+            return 2
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
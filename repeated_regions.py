@@ -0,0 +1,239 @@
+import re
+import threading
+
+from bilevel import BilevelPage
+from ocr_export import parse_hocr, hocr_tostring
+
+# ==============================================================================
+# Repeated Header/Footer Regions
+# ==============================================================================
+# Production scripts repeat the same title block, "CONFIDENTIAL" strip or
+# footer on every page. After preprocessing, the ink bands in the top and
+# bottom of each page are hashed (dHash). A band matching one already OCR'd in
+# this document (same size, near-identical pixels) is blanked before Tesseract
+# runs, and the cached hOCR lines are spliced back in at the band's position.
+# Bands that change between pages (e.g. "Page 3") fail the pixel check and are
+# OCR'd normally.
+
+EDGE_FRACTION = 0.15      # Header/footer zones: top and bottom 15% of the page
+BAND_GAP_FRACTION = 0.006 # Blank rows (fraction of page height) that separate bands
+MIN_INK_PIXELS = 2        # Rows/columns with fewer ink pixels count as blank (specks)
+HASH_SIZE = (64, 16)      # dHash grid: 64 x 16 = 1024 bits
+MAX_HASH_DISTANCE = 48    # Bits that may differ before the pixel check is attempted
+MAX_PIXEL_DIFF = 0.02     # Fraction of ink pixels that may differ for "identical"
+SIZE_TOLERANCE = 2        # Pixels of width/height difference allowed
+MAX_ENTRIES = 64          # Distinct regions remembered per document
+
+BBOX_RE = re.compile(r'bbox (-?\d+) (-?\d+) (-?\d+) (-?\d+)')
+LINE_CLASSES = ("ocr_line", "ocr_header", "ocr_caption", "ocr_textfloat")
+
+
+def _runs(mask, max_gap):
+    """(start, end) of True runs in a 1-D mask, joining runs separated by <= max_gap False values."""
+    import numpy as np
+
+    idx = np.flatnonzero(mask)
+    if idx.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > max_gap + 1)
+    starts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    ends = np.concatenate((idx[breaks], [idx[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def find_edge_bands(ink):
+    """Ink bounding boxes (x0, y0, x1, y1) of text bands in the header and footer zones."""
+    height = ink.shape[0]
+    rows = ink.sum(axis=1) >= MIN_INK_PIXELS
+    bands = []
+    for y0, y1 in _runs(rows, max(1, int(height * BAND_GAP_FRACTION))):
+        if y1 > height * EDGE_FRACTION and y0 < height * (1 - EDGE_FRACTION):
+            continue  # Body text
+        cols = _runs(ink[y0:y1].sum(axis=0) >= 1, ink.shape[1])
+        if cols:
+            bands.append((cols[0][0], y0, cols[-1][1], y1))
+    return bands
+
+
+def dhash(bitmap):
+    """1024-bit difference hash of a boolean ink bitmap (packed into 128 bytes)."""
+    import cv2
+    import numpy as np
+
+    small = cv2.resize(bitmap.astype(np.uint8) * 255, (HASH_SIZE[0] + 1, HASH_SIZE[1]),
+                       interpolation=cv2.INTER_AREA).astype(np.int16)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+def _hash_distance(a, b):
+    import numpy as np
+
+    return int(np.unpackbits(a ^ b).sum())
+
+
+def _same_pixels(a, b):
+    """True if two ink bitmaps match to within MAX_PIXEL_DIFF, allowing a 1-pixel shift."""
+    import numpy as np
+
+    if abs(a.shape[0] - b.shape[0]) > SIZE_TOLERANCE or abs(a.shape[1] - b.shape[1]) > SIZE_TOLERANCE:
+        return False
+    h, w = min(a.shape[0], b.shape[0]) - 2, min(a.shape[1], b.shape[1]) - 2
+    if h <= 0 or w <= 0:
+        return False
+    core = a[1:1 + h, 1:1 + w]
+    allowed = MAX_PIXEL_DIFF * max(int(core.sum()), 1)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            if np.count_nonzero(core ^ b[dy:dy + h, dx:dx + w]) <= allowed:
+                return True
+    return False
+
+
+def _shift_title(title, dx, dy):
+    return BBOX_RE.sub(
+        lambda m: "bbox {} {} {} {}".format(int(m.group(1)) + dx, int(m.group(2)) + dy,
+                                            int(m.group(3)) + dx, int(m.group(4)) + dy),
+        title
+    )
+
+
+def _shift_element(element, dx, dy):
+    for node in element.iter():
+        if node.get("title"):
+            node.set("title", _shift_title(node.get("title"), dx, dy))
+        if "id" in node.attrib:
+            del node.attrib["id"]  # Avoid duplicate ids across spliced copies
+
+
+def _bbox(element):
+    match = BBOX_RE.search(element.get("title") or "")
+    return [int(g) for g in match.groups()] if match else None
+
+
+class _Region:
+    def __init__(self, digest, bitmap, lines):
+        self.digest = digest
+        self.bitmap = bitmap  # BilevelPage: kept packed for the document's lifetime
+        self.lines = lines  # Serialized hOCR line elements, coordinates relative to the band origin
+
+
+class RegionPlan:
+    """What prepare() did to one page: bands reused from the cache and bands to learn."""
+
+    def __init__(self):
+        self.reused = []  # (region, bbox)
+        self.new = []     # (bbox, digest, packed bitmap), held until the page's hOCR arrives
+
+
+class RepeatedRegionCache:
+    """Per-document cache of OCR'd header/footer bands. Thread-safe."""
+
+    def __init__(self):
+        self._regions = []
+        self._lock = threading.Lock()
+        self.reused_count = 0
+
+    def _match(self, digest, bitmap):
+        with self._lock:
+            for region in self._regions:
+                if (_hash_distance(region.digest, digest) <= MAX_HASH_DISTANCE
+                        and _same_pixels(region.bitmap.to_ink(), bitmap)):
+                    return region
+        return None
+
+    def prepare(self, image):
+        """
+        Returns (image_for_ocr, plan). Known bands are painted white so
+        Tesseract skips them; pass the hOCR and plan to complete() afterwards.
+        """
+        import numpy as np
+        from PIL import Image
+
+        pixels = np.array(image.convert("L"))
+        ink = pixels < 128
+        plan = RegionPlan()
+        for x0, y0, x1, y1 in find_edge_bands(ink):
+            bitmap = ink[y0:y1, x0:x1]
+            digest = dhash(bitmap)
+            region = self._match(digest, bitmap)
+            if region is not None:
+                plan.reused.append((region, (x0, y0, x1, y1)))
+            else:
+                plan.new.append(((x0, y0, x1, y1), digest, BilevelPage.from_ink(bitmap)))
+        if plan.reused:
+            for _, (x0, y0, x1, y1) in plan.reused:
+                pixels[y0:y1, x0:x1] = 255
+            image = Image.fromarray(pixels)
+        return image, plan
+
+    def complete(self, plan, hocr):
+        """Learns this page's new bands from its hOCR and splices in the reused ones."""
+        if not plan.reused and not plan.new:
+            return hocr
+        root = parse_hocr(hocr)
+        pages = root.xpath("//div[@class='ocr_page']")
+        if not pages:
+            return hocr
+        page = pages[0]
+        if plan.new:
+            self._learn(page, plan.new)
+        if plan.reused:
+            for region, bbox in plan.reused:
+                self._splice(page, region, bbox)
+            with self._lock:
+                self.reused_count += len(plan.reused)
+        return hocr_tostring(root)
+
+    def _learn(self, page, new_bands):
+        import lxml.html
+
+        lines = [(line, _bbox(line)) for line in page.xpath(".//span[@class]") if line.get("class") in LINE_CLASSES]
+        for (x0, y0, x1, y1), digest, bitmap in new_bands:
+            tolerance = max(2, (y1 - y0) // 4)
+            members = []
+            for line, bbox in lines:
+                if bbox is None or bbox[2] < x0 or bbox[0] > x1:
+                    continue
+                center = (bbox[1] + bbox[3]) / 2
+                if y0 <= center <= y1:
+                    if bbox[1] < y0 - tolerance or bbox[3] > y1 + tolerance:
+                        members = None  # A line straddles the band; it is not a separate region
+                        break
+                    members.append(line)
+                elif bbox[1] < y1 and bbox[3] > y0:
+                    members = None  # Another line overlaps the band
+                    break
+            if members is None:
+                continue
+            serialized = []
+            for line in members:
+                copy = lxml.html.fragment_fromstring(lxml.html.tostring(line, encoding="unicode"))
+                _shift_element(copy, -x0, -y0)
+                serialized.append(lxml.html.tostring(copy, encoding="unicode"))
+            if self._match(digest, bitmap.to_ink()) is None:
+                with self._lock:
+                    if len(self._regions) < MAX_ENTRIES:
+                        self._regions.append(_Region(digest, bitmap, serialized))
+
+    def _splice(self, page, region, bbox):
+        import lxml.html
+
+        x0, y0, x1, y1 = bbox
+        if not region.lines:
+            return  # Graphics-only band (logo, rule): nothing to put back
+        area = lxml.html.fragment_fromstring(
+            f"<div class='ocr_carea' title='bbox {x0} {y0} {x1} {y1}'>"
+            f"<p class='ocr_par' title='bbox {x0} {y0} {x1} {y1}'></p></div>"
+        )
+        paragraph = area[0]
+        for serialized in region.lines:
+            line = lxml.html.fragment_fromstring(serialized)
+            _shift_element(line, x0, y0)
+            paragraph.append(line)
+        # Keep reading order: before the first block that starts below this band
+        for block in page.xpath("./div[@class='ocr_carea']"):
+            bbox = _bbox(block)
+            if bbox and bbox[1] > y0:
+                block.addprevious(area)
+                return
+        page.append(area)
@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import time
+import shutil
+import threading
+
+# ==============================================================================
+# Disk-Backed Result Store
+# ==============================================================================
+# Finished outputs (DOCX, searchable PDF, OCR JSON) are written to
+# <root>/<session id>/<job id>/ so downloads are served from disk: a rerun,
+# a reload or a dropped download never means converting again, and finished
+# jobs do not hold their files in server memory. Entries expire after a TTL;
+# when the store grows past its size limit the oldest entries go first.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.getenv("PDF_TOOL_RESULTS_DIR") or os.path.join(APP_DIR, "results")
+DEFAULT_TTL_HOURS = float(os.getenv("PDF_TOOL_RESULT_TTL_HOURS", "24"))
+DEFAULT_MAX_MB = float(os.getenv("PDF_TOOL_RESULTS_MAX_MB", "2048"))
+
+# Output kind -> (file name suffix, MIME type, download label)
+OUTPUTS = {
+    "docx": (".docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "Word Document"),
+    "json": (".ocr.jsonl", "application/x-ndjson", "OCR Data (JSON Lines)"),
+    "pdf": ("_searchable.pdf", "application/pdf", "Searchable PDF"),
+}
+
+META_FILE = "meta.json"
+KEY_RE = re.compile(r"[0-9a-f]{32}")  # uuid4().hex: session and job ids
+
+
+def valid_key(key):
+    """True for ids safe to use as directory names (uuid4 hex)."""
+    return isinstance(key, str) and KEY_RE.fullmatch(key) is not None
+
+
+def _dir_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+
+class ResultStore:
+    """Finished job outputs on disk, keyed by session and job. Thread-safe within one process."""
+
+    def __init__(self, root=None, ttl_hours=None, max_mb=None):
+        self.root = root or DEFAULT_RESULTS_DIR
+        self.ttl_seconds = (DEFAULT_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self.max_bytes = int((DEFAULT_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _job_dir(self, session_id, job_id):
+        if not (valid_key(session_id) and valid_key(job_id)):
+            raise ValueError("Invalid session or job id")
+        return os.path.join(self.root, session_id, job_id)
+
+    def save(self, session_id, job_id, name, outputs, pages=None):
+        """
+        Stores `outputs` ({kind: bytes or None}, kinds from OUTPUTS) and returns
+        the entry's metadata. The entry appears atomically, then the store is
+        trimmed to its TTL and size limit.
+        """
+        job_dir = self._job_dir(session_id, job_id)
+        staging = job_dir + ".tmp"
+        base_name = os.path.splitext(name)[0]
+        files = {}
+        with self._lock:  # evict() must not remove the session folder while this is staged
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for kind, data in outputs.items():
+                if data:
+                    with open(os.path.join(staging, kind), "wb") as f:
+                        f.write(data)
+                    files[kind] = {"file_name": base_name + OUTPUTS[kind][0], "bytes": len(data)}
+            meta = {"job_id": job_id, "name": name, "pages": pages, "created": time.time(), "files": files}
+            with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            os.replace(staging, job_dir)
+        self.evict()
+        return meta
+
+    def _read_meta(self, job_dir):
+        try:
+            with open(os.path.join(job_dir, META_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _expired(self, meta, now):
+        return meta is None or now - meta["created"] > self.ttl_seconds
+
+    def recent(self, session_id):
+        """Unexpired entries of a session, newest first."""
+        if not valid_key(session_id):
+            return []
+        session_dir = os.path.join(self.root, session_id)
+        try:
+            names = os.listdir(session_dir)
+        except OSError:
+            return []
+        now = time.time()
+        entries = []
+        for job_id in names:
+            if valid_key(job_id):
+                meta = self._read_meta(os.path.join(session_dir, job_id))
+                if not self._expired(meta, now):
+                    entries.append(meta)
+        return sorted(entries, key=lambda meta: meta["created"], reverse=True)
+
+    def read(self, session_id, job_id, kind):
+        """An output's bytes, or None if it is missing or has been evicted."""
+        try:
+            with open(os.path.join(self._job_dir(session_id, job_id), kind), "rb") as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def evict(self):
+        """Deletes expired entries, then the oldest ones while the store is over its size limit."""
+        now = time.time()
+        with self._lock:
+            entries = []  # (created, size, job_dir)
+            for session_id in os.listdir(self.root):
+                session_dir = os.path.join(self.root, session_id)
+                if not (valid_key(session_id) and os.path.isdir(session_dir)):
+                    continue
+                for job_id in os.listdir(session_dir):
+                    job_dir = os.path.join(session_dir, job_id)
+                    if not valid_key(job_id):
+                        shutil.rmtree(job_dir, ignore_errors=True)  # Staging left by an interrupted save
+                        continue
+                    meta = self._read_meta(job_dir)
+                    if self._expired(meta, now):
+                        shutil.rmtree(job_dir, ignore_errors=True)
+                    else:
+                        entries.append((meta["created"], _dir_size(job_dir), job_dir))
+                if not os.listdir(session_dir):
+                    shutil.rmtree(session_dir, ignore_errors=True)
+            total = sum(size for _, size, _ in entries)
+            for _, size, job_dir in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(job_dir, ignore_errors=True)
+                total -= size
@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+import itertools
+
+# ==============================================================================
+# Fair-Share Page Scheduler
+# ==============================================================================
+# One Streamlit server process is shared by every user. Each conversion job
+# registers here and asks for a slot before working on a page, so the whole
+# process never runs more page tasks than the machine has cores, no single
+# session can take all the slots, and small jobs get ahead of big ones.
+
+
+def _default_max_workers():
+    # Read when the scheduler is created, so tuned settings applied at
+    # startup (see tuning.py) are honoured
+    return (int(os.getenv("PDF_TOOL_MAX_WORKERS", "0"))
+            or int(os.getenv("PDF_TOOL_OCR_WORKERS", "0"))
+            or (os.cpu_count() or 1))
+
+
+def _default_session_quota(max_workers):
+    return int(os.getenv("PDF_TOOL_SESSION_QUOTA", "0")) or max(1, max_workers // 2)
+
+# Seconds of waiting that count as one page less of remaining work when
+# ordering jobs, so a large job is not starved by a stream of small ones.
+AGING_SECONDS_PER_PAGE = 2.0
+
+
+class _Job:
+    def __init__(self, job_id, session_id, total_pages, seq):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.remaining = max(int(total_pages), 1)
+        self.seq = seq
+        self.submitted = time.monotonic()
+        self.waiting = 0
+        self.running = 0
+        self.wait_started = None
+
+
+class FairShareScheduler:
+    """
+    Caps concurrent page work across all sessions.
+    Ordering: sessions with fewer running pages first, then jobs with fewer
+    pages left (small jobs first, with aging), then submission order.
+    """
+
+    def __init__(self, max_workers=None, session_quota=None):
+        self.max_workers = max_workers or _default_max_workers()
+        self.session_quota = min(session_quota or _default_session_quota(self.max_workers), self.max_workers)
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._running = 0
+        self._seq = itertools.count()
+        self._avg_page_seconds = 5.0  # Initial guess, refined as pages finish
+
+    # --- Job lifecycle --------------------------------------------------------
+
+    def submit(self, session_id, total_pages):
+        """Registers a job and returns its id."""
+        with self._cond:
+            seq = next(self._seq)
+            job_id = f"{session_id}:{seq}"
+            self._jobs[job_id] = _Job(job_id, session_id, total_pages, seq)
+            return job_id
+
+    def finish(self, job_id):
+        """Removes a job (finished, failed or abandoned) and wakes waiters."""
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+            if job is not None and job.running:
+                self._running -= job.running
+            self._cond.notify_all()
+
+    def acquire(self, job_id, timeout=None):
+        """
+        Blocks until the job may run one page. Returns False on timeout, or
+        when the job is (or gets) finished while waiting.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.waiting += 1
+            if job.waiting == 1:  # Aging counts from when the job started waiting, not from its latest page
+                job.wait_started = time.monotonic()
+            try:
+                while not self._can_run(job):
+                    if self._jobs.get(job_id) is not job:
+                        return False  # finish() was called, e.g. the job was cancelled
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                job.running += 1
+                self._running += 1
+                return True
+            finally:
+                job.waiting -= 1
+                if not job.waiting:
+                    job.wait_started = None
+
+    def release(self, job_id, elapsed=None):
+        """Returns a slot after one page; `elapsed` refines the wait estimate."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job.running:
+                job.running -= 1
+                job.remaining = max(job.remaining - 1, 1)
+                self._running -= 1
+            if elapsed is not None:
+                self._avg_page_seconds = 0.8 * self._avg_page_seconds + 0.2 * elapsed
+            self._cond.notify_all()
+
+    # --- Queue introspection --------------------------------------------------
+
+    def queue_position(self, job_id):
+        """1-based position among waiting jobs, or 0 if not waiting."""
+        with self._cond:
+            order = self._waiting_order()
+            for pos, job in enumerate(order, start=1):
+                if job.job_id == job_id:
+                    return pos
+            return 0
+
+    def estimated_wait(self, job_id):
+        """Rough seconds until the job's next page starts."""
+        position = self.queue_position(job_id)
+        if position == 0:
+            return 0.0
+        return position * self._avg_page_seconds / self.max_workers
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "session_quota": self.session_quota,
+                "running": self._running,
+                "waiting": sum(1 for j in self._jobs.values() if j.waiting),
+                "jobs": len(self._jobs),
+                "avg_page_seconds": self._avg_page_seconds,
+            }
+
+    # --- Internals (call with the condition held) -----------------------------
+
+    def _session_running(self, session_id):
+        return sum(j.running for j in self._jobs.values() if j.session_id == session_id)
+
+    def _sort_key(self, job, now):
+        waited = now - job.wait_started if job.wait_started else 0.0
+        effective_remaining = job.remaining - waited / AGING_SECONDS_PER_PAGE
+        return (self._session_running(job.session_id), effective_remaining, job.seq)
+
+    def _waiting_order(self):
+        now = time.monotonic()
+        waiting = [j for j in self._jobs.values() if j.waiting]
+        return sorted(waiting, key=lambda j: self._sort_key(j, now))
+
+    def _can_run(self, job):
+        if self._running >= self.max_workers:
+            return False
+        if self._session_running(job.session_id) >= self.session_quota:
+            return False
+        # Only the best eligible waiting job may take the free slot
+        for candidate in self._waiting_order():
+            if self._session_running(candidate.session_id) < self.session_quota:
+                return candidate is job
+        return False
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by every Streamlit session."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairShareScheduler()
+        return _scheduler
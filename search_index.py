@@ -0,0 +1,206 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import unicodedata
+
+# ==============================================================================
+# Full-Text Search Index (SQLite FTS5)
+# ==============================================================================
+# Every conversion adds its recognised lines here, keyed by document, page and
+# line, with a small JPEG thumbnail per page. Re-indexing a document replaces
+# its rows, so the index grows incrementally and never needs a rebuild.
+
+DEFAULT_INDEX_PATH = os.getenv("PDF_TOOL_INDEX_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "search_index.sqlite3"
+)
+
+# unicode61 treats Tamil vowel signs and the pulli (virama) as separators, which
+# splits every word into single consonants. Declaring the whole Tamil block as
+# token characters keeps words intact.
+TAMIL_BLOCK = "".join(chr(c) for c in range(0x0B80, 0x0C00))
+PULLI = "\u0BCD"
+ZERO_WIDTH = dict.fromkeys(map(ord, "\u200B\u200C\u200D\uFEFF"))
+TOKEN_RE = re.compile("[\\w\u0B80-\u0BFF]+")
+
+# bm25 ranking scores every matching line; above this many matches (e.g. a
+# short prefix over the whole archive) hits are returned newest-first instead.
+MAX_RANKED_MATCHES = 20000
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(
+    text,
+    doc_id UNINDEXED,
+    page UNINDEXED,
+    line UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 0 tokenchars '{TAMIL_BLOCK}'",
+    prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS thumbnails (
+    doc_id INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    jpeg BLOB NOT NULL,
+    PRIMARY KEY (doc_id, page)
+);
+"""
+
+
+def normalize_text(text):
+    """NFC-normalises and drops zero-width joiners that OCR sprinkles into Tamil."""
+    return unicodedata.normalize("NFC", text).translate(ZERO_WIDTH)
+
+
+def build_match_query(query):
+    """
+    Turns free text into an FTS5 query: every word must match as a prefix.
+    A trailing pulli is dropped so a stem also matches its suffixed forms
+    (e.g. கோவில் finds கோவிலில்).
+    """
+    terms = []
+    for token in TOKEN_RE.findall(normalize_text(query)):
+        if token.endswith(PULLI) and len(token) > 2:
+            token = token[:-1]
+        # Single characters are matched exactly; the prefix indexes start at 2
+        terms.append(f'"{token}"*' if len(token) > 1 else f'"{token}"')
+    return " ".join(terms)
+
+
+def sha256_of_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_of_parts(parts):
+    """Digest of several byte strings in order (e.g. a batch of uploaded images)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def sha256_of_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SearchIndex:
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_INDEX_PATH
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers are not blocked by an indexing writer
+        return conn
+
+    def is_indexed(self, source, sha256):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT sha256 FROM documents WHERE source = ?", (source,)).fetchone()
+        finally:
+            conn.close()
+        return row is not None and row[0] == sha256
+
+    def index_document(self, source, name, sha256, pages, thumbnails=None):
+        """
+        Adds or replaces a document. `pages` is an iterable of (page_num, text)
+        with one OCR line per text line; `thumbnails` maps page_num -> JPEG bytes.
+        Returns False if the same content is already indexed for `source`.
+        """
+        if self.is_indexed(source, sha256):
+            return False
+        pages = list(pages)
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT id FROM documents WHERE source = ?", (source,)).fetchone()
+                if row:
+                    doc_id = row[0]
+                    conn.execute("DELETE FROM lines WHERE doc_id = ?", (doc_id,))
+                    conn.execute("DELETE FROM thumbnails WHERE doc_id = ?", (doc_id,))
+                    conn.execute(
+                        "UPDATE documents SET name = ?, sha256 = ?, pages = ?, indexed_at = ? WHERE id = ?",
+                        (name, sha256, len(pages), time.time(), doc_id)
+                    )
+                else:
+                    doc_id = conn.execute(
+                        "INSERT INTO documents (source, name, sha256, pages, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                        (source, name, sha256, len(pages), time.time())
+                    ).lastrowid
+                conn.executemany(
+                    "INSERT INTO lines (text, doc_id, page, line) VALUES (?, ?, ?, ?)",
+                    (
+                        (normalize_text(line), doc_id, page_num, line_num)
+                        for page_num, text in pages
+                        for line_num, line in enumerate(text.splitlines(), start=1)
+                        if line.strip()
+                    )
+                )
+                if thumbnails:
+                    conn.executemany(
+                        "INSERT INTO thumbnails (doc_id, page, jpeg) VALUES (?, ?, ?)",
+                        ((doc_id, page_num, jpeg) for page_num, jpeg in thumbnails.items())
+                    )
+        finally:
+            conn.close()
+        return True
+
+    def search(self, query, limit=50):
+        """Returns hits (best first) as dicts with doc_id, name, source, page, line and snippet."""
+        match = build_match_query(query)
+        if not match:
+            return []
+        conn = self._connect()
+        try:
+            matches = conn.execute("SELECT COUNT(*) FROM lines WHERE lines MATCH ?", (match,)).fetchone()[0]
+            order = "rank" if matches <= MAX_RANKED_MATCHES else "lines.rowid DESC"
+            rows = conn.execute(
+                f"""
+                SELECT d.id, d.name, d.source, lines.page, lines.line,
+                       snippet(lines, 0, '**', '**', '…', 16)
+                FROM lines JOIN documents d ON d.id = lines.doc_id
+                WHERE lines MATCH ?
+                ORDER BY {order}
+                LIMIT ?
+                """,
+                (match, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"doc_id": r[0], "name": r[1], "source": r[2], "page": r[3], "line": r[4], "snippet": r[5]}
+            for r in rows
+        ]
+
+    def thumbnail(self, doc_id, page):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT jpeg FROM thumbnails WHERE doc_id = ? AND page = ?", (doc_id, page)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            docs, pages = conn.execute("SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM documents").fetchone()
+        finally:
+            conn.close()
+        return {"documents": docs, "pages": pages}
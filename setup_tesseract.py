@@ -12,6 +12,12 @@ TAM_URL = "https://github.com/tesseract-ocr/tessdata/raw/main/tam.traineddata"
 DEFAULT_TESS_DIR = r"C:\Program Files\Tesseract-OCR\tessdata"
 LOCAL_TESS_DIR = os.path.join(os.getcwd(), "tessdata")
 
+# Model sets used by the OCR profiles (see ocr_profiles.py)
+MODEL_SET_URLS = {
+    "fast": "https://github.com/tesseract-ocr/tessdata_fast/raw/main/{lang}.traineddata",
+    "best": "https://github.com/tesseract-ocr/tessdata_best/raw/main/{lang}.traineddata",
+}
+
 def download_file(url, dest_path):
     print(f"Downloading {url} to {dest_path}...")
     try:
@@ -86,5 +92,35 @@ def setup_tesseract_lang():
         print(f"Language packs set up in {LOCAL_TESS_DIR}")
         print("Please ensure your script sets tessdata_dir_config to point here.")
 
+def setup_model_set(kind, langs=("eng", "tam")):
+    """
+    Downloads the 'fast' or 'best' models into tessdata_<kind>/ next to this script.
+    The hOCR/PDF configs and pdf.ttf are copied from an existing tessdata folder,
+    since --tessdata-dir makes Tesseract look for them there too.
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    target_dir = os.path.join(app_dir, f"tessdata_{kind}")
+    os.makedirs(target_dir, exist_ok=True)
+    for lang in langs:
+        dest = os.path.join(target_dir, f"{lang}.traineddata")
+        if not os.path.exists(dest):
+            download_file(MODEL_SET_URLS[kind].format(lang=lang), dest)
+
+    for source_dir in (os.path.join(app_dir, "tessdata"), DEFAULT_TESS_DIR, "/usr/share/tesseract-ocr/5/tessdata"):
+        if os.path.exists(os.path.join(source_dir, "configs")):
+            shutil.copytree(os.path.join(source_dir, "configs"), os.path.join(target_dir, "configs"), dirs_exist_ok=True)
+            if os.path.exists(os.path.join(source_dir, "pdf.ttf")):
+                shutil.copy(os.path.join(source_dir, "pdf.ttf"), target_dir)
+            break
+    else:
+        print("Warning: no tessdata/configs folder found to copy; hOCR output will fail with these models.")
+    print(f"'{kind}' models set up in {target_dir}")
+
 if __name__ == "__main__":
-    setup_tesseract_lang()
+    if len(sys.argv) > 2 and sys.argv[1] == "--models":
+        if sys.argv[2] not in MODEL_SET_URLS:
+            print(f"Usage: python setup_tesseract.py [--models {'|'.join(MODEL_SET_URLS)}]")
+            sys.exit(1)
+        setup_model_set(sys.argv[2])
+    else:
+        setup_tesseract_lang()
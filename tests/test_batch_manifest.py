@@ -0,0 +1,66 @@
+import os
+
+from batch_manifest import BatchManifest, find_pdfs
+
+SETTINGS = {"profile": "balanced", "dpi": 300}
+
+
+def _write(path, data=b"%PDF-1.4 test"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _converted(tmp_path, pdf):
+    docx = _write(os.path.splitext(pdf)[0] + ".docx", b"docx")
+    manifest = BatchManifest(tmp_path)
+    manifest.record(pdf, SETTINGS, [docx, None], manifest.fingerprint(pdf))
+    manifest.save()
+    return docx
+
+
+def test_find_pdfs_recurses_and_skips_generated_and_hidden(tmp_path):
+    a = _write(str(tmp_path / "a.pdf"))
+    b = _write(str(tmp_path / "sub" / "deeper" / "b.PDF"))
+    _write(str(tmp_path / "a_searchable.pdf"))
+    _write(str(tmp_path / "a_compressed.pdf"))
+    _write(str(tmp_path / ".cache" / "c.pdf"))
+    assert find_pdfs(str(tmp_path)) == [a, b]
+
+
+def test_unchanged_pdf_is_current(tmp_path):
+    pdf = _write(str(tmp_path / "sub" / "a.pdf"))
+    docx = _converted(tmp_path, pdf)
+    assert BatchManifest(tmp_path).is_current(pdf, SETTINGS, [docx, None])
+
+
+def test_touched_but_identical_pdf_is_current(tmp_path):
+    pdf = _write(str(tmp_path / "a.pdf"))
+    docx = _converted(tmp_path, pdf)
+    stat = os.stat(pdf)
+    os.utime(pdf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert BatchManifest(tmp_path).is_current(pdf, SETTINGS, [docx, None])
+
+
+def test_changes_make_a_pdf_stale(tmp_path):
+    pdf = _write(str(tmp_path / "a.pdf"))
+    docx = _converted(tmp_path, pdf)
+    manifest = BatchManifest(tmp_path)
+    assert not manifest.is_current(pdf, {**SETTINGS, "dpi": 400}, [docx, None])
+    assert not manifest.is_current(pdf, SETTINGS, [docx, str(tmp_path / "a_searchable.pdf")])
+    _write(pdf, b"%PDF-1.4 edited")
+    assert not manifest.is_current(pdf, SETTINGS, [docx, None])
+
+
+def test_missing_output_or_failed_conversion_is_retried(tmp_path):
+    pdf = _write(str(tmp_path / "a.pdf"))
+    docx = _converted(tmp_path, pdf)
+    os.remove(docx)
+    assert not BatchManifest(tmp_path).is_current(pdf, SETTINGS, [docx, None])
+
+    docx = _converted(tmp_path, pdf)
+    manifest = BatchManifest(tmp_path)
+    manifest.forget(pdf)
+    manifest.save()
+    assert not BatchManifest(tmp_path).is_current(pdf, SETTINGS, [docx, None])
@@ -0,0 +1,60 @@
+import io
+import pickle
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from bilevel import BilevelPage
+from conversion_core import pnm_bytes
+
+
+@pytest.fixture(params=[(1, 1), (7, 3), (8, 2), (53, 37), (2480, 16)])
+def pixels(request):
+    width, height = request.param
+    rng = np.random.default_rng(width * height)
+    return np.where(rng.random((height, width)) > 0.5, 255, 0).astype(np.uint8)
+
+
+def test_array_round_trip(pixels):
+    page = BilevelPage.from_array(pixels, dpi=300)
+    assert page.size == (pixels.shape[1], pixels.shape[0])
+    assert page.nbytes == pixels.shape[0] * ((pixels.shape[1] + 7) // 8)
+    np.testing.assert_array_equal(page.to_array(), pixels)
+
+
+def test_pil_round_trip_in_both_modes(pixels):
+    gray = Image.fromarray(pixels)
+    page = BilevelPage.from_pil(gray, dpi=200)
+    np.testing.assert_array_equal(np.asarray(page.to_pil().convert("L")), pixels)
+    one_bit = BilevelPage.from_pil(gray.convert("1", dither=Image.Dither.NONE))
+    np.testing.assert_array_equal(one_bit.bits, page.bits)
+    assert page.to_pil().info["dpi"] == (200, 200)
+
+
+def test_ink_mask_round_trip(pixels):
+    ink = pixels == 0
+    page = BilevelPage.from_ink(ink)
+    np.testing.assert_array_equal(page.to_ink(), ink)
+    np.testing.assert_array_equal(page.bits, BilevelPage.from_array(pixels).bits)
+
+
+def test_pbm_matches_pillow(pixels):
+    page = BilevelPage.from_array(pixels)
+    decoded = Image.open(io.BytesIO(page.to_pbm()))
+    np.testing.assert_array_equal(np.asarray(decoded.convert("L")), pixels)
+    assert pnm_bytes(page) == page.to_pbm()
+    via_pil = pnm_bytes(Image.fromarray(pixels))  # Pure 0/255 "L" pages are sent as PBM too
+    assert via_pil.startswith(b"P4")
+    np.testing.assert_array_equal(np.asarray(Image.open(io.BytesIO(via_pil)).convert("L")), pixels)
+
+
+def test_pickles_for_ocr_workers(pixels):
+    page = pickle.loads(pickle.dumps(BilevelPage.from_array(pixels, dpi=300)))
+    assert page.dpi == 300
+    np.testing.assert_array_equal(page.to_array(), pixels)
+
+
+def test_gray_input_is_thresholded_at_128():
+    page = BilevelPage.from_array(np.array([[0, 127, 128, 255]], np.uint8))
+    np.testing.assert_array_equal(page.to_array(), [[0, 0, 255, 255]])
@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import conversion_core
+from conversion_core import ConversionPipeline, PdfSource
+from jobs import ConversionJob, scheduled_hooks
+from memory_governor import MemoryGovernor
+from scheduler import FairShareScheduler
+
+
+def _pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith(("render-", "preprocess-")) and t.is_alive()]
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_finish_wakes_a_waiting_acquire():
+    scheduler = FairShareScheduler(max_workers=1, session_quota=1)
+    holder = scheduler.submit("other", 1)
+    assert scheduler.acquire(holder)
+    job = scheduler.submit("me", 3)
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(scheduler.acquire(job)), daemon=True)
+    thread.start()
+    assert _wait_until(lambda: scheduler.queue_position(job) == 1)
+    scheduler.finish(job)
+    thread.join(2)
+    assert outcome == [False]
+    assert scheduler.acquire(job) is False  # Pages admitted after finish() fail instead of raising KeyError
+
+
+def test_cancel_while_waiting_for_a_slot_stops_threads_and_removes_temp_file(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(conversion_core, "get_ocr_pool", lambda *args, **kwargs: pool)
+    scheduler = FairShareScheduler(max_workers=1, session_quota=1)
+    governor = MemoryGovernor(budget_bytes=1 << 30)
+    holder = scheduler.submit("other", 1)
+    assert scheduler.acquire(holder)  # The only slot is taken: every page waits in admit()
+
+    source = PdfSource(pdf_bytes=b"%PDF-1.4 placeholder", page_dpis=[150] * 4)
+    temp_path = source.pdf_path
+    job = ConversionJob("doc.pdf", len(source))
+    admit, release = scheduled_hooks(job, scheduler, governor, "me", [1] * len(source))
+    pipeline = ConversionPipeline(source, ocr_workers=1, admit=admit, release=release)
+    job.start(pipeline, on_finish=lambda j: scheduler.finish(j.scheduler_job_id))
+    assert _wait_until(lambda: scheduler.queue_position(job.scheduler_job_id) == 1)
+
+    job.cancel()
+    job.wait(5)
+    assert job.status == "cancelled"
+    assert _wait_until(lambda: not _pipeline_threads()), _pipeline_threads()
+    assert not os.path.exists(temp_path)
+    assert governor.stats()["reserved_bytes"] == 0
+    assert scheduler.stats()["running"] == 1  # Only the other job's slot
+    pool.shutdown()
@@ -0,0 +1,76 @@
+import numpy as np
+from PIL import Image
+
+from ocr_export import parse_hocr, hocr_tostring
+from repeated_regions import RepeatedRegionCache
+
+HOCR = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">
+ <head>
+  <title></title>
+  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>
+  <meta name='ocr-system' content='tesseract 5.3.0' />
+ </head>
+ <body>
+  <div class='ocr_page' id='page_1' title='image "x"; bbox 0 0 700 1000; ppageno 0'>
+   <div class='ocr_carea' id='block_1_1' title="bbox 100 30 600 60">
+    <p class='ocr_par' id='par_1_1' title="bbox 100 30 600 60">
+     <span class='ocr_line' id='line_1_1' title="bbox 100 30 600 60">
+      <span class='ocrx_word' id='word_1_1' title='bbox 100 30 600 60; x_wconf 95'>{header}</span>
+     </span>
+    </p>
+   </div>
+  </div>
+ </body>
+</html>"""
+
+
+def _page():
+    pixels = np.full((1000, 700), 255, np.uint8)
+    pixels[30:60, 100:600] = 0
+    return Image.fromarray(pixels)
+
+
+def _assert_clean(hocr):
+    text = hocr.decode("utf-8")
+    assert not text.startswith("<?xml")
+    assert text.count("xmlns=") == 1 and text.count("xml:lang=") == 1
+    assert '<meta charset="utf-8">' in text
+
+
+def test_hocr_tostring_keeps_attributes_unique_and_utf8():
+    hocr = hocr_tostring(parse_hocr(HOCR.format(header="தமிழ்")))
+    _assert_clean(hocr)
+    assert parse_hocr(hocr).xpath("//span[@class='ocrx_word']")[0].text == "தமிழ்"
+
+
+def test_reused_header_round_trip():
+    cache = RepeatedRegionCache()
+    _, plan = cache.prepare(_page())
+    learned = cache.complete(plan, HOCR.format(header="காட்சி").encode("utf-8"))
+    _assert_clean(learned)
+
+    image, plan = cache.prepare(_page())
+    assert len(plan.reused) == 1
+    assert np.asarray(image)[40, 300] == 255  # Blanked before OCR
+    spliced = cache.complete(plan, HOCR.format(header="").encode("utf-8"))
+    _assert_clean(spliced)
+    words = [w.text for w in parse_hocr(spliced).xpath("//span[@class='ocrx_word']") if w.text]
+    assert words == ["காட்சி"]
+
+
+def test_second_pass_output_is_clean(monkeypatch):
+    import conversion_core
+    import two_pass
+
+    low = HOCR.format(header="கட").replace("x_wconf 95", "x_wconf 20")
+    reread = HOCR.format(header="காட்சி").replace("bbox 100 30 600 60", "bbox 24 24 524 54")
+    monkeypatch.setattr(two_pass, "render_pdf_region",
+                        lambda *args, **kwargs: Image.new("RGB", (args[5], args[6]), "white"))
+    monkeypatch.setattr(conversion_core, "ocr_page_outputs", lambda *args, **kwargs: {"hocr": reread.encode()})
+    hocr, checked, improved = two_pass.refine_page(low.encode(), "x.pdf", 1, page_dpi=300, second_pass_dpi=300)
+    assert (checked, improved) == (1, 1)
+    _assert_clean(hocr)
+    assert [w.text for w in parse_hocr(hocr).xpath("//span[@class='ocrx_word']")] == ["காட்சி"]
@@ -0,0 +1,83 @@
+import os
+import time
+import threading
+
+import memory_governor
+from memory_governor import MemoryGovernor, MIN_DPI, predict_page_bytes
+
+A4_PT = (595.0, 842.0)
+
+
+def test_plan_dpi_keeps_dpi_when_the_page_fits():
+    governor = MemoryGovernor(budget_bytes=4 * predict_page_bytes(*A4_PT, 300))
+    assert governor.plan_dpi(*A4_PT, 300) == (300, predict_page_bytes(*A4_PT, 300))
+
+
+def test_plan_dpi_steps_down_but_not_below_the_minimum():
+    governor = MemoryGovernor(budget_bytes=2 * predict_page_bytes(*A4_PT, 200))
+    dpi, predicted = governor.plan_dpi(*A4_PT, 400)
+    assert dpi == 200 and predicted <= governor.page_limit_bytes
+    tiny = MemoryGovernor(budget_bytes=1024)
+    assert tiny.plan_dpi(*A4_PT, 300)[0] == MIN_DPI
+
+
+def test_plan_upscale_lowers_the_factor():
+    governor = MemoryGovernor(budget_bytes=400 * 1000 * 1000)
+    factor, predicted = governor.plan_upscale(2000, 3000, 3.0)
+    assert factor == 2.0 and predicted <= governor.page_limit_bytes
+
+
+def test_first_page_is_always_admitted():
+    governor = MemoryGovernor(budget_bytes=1)
+    governor.acquire(10 ** 9)
+    assert governor.stats()["reserved_bytes"] == 10 ** 9
+    governor.release(10 ** 9)
+    assert governor.stats()["reserved_bytes"] == 0
+
+
+def test_page_waits_until_reservations_are_released(monkeypatch):
+    monkeypatch.setattr(memory_governor, "used_bytes", lambda: 0)
+    governor = MemoryGovernor(budget_bytes=100)
+    governor.acquire(60)
+    waited = threading.Event()
+    admitted = threading.Event()
+
+    def run():
+        governor.acquire(60, on_wait=lambda used, budget: waited.set(), poll_interval=0.05)
+        admitted.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert waited.wait(5)
+    assert not admitted.is_set()
+    governor.release(60)
+    assert admitted.wait(5)
+    thread.join(5)
+    assert governor.stats()["reserved_bytes"] == 60
+
+
+def test_worker_memory_counts_against_the_budget(monkeypatch):
+    monkeypatch.setattr(memory_governor, "current_rss", lambda: 10)
+    monkeypatch.setattr(memory_governor, "children_rss", lambda: 50)
+    governor = MemoryGovernor(budget_bytes=100)
+    governor.acquire(20)
+    assert not governor._fits(30)  # 10 + 50 worker RSS + 20 reserved + 30 > 100
+    assert governor._fits(20)
+    assert governor.stats()["rss_bytes"] == 60
+
+
+def test_children_rss_includes_a_child_process():
+    import subprocess
+    import sys
+
+    child = subprocess.Popen([sys.executable, "-c", "import sys; buf = bytearray(64 << 20); sys.stdin.read()"],
+                             stdin=subprocess.PIPE)
+    try:
+        deadline = time.monotonic() + 10
+        while memory_governor.children_rss() < 64 << 20:
+            assert time.monotonic() < deadline, "child RSS not seen"
+            time.sleep(0.05)
+        if os.path.isdir("/proc"):
+            assert memory_governor._proc_children_rss() >= 64 << 20
+    finally:
+        child.communicate(b"")
@@ -0,0 +1,127 @@
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import conversion_core
+from conversion_core import ConversionPipeline
+
+
+class FakeSource:
+    """Blank pages; page_dpi/region_spec make the pipeline treat it like a PDF (two-pass capable)."""
+
+    def __init__(self, pages=6):
+        self.pages = pages
+        self.closed = False
+
+    def __len__(self):
+        return self.pages
+
+    def page_dpi(self, index):
+        return 100
+
+    def region_spec(self, index):
+        return {"pdf_path": "unused.pdf", "page_num": index + 1, "page_dpi": 100}
+
+    def render(self, index):
+        from PIL import Image
+        return Image.new("RGB", (80, 60), "white")
+
+    def close(self):
+        self.closed = True
+
+
+def fake_ocr(image, lang, config, formats, dpi):
+    time.sleep(random.uniform(0, 0.02))  # Pages finish out of order
+    return {"hocr": f"page {image.width}x{image.height}".encode(), "pdf": None}
+
+
+class RefusingPool(ThreadPoolExecutor):
+    """Runs OCR but refuses second-pass work, like a pool that is shutting down."""
+
+    def submit(self, fn, *args, **kwargs):
+        if fn is conversion_core.refine_page:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    pools = []
+
+    def make(pool_class=ThreadPoolExecutor):
+        pool = pool_class(max_workers=3)
+        pools.append(pool)
+        monkeypatch.setattr(conversion_core, "get_ocr_pool", lambda *args, **kwargs: pool)
+        return pool
+
+    monkeypatch.setattr(conversion_core, "ocr_page_outputs", fake_ocr)
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_results_arrive_in_page_order(thread_pool):
+    thread_pool()
+    source = FakeSource(pages=12)
+    results = list(ConversionPipeline(source, ocr_workers=3).results())
+    assert [r.index for r in results] == list(range(12))
+    assert all(r.error is None and r.hocr for r in results)
+    assert source.closed
+
+
+def test_failed_second_pass_keeps_first_pass(thread_pool, monkeypatch):
+    thread_pool()
+
+    def broken_refine(*args, **kwargs):
+        raise OSError("pdftoppm failed")
+
+    monkeypatch.setattr(conversion_core, "refine_page", broken_refine)
+    results = list(ConversionPipeline(FakeSource(), ocr_workers=3, second_pass_dpi=300).results())
+    assert [r.hocr for r in results] == [b"page 80x60"] * 6
+
+
+def test_second_pass_that_cannot_start_does_not_hang(thread_pool):
+    thread_pool(RefusingPool)
+    pipeline = ConversionPipeline(FakeSource(), ocr_workers=3, second_pass_dpi=300)
+    started = time.monotonic()
+    results = list(pipeline.results())
+    assert time.monotonic() - started < 5
+    assert [r.hocr for r in results] == [b"page 80x60"] * 6
+
+
+def test_failed_page_keeps_an_image_only_pdf_page(thread_pool, monkeypatch):
+    thread_pool()
+    calls = []
+
+    def ocr_failing_once(image, lang, config, formats, dpi):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("tesseract crashed")
+        return {"hocr": b"page", "pdf": b"%PDF text layer"}
+
+    monkeypatch.setattr(conversion_core, "ocr_page_outputs", ocr_failing_once)
+    results = list(ConversionPipeline(FakeSource(), ocr_workers=3, searchable_pdf=True).results())
+    failed = [r for r in results if r.error is not None]
+    assert len(failed) == 1 and failed[0].pdf.startswith(b"%PDF")
+    assert all(r.pdf for r in results)
+
+
+def test_broken_ocr_pool_is_replaced(monkeypatch):
+    import os
+    import signal
+    from concurrent.futures.process import BrokenProcessPool
+
+    monkeypatch.setattr(conversion_core, "_ocr_pool", None)
+    pool = conversion_core.get_ocr_pool(max_workers=1)
+    try:
+        worker = pool.submit(os.getpid).result(timeout=60)
+        os.kill(worker, signal.SIGKILL)  # As the OOM killer would
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(pow, 2, 3).result(timeout=60)
+        fresh = conversion_core.get_ocr_pool(max_workers=1)
+        assert fresh is not pool
+        assert fresh.submit(pow, 2, 3).result(timeout=60) == 8
+    finally:
+        conversion_core.shutdown_ocr_pool()
@@ -0,0 +1,105 @@
+import time
+import threading
+
+import scheduler as scheduler_module
+from scheduler import FairShareScheduler
+
+
+def _acquire_in_thread(scheduler, job_id, started):
+    """Starts a thread blocked in acquire(); `started` collects job ids in the order they get a slot."""
+    def run():
+        if scheduler.acquire(job_id):
+            started.append(job_id)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_session_quota_caps_one_session():
+    scheduler = FairShareScheduler(max_workers=4, session_quota=2)
+    job = scheduler.submit("a", 10)
+    assert scheduler.acquire(job, timeout=0.1)
+    assert scheduler.acquire(job, timeout=0.1)
+    assert not scheduler.acquire(job, timeout=0.1)
+    other = scheduler.submit("b", 10)
+    assert scheduler.acquire(other, timeout=0.1)
+
+
+def test_small_job_goes_first():
+    scheduler = FairShareScheduler(max_workers=1, session_quota=1)
+    holder = scheduler.submit("holder", 1)
+    assert scheduler.acquire(holder)
+    big = scheduler.submit("big", 100)
+    small = scheduler.submit("small", 2)
+    started = []
+    threads = [_acquire_in_thread(scheduler, big, started)]
+    _wait_until(lambda: scheduler.queue_position(big) == 1)
+    threads.append(_acquire_in_thread(scheduler, small, started))
+    _wait_until(lambda: scheduler.queue_position(small) == 1)
+
+    scheduler.release(holder)
+    _wait_until(lambda: len(started) == 1)
+    assert started == [small]
+    scheduler.release(small)
+    _wait_until(lambda: len(started) == 2)
+    assert started == [small, big]
+    for thread in threads:
+        thread.join(1)
+
+
+def test_busy_session_yields_to_idle_session():
+    scheduler = FairShareScheduler(max_workers=2, session_quota=2)
+    busy = scheduler.submit("busy", 2)
+    assert scheduler.acquire(busy)
+    idle = scheduler.submit("idle", 50)
+    holder = scheduler.submit("holder", 1)
+    assert scheduler.acquire(holder)
+    started = []
+    _acquire_in_thread(scheduler, busy, started)
+    _acquire_in_thread(scheduler, idle, started)
+    _wait_until(lambda: scheduler.stats()["waiting"] == 2)
+
+    scheduler.release(holder)
+    _wait_until(lambda: started)
+    assert started == [idle]  # Fewer running pages in its session beats fewer pages left
+    scheduler.finish(busy)
+
+
+def test_aging_clock_is_not_reset_by_later_waits(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: now[0])
+    scheduler = FairShareScheduler(max_workers=1, session_quota=1)
+    holder = scheduler.submit("holder", 1)
+    assert scheduler.acquire(holder, timeout=0)
+    job = scheduler.submit("a", 10)
+    _acquire_in_thread(scheduler, job, [])  # One page keeps waiting...
+    _wait_until(lambda: scheduler.queue_position(job) == 1)
+
+    now[0] += 30
+    assert not scheduler.acquire(job, timeout=0)  # ...while another page starts waiting later
+    assert scheduler._jobs[job].wait_started == 1000.0
+    scheduler.finish(job)
+
+
+def test_page_times_refine_the_wait_estimate(monkeypatch):
+    from jobs import ConversionJob, scheduled_hooks
+    from memory_governor import MemoryGovernor
+
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    scheduler = FairShareScheduler(max_workers=1, session_quota=1)
+    job = ConversionJob("doc.pdf", 2)
+    admit, release = scheduled_hooks(job, scheduler, MemoryGovernor(budget_bytes=10 ** 9), "me", [1, 1])
+    initial = scheduler.stats()["avg_page_seconds"]
+    assert admit(0)
+    clock[0] += 60
+    release(0)
+    assert scheduler.stats()["avg_page_seconds"] == 0.8 * initial + 0.2 * 60
@@ -0,0 +1,51 @@
+import unicodedata
+
+import pytest
+
+from search_index import SearchIndex, build_match_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.sqlite3"))
+    index.index_document("a.pdf", "a.pdf", "sha-a", [
+        (1, "SCENE 12. கோவிலில் இரவு\nராமன் வருகிறான்"),
+        (2, "CUT TO: கடற்கரை"),
+    ])
+    index.index_document("b.pdf", "b.pdf", "sha-b", [(3, "கோவில் வாசல்")])
+    return index
+
+
+def _hits(index, query):
+    return sorted((hit["name"], hit["page"], hit["line"]) for hit in index.search(query))
+
+
+def test_tamil_words_are_not_split_into_letters(index):
+    assert _hits(index, "வாசல்") == [("b.pdf", 3, 1)]
+    assert _hits(index, "ல்") == []  # A vowel sign or pulli does not start a token
+
+
+def test_tamil_prefix_matches_suffixed_forms(index):
+    # The trailing pulli is dropped, so the stem also finds கோவிலில்
+    assert build_match_query("கோவில்") == '"கோவில"*'
+    assert _hits(index, "கோவில்") == [("a.pdf", 1, 1), ("b.pdf", 3, 1)]
+    assert _hits(index, "கட") == [("a.pdf", 2, 1)]
+
+
+def test_every_word_must_match(index):
+    assert _hits(index, "scene இரவு") == [("a.pdf", 1, 1)]
+    assert _hits(index, "scene கடற்கரை") == []
+
+
+def test_zero_width_joiners_and_decomposed_text_are_normalised(index):
+    decomposed = unicodedata.normalize("NFD", "ராமன்")
+    assert _hits(index, "ரா‍மன்") == [("a.pdf", 1, 2)]
+    assert _hits(index, decomposed) == [("a.pdf", 1, 2)]
+
+
+def test_reindexing_the_same_content_is_skipped_and_changes_replace(index):
+    assert not index.index_document("b.pdf", "b.pdf", "sha-b", [(1, "other")])
+    assert index.index_document("b.pdf", "b.pdf", "sha-b2", [(1, "புதிய வரி")])
+    assert _hits(index, "வாசல்") == []
+    assert _hits(index, "புதிய") == [("b.pdf", 1, 1)]
+    assert index.stats() == {"documents": 2, "pages": 3}
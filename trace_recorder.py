@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from memory_governor import current_rss
+
+# ==============================================================================
+# Per-Job Tracing
+# ==============================================================================
+# Records a span for every page and stage of one conversion (scheduler wait,
+# render, preprocess, OCR, second pass, parse, DOCX append) with its duration,
+# image sizes and RSS change, and writes them as Chrome trace-event JSON: open
+# the file in https://ui.perfetto.dev or chrome://tracing (both run locally in
+# the browser). Threads of this process and each OCR worker process get their
+# own track; each page also gets an async track from admission to result.
+# RSS deltas are process-wide, so with pages running concurrently they are a
+# hint of where memory grows, not an exact per-span attribution.
+
+MB = 1024 * 1024
+TRACE_HISTORY = 20  # Recent job traces kept in memory for the app's admin panel
+
+
+def _rss_delta_mb(before, after):
+    if before is None or after is None:
+        return None
+    return round((after - before) / MB, 1)
+
+
+class TraceRecorder:
+    """Collects the spans of one job. Thread-safe; timestamps are wall-clock so OCR workers can report too."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self._pid = os.getpid()
+        self._events = []
+        self._threads = {}       # (pid, thread ident) -> (tid, name)
+        self._worker_pids = set()
+        self._lock = threading.Lock()
+
+    def _ts(self, t):
+        return round((t - self.started) * 1e6, 1)  # Microseconds since the job started
+
+    def _tid(self):
+        thread = threading.current_thread()
+        with self._lock:
+            key = (self._pid, thread.ident)
+            if key not in self._threads:
+                self._threads[key] = (len(self._threads) + 1, thread.name)
+            return self._threads[key][0]
+
+    def add(self, name, cat, start, end, args=None, pid=None, tid=None):
+        """Adds a complete span; by default on the calling thread's track."""
+        event = {
+            "name": name, "cat": cat, "ph": "X",
+            "ts": self._ts(start), "dur": round(max(end - start, 0.0) * 1e6, 1),
+            "pid": pid or self._pid, "tid": self._tid() if tid is None else tid,
+            "args": args or {},
+        }
+        with self._lock:
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name, cat="stage", **args):
+        """
+        Times the block on the calling thread. Yields the args dict, so
+        details known only inside the block (e.g. image size) can be added.
+        """
+        rss = current_rss()
+        start = time.time()
+        try:
+            yield args
+        finally:
+            end = time.time()
+            args["rss_delta_mb"] = _rss_delta_mb(rss, current_rss())
+            self.add(name, cat, start, end, args)
+
+    def add_worker_span(self, name, timing, args=None, submitted=None):
+        """Adds a span measured in an OCR worker by run_traced(); `submitted` adds its pool queue time."""
+        args = dict(args or {})
+        args["rss_delta_mb"] = timing["rss_delta_mb"]
+        if submitted is not None:
+            args["queued_ms"] = round((timing["start"] - submitted) * 1000, 1)
+        with self._lock:
+            self._worker_pids.add(timing["pid"])
+        self.add(name, "ocr", timing["start"], timing["end"], args, pid=timing["pid"], tid=1)
+
+    def add_page(self, index, start, end, args=None):
+        """Async span covering one page from admission to its result."""
+        common = {"name": f"page {index + 1}", "cat": "page", "id": index + 1, "pid": self._pid, "tid": 0}
+        with self._lock:
+            self._events.append({**common, "ph": "b", "ts": self._ts(start), "args": args or {}})
+            self._events.append({**common, "ph": "e", "ts": self._ts(end)})
+
+    def to_json(self):
+        """Chrome trace-event JSON (bytes)."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+            worker_pids = sorted(self._worker_pids)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": self.name}}]
+        for (pid, _), (tid, thread_name) in threads.items():
+            metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        for pid in worker_pids:
+            metadata.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"OCR worker {pid}"}})
+            metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": "tesseract"}})
+        trace = {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"job": self.name, "started": time.strftime("%Y-%m-%d %H:%M:%S",
+                                                                     time.localtime(self.started))},
+        }
+        return json.dumps(trace, ensure_ascii=False).encode("utf-8")
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_json())
+        return path
+
+
+def span(trace, name, cat="stage", **args):
+    """trace.span(...), or a no-op block yielding a dict when `trace` is None."""
+    return trace.span(name, cat, **args) if trace is not None else nullcontext(args)
+
+
+def run_traced(fn, *args, **kwargs):
+    """Runs `fn` in an OCR worker and returns (result, timing) for TraceRecorder.add_worker_span()."""
+    rss = current_rss()
+    start = time.time()
+    result = fn(*args, **kwargs)
+    end = time.time()
+    return result, {"start": start, "end": end, "pid": os.getpid(), "rss_delta_mb": _rss_delta_mb(rss, current_rss())}
+
+
+class TraceStore:
+    """
+    Traces of the most recent jobs in this server process, for the admin panel.
+    Tracing starts enabled when PDF_TOOL_TRACE=1.
+    """
+
+    def __init__(self, maxlen=TRACE_HISTORY):
+        self.enabled = os.getenv("PDF_TOOL_TRACE") == "1"
+        self._traces = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def new_trace(self, name):
+        """A TraceRecorder for a new job (kept here), or None while tracing is off."""
+        if not self.enabled:
+            return None
+        trace = TraceRecorder(name)
+        with self._lock:
+            self._traces.append(trace)
+        return trace
+
+    def recent(self):
+        """Kept traces, newest first."""
+        with self._lock:
+            return list(reversed(self._traces))
+
+
+_trace_store = None
+_trace_store_lock = threading.Lock()
+
+
+def get_trace_store():
+    """Process-wide trace store shared by every Streamlit session."""
+    global _trace_store
+    with _trace_store_lock:
+        if _trace_store is None:
+            _trace_store = TraceStore()
+        return _trace_store
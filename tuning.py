@@ -0,0 +1,147 @@
+import io
+import os
+import json
+import time
+import platform
+
+from conversion_core import ConversionPipeline, ImageSource, get_ocr_pool, shutdown_ocr_pool
+
+# ==============================================================================
+# Host Tuning
+# ==============================================================================
+# Tesseract's OpenMP threads, OpenCV's thread pool and our own page-level
+# processes all compete for the same cores; more of each can be slower.
+# `python pdf_to_docx.py tune` measures combinations on this machine and saves
+# the fastest to tuning.json, which the app and the CLI apply at startup as
+# environment defaults (explicitly set environment variables still win).
+
+DEFAULT_TUNING_PATH = os.getenv("PDF_TOOL_TUNING_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "tuning.json"
+)
+
+# Setting -> environment variable it provides a default for
+TUNED_ENV = {
+    "ocr_workers": "PDF_TOOL_OCR_WORKERS",    # OCR processes (conversion_core.default_ocr_workers)
+    "omp_thread_limit": "OMP_THREAD_LIMIT",   # OpenMP threads per Tesseract run
+    "cv2_threads": "PDF_TOOL_CV2_THREADS",    # cv2.setNumThreads in preprocessing
+}
+
+
+def load_tuning(path=None):
+    """Saved settings, or {} if the host has not been tuned (or the file is unreadable)."""
+    try:
+        with open(path or DEFAULT_TUNING_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def apply_tuning(path=None):
+    """Exports saved settings as environment defaults; call before creating pools or the scheduler."""
+    settings = load_tuning(path)
+    if settings.get("cpu_count") not in (None, os.cpu_count()):
+        return {}  # Tuned on different hardware (e.g. a copied config); run `tune` again
+    for key, env in TUNED_ENV.items():
+        if settings.get(key) and env not in os.environ:
+            os.environ[env] = str(settings[key])
+    return settings
+
+
+def save_tuning(settings, path=None):
+    path = path or DEFAULT_TUNING_PATH
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    return path
+
+
+def candidate_settings(cpu_count=None):
+    """
+    Grid of (ocr_workers, omp_thread_limit, cv2_threads), kept small so a
+    calibration takes minutes. Combinations running more than twice as many
+    threads as cores are skipped. None means the library default (Tesseract
+    and OpenCV use every core).
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    workers = sorted({max(1, cpu_count // 4), max(1, cpu_count // 2), cpu_count})
+    omp_limits = [n for n in (1, 2, 4) if n <= cpu_count]
+    candidates = [(cpu_count, None, None)]  # Untuned baseline first
+    for w in workers:
+        for omp in omp_limits:
+            if w * omp > 2 * cpu_count:
+                continue
+            for cv in sorted({1, min(2, cpu_count)}):
+                candidates.append((w, omp, cv))
+    return candidates
+
+
+def render_samples(pdf_path, dpi, poppler_path=None, count=None):
+    """PNG bytes of the sample pages, repeated to `count` pages so every worker stays busy."""
+    from pdf2image import convert_from_path
+
+    pages = []
+    for image in convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path, last_page=8):
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        pages.append(buffer.getvalue())
+    count = count or max(len(pages), 2 * (os.cpu_count() or 1))
+    return [(f"sample_{i + 1}.png", pages[i % len(pages)]) for i in range(count)]
+
+
+def _set_env(name, value):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = str(value)
+
+
+def measure(samples, settings, tesseract_cmd=None, config="", preprocess_kwargs=None):
+    """Pages per second for one (ocr_workers, omp_thread_limit, cv2_threads) combination."""
+    import cv2
+
+    ocr_workers, omp_thread_limit, cv2_threads = settings
+    saved = {env: os.environ.get(env) for env in TUNED_ENV.values()}
+    try:
+        _set_env("OMP_THREAD_LIMIT", omp_thread_limit)  # Inherited by newly spawned OCR workers
+        _set_env("PDF_TOOL_CV2_THREADS", cv2_threads)
+        cv2.setNumThreads(cv2_threads if cv2_threads is not None else -1)  # -1 restores OpenCV's default
+        shutdown_ocr_pool()
+        pool = get_ocr_pool(tesseract_cmd, ocr_workers)
+        list(pool.map(abs, range(ocr_workers)))  # Start the workers outside the timing
+
+        start = time.perf_counter()
+        pipeline = ConversionPipeline(ImageSource(samples), preprocess_kwargs=preprocess_kwargs, config=config,
+                                      tesseract_cmd=tesseract_cmd, ocr_workers=ocr_workers)
+        for result in pipeline.results():
+            if result.error is not None:
+                raise RuntimeError(f"OCR failed during calibration: {result.error}")
+        return len(samples) / (time.perf_counter() - start)
+    finally:
+        shutdown_ocr_pool()
+        for env, value in saved.items():
+            _set_env(env, value)
+
+
+def calibrate(samples, candidates, tesseract_cmd=None, config="", preprocess_kwargs=None, on_result=None):
+    """
+    Measures every candidate and returns the best as a settings dict ready for
+    save_tuning(). `on_result(settings, pages_per_sec)` reports progress.
+    """
+    results = []
+    for settings in candidates:
+        rate = measure(samples, settings, tesseract_cmd, config, preprocess_kwargs)
+        results.append((rate, settings))
+        if on_result:
+            on_result(settings, rate)
+    baseline_rate = results[0][0]
+    best_rate, (ocr_workers, omp_thread_limit, cv2_threads) = max(results, key=lambda item: item[0])
+    return {
+        "ocr_workers": ocr_workers,
+        "omp_thread_limit": omp_thread_limit,
+        "cv2_threads": cv2_threads,
+        "pages_per_sec": round(best_rate, 3),
+        "baseline_pages_per_sec": round(baseline_rate, 3),
+        "sample_pages": len(samples),
+        "cpu_count": os.cpu_count(),
+        "host": platform.node(),
+        "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
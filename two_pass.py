@@ -0,0 +1,154 @@
+import io
+import os
+import re
+import subprocess
+
+from ocr_export import parse_hocr, hocr_tostring
+
+# ==============================================================================
+# Two-Pass OCR
+# ==============================================================================
+# The first pass reads the page at a modest DPI. Lines whose mean word
+# confidence (hOCR x_wconf) is below a threshold are rendered again at high DPI,
+# only their own bounding box (pdftoppm -x/-y/-W/-H), stacked into one strip
+# image and re-read with a single Tesseract run. A re-read line replaces the
+# original only if its confidence is higher. Runs inside the OCR worker process.
+
+DEFAULT_SECOND_PASS_DPI = 600
+DEFAULT_MIN_CONFIDENCE = 70
+MAX_LINES_PER_PAGE = 60   # Lowest-confidence lines first
+LINE_PADDING = 0.25       # Fraction of the line height added above and below each crop
+STRIP_GAP = 24            # White pixels between stacked lines (at the second-pass DPI)
+
+BBOX_RE = re.compile(r'bbox (\d+) (\d+) (\d+) (\d+)')
+CONF_RE = re.compile(r'x_wconf (\d+)')
+PSM_RE = re.compile(r'--psm \d+')
+
+
+def _bbox(element):
+    match = BBOX_RE.search(element.get("title") or "")
+    return [int(g) for g in match.groups()] if match else None
+
+
+def _words(line):
+    """[(text, bbox, conf), ...] of a line element."""
+    words = []
+    for word in line.xpath(".//span[@class='ocrx_word']"):
+        text = word.text_content().strip()
+        conf = CONF_RE.search(word.get("title") or "")
+        if text:
+            words.append((text, _bbox(word), int(conf.group(1)) if conf else 0))
+    return words
+
+
+def _mean_confidence(words):
+    return sum(conf for _, _, conf in words) / len(words) if words else 0.0
+
+
+def low_confidence_lines(page, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """(line element, bbox, mean confidence) of lines below `min_confidence`, worst first."""
+    lines = []
+    for line in page.xpath(".//span[@class='ocr_line' or @class='ocr_header' "
+                           "or @class='ocr_caption' or @class='ocr_textfloat']"):
+        bbox = _bbox(line)
+        words = _words(line)
+        if bbox and words:
+            confidence = _mean_confidence(words)
+            if confidence < min_confidence:
+                lines.append((line, bbox, confidence))
+    lines.sort(key=lambda item: item[2])
+    return lines[:MAX_LINES_PER_PAGE]
+
+
+def render_pdf_region(pdf_path, page_num, dpi, x, y, width, height, poppler_path=None):
+    """Renders one rectangle of a PDF page (pixel coordinates at `dpi`) with pdftoppm."""
+    from PIL import Image
+
+    pdftoppm = os.path.join(poppler_path, "pdftoppm") if poppler_path else "pdftoppm"
+    args = [pdftoppm, "-r", str(dpi), "-f", str(page_num), "-l", str(page_num),
+            "-x", str(x), "-y", str(y), "-W", str(width), "-H", str(height),
+            "-gray", "-png", "-singlefile", pdf_path]
+    completed = subprocess.run(args, capture_output=True, check=True)  # No output root: PNG on stdout
+    return Image.open(io.BytesIO(completed.stdout)).convert("RGB")
+
+
+def refine_page(hocr, pdf_path, page_num, page_dpi, upscale_factor=1.0, second_pass_dpi=DEFAULT_SECOND_PASS_DPI,
+                min_confidence=DEFAULT_MIN_CONFIDENCE, poppler_path=None, lang=None, config="",
+                mode="Standard (Auto)"):
+    """
+    Re-reads the page's low-confidence lines at `second_pass_dpi`.
+    Returns (hocr, lines_checked, lines_improved); hOCR coordinates stay in first-pass pixels.
+    """
+    import lxml.html
+    from PIL import Image
+    from conversion_core import DEFAULT_LANG, preprocess_image, ocr_page_outputs
+
+    root = parse_hocr(hocr)
+    pages = root.xpath("//div[@class='ocr_page']")
+    if not pages:
+        return hocr, 0, 0
+    page_bbox = _bbox(pages[0])
+    candidates = low_confidence_lines(pages[0], min_confidence)
+    if not candidates or not page_bbox:
+        return hocr, 0, 0
+
+    # First-pass pixels -> second-pass pixels
+    scale = second_pass_dpi / (page_dpi * upscale_factor)
+    strips = []  # (line, crop origin in first-pass pixels, preprocessed strip image)
+    for line, (x0, y0, x1, y1), _ in candidates:
+        pad = int((y1 - y0) * LINE_PADDING) + 1
+        cx0, cy0 = max(page_bbox[0], x0 - pad), max(page_bbox[1], y0 - pad)
+        cx1, cy1 = min(page_bbox[2], x1 + pad), min(page_bbox[3], y1 + pad)
+        crop = render_pdf_region(pdf_path, page_num, second_pass_dpi,
+                                 int(cx0 * scale), int(cy0 * scale),
+                                 max(1, int((cx1 - cx0) * scale)), max(1, int((cy1 - cy0) * scale)),
+                                 poppler_path)
+        strips.append((line, (cx0, cy0), preprocess_image(crop, upscale_factor=1.0, mode=mode)))
+
+    # One Tesseract run for all lines: stack the crops with white gaps
+    width = max(strip.width for _, _, strip in strips) + 2 * STRIP_GAP
+    height = sum(strip.height + STRIP_GAP for _, _, strip in strips) + STRIP_GAP
+    stack = Image.new("L", (width, height), 255)
+    offsets = []
+    top = STRIP_GAP
+    for _, _, strip in strips:
+        stack.paste(strip.convert("L"), (STRIP_GAP, top))
+        offsets.append((top, top + strip.height))
+        top += strip.height + STRIP_GAP
+
+    config = PSM_RE.sub("", config).strip() + " --psm 6"  # A block of separate single lines
+    stacked_hocr = ocr_page_outputs(stack, lang or DEFAULT_LANG, config, ("hocr",), second_pass_dpi)["hocr"]
+
+    # Assign re-read words to their strip and map them back to first-pass coordinates
+    new_words = [[] for _ in strips]
+    for text, bbox, conf in _words(parse_hocr(stacked_hocr)):
+        if not bbox:
+            continue
+        center = (bbox[1] + bbox[3]) / 2
+        for i, (strip_top, strip_bottom) in enumerate(offsets):
+            if strip_top <= center < strip_bottom:
+                (cx0, cy0) = strips[i][1]
+                mapped = [int(cx0 + (bbox[0] - STRIP_GAP) / scale), int(cy0 + (bbox[1] - strip_top) / scale),
+                          int(cx0 + (bbox[2] - STRIP_GAP) / scale), int(cy0 + (bbox[3] - strip_top) / scale)]
+                new_words[i].append((text, mapped, conf))
+                break
+
+    improved = 0
+    for (line, _, old_confidence), words in zip(candidates, new_words):
+        x0, y0, x1, y1 = _bbox(line)
+        # Padding can catch parts of neighbouring lines: keep words centred on this line
+        words = [w for w in words if y0 <= (w[1][1] + w[1][3]) / 2 <= y1]
+        if not words or _mean_confidence(words) <= old_confidence:
+            continue
+        for word in line.xpath(".//span[@class='ocrx_word']"):
+            word.getparent().remove(word)
+        line.text = None
+        for text, (wx0, wy0, wx1, wy1), conf in sorted(words, key=lambda w: w[1][0]):
+            span = lxml.html.Element("span")
+            span.set("class", "ocrx_word")
+            span.set("title", f"bbox {wx0} {wy0} {wx1} {wy1}; x_wconf {conf}")
+            span.text = text
+            span.tail = " "
+            line.append(span)
+        improved += 1
+    return hocr_tostring(root), len(candidates), improved